@@ -1,6 +1,8 @@
 from app.api.endpoints.analytics import router as analytics_router #noqa
 from app.api.endpoints.auth import router as auth_router #noqa
+from app.api.endpoints.diagnostics import router as diagnostics_router #noqa
 from app.api.endpoints.events import router as event_router #noqa
 from app.api.endpoints.health import router as health_router #noqa
+from app.api.endpoints.metrics import router as metrics_router #noqa
 from app.api.endpoints.tasks import router as task_router #noqa
 from app.api.endpoints.websocket import router as websocket_router #noqa
@@ -1,11 +1,30 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import current_superuser
 from app.core.db import get_async_session
-from app.crud import get_stats_summary
+from app.crud import (
+    get_funnel,
+    get_query_result,
+    get_retention_matrix,
+    get_session_stats,
+    get_stats_summary,
+)
 from app.services import redis_service
-from app.schemas import StatsSummary
+from app.schemas import (
+    AnalyticsQuery,
+    AnalyticsQueryResult,
+    FunnelQuery,
+    FunnelResult,
+    RetentionMatrix,
+    RetentionPeriod,
+    SessionStats,
+    StatsSummary,
+)
 
 router = APIRouter()
 
@@ -34,5 +53,86 @@ async def read_stats_summary(
 async def get_realtime_stats():
     """Get realtime statistics from Redis."""
     realtime_stats = await redis_service.get_realtime_stats()
-    await redis_service.close()
     return realtime_stats
+
+
+@router.post(
+    '/query',
+    response_model=AnalyticsQueryResult,
+    dependencies=[Depends(current_superuser)],
+)
+async def run_query(
+    query: AnalyticsQuery,
+    session: AsyncSession=Depends(get_async_session),
+):
+    """Run an ad-hoc aggregate over events.
+
+        Returns event and unique user counts grouped by the requested
+        dimensions. Results are cached by the normalized query.
+    """
+    return await get_query_result(session, query)
+
+
+@router.post(
+    '/funnel',
+    response_model=FunnelResult,
+    dependencies=[Depends(current_superuser)],
+)
+async def read_funnel(
+    query: FunnelQuery,
+    session: AsyncSession=Depends(get_async_session),
+):
+    """Get per-step users and conversion rates of an ordered funnel."""
+    return await get_funnel(session, query)
+
+
+@router.get(
+    '/funnel/default',
+    response_model=FunnelResult,
+    dependencies=[Depends(current_superuser)],
+)
+async def read_default_funnel():
+    """Get the hourly precomputed page_view -> click -> purchase funnel."""
+    funnel = await redis_service.get_default_funnel()
+    if not funnel:
+        raise HTTPException(
+            HTTPStatus.NOT_FOUND, 'The default funnel is not calculated yet.',
+        )
+    return funnel
+
+
+@router.get(
+    '/retention',
+    response_model=RetentionMatrix,
+    dependencies=[Depends(current_superuser)],
+)
+async def read_retention(
+    period: RetentionPeriod = RetentionPeriod.DAILY,
+    cohorts: int = Query(30, ge=1, le=180),
+):
+    """Get the retention matrix of the latest cohorts.
+
+        Every cohort holds users active in each day (or week) since
+        the cohort start, the first value is the cohort size.
+    """
+    return await get_retention_matrix(period, cohorts)
+
+
+@router.get(
+    '/sessions',
+    response_model=SessionStats,
+    dependencies=[Depends(current_superuser)],
+)
+async def read_session_stats(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    session: AsyncSession=Depends(get_async_session),
+):
+    """Get a summary of user sessions started in the range.
+
+        Sessions are split by an inactivity gap, the last 24 hours
+        are used by default.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=24)
+    return await get_session_stats(session, start, end)
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+
+from app.core.auth import current_superuser
+from app.core.db import slow_queries
+from app.services import redis_service
+
+router = APIRouter(dependencies=[Depends(current_superuser)])
+
+
+@router.get('/slow-queries')
+async def read_slow_queries(limit: int = 50):
+    """Latest slow queries of this process, newest first.
+
+        Plans are captured for a sample of slow SELECT statements
+        when `slow_query_explain_rate` is set.
+    """
+    return list(reversed(slow_queries))[:limit]
+
+
+@router.get('/profiles/{profile_id}')
+async def read_profile(profile_id: str, collapsed: bool = False):
+    """Profile of a request made with the `X-Profile` header.
+
+        With `collapsed`, the stacks are returned as text for flame
+        graph tools such as flamegraph.pl or speedscope.
+    """
+    profile = await redis_service.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(HTTPStatus.NOT_FOUND, 'Profile not found.')
+    if collapsed:
+        return Response(profile['collapsed'], media_type='text/plain')
+    return profile
+
+
+@router.get('/redis-memory')
+async def read_redis_memory(hours: int = 24):
+    """Estimated Redis memory and keys per key prefix over time.
+
+        Snapshots are taken by the memory monitoring task and kept
+        for a week.
+    """
+    return await redis_service.get_memory_snapshots(
+        datetime.now(timezone.utc) - timedelta(hours=hours),
+    )
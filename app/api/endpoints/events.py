@@ -1,13 +1,20 @@
+import asyncio
+from datetime import datetime
 from http import HTTPStatus
+from typing import Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.auth import current_user
+from app.core.auth import current_superuser, current_user
+from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.utils import as_utc
 from app.crud import create_event, get_event, get_events, update_stats
-from app.models import User
+from app.models import EventType, User
 from app.schemas import Event, EventCreate
+from app.services import read_archived_events
 
 router = APIRouter()
 
@@ -19,6 +26,8 @@ async def create_new_event(
     user: User = Depends(current_user),
 ):
     """Create new event."""
+    if not user.is_superuser:
+        event.timestamp = None
     user_id = event.user_id if user.is_superuser else user.id
     event = await create_event(event, user_id, session)
     await update_stats(event.event_type, str(event.user_id))
@@ -36,6 +45,35 @@ async def read_events(
     return await get_events(session, user.id, offset, limit)
 
 
+@router.get(
+    '/archived',
+    response_model=list[Event],
+    dependencies=[Depends(current_superuser)],
+)
+async def read_archived(
+    start: datetime,
+    end: datetime,
+    event_type: Optional[EventType] = None,
+    user_id: Optional[UUID] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """Get archived events of the time range."""
+    start, end = as_utc(start), as_utc(end)
+    if start >= end:
+        raise HTTPException(
+            HTTPStatus.BAD_REQUEST, 'The start must be earlier than the end.',
+        )
+    return await asyncio.to_thread(
+        read_archived_events,
+        settings.archive_dir,
+        start,
+        end,
+        event_type.value if event_type else None,
+        limit,
+        user_id,
+    )
+
+
 @router.get('/{event_id}', response_model=Event)
 async def read_event(
     event_id: int,
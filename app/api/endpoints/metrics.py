@@ -0,0 +1,32 @@
+import logging
+
+from fastapi import APIRouter, Response
+from prometheus_client import generate_latest
+from redis import RedisError
+
+from app.core.metrics import CONTENT_TYPE, registry
+from app.services import redis_service
+from app.tasks.stats import task_metrics
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get('', include_in_schema=False)
+async def read_metrics():
+    """Metrics in the Prometheus text exposition format.
+
+    Celery task metrics are recorded by workers into Redis and are
+    read from there, without them when Redis is unavailable.
+    """
+    try:
+        task_stats = await redis_service.get_task_stats()
+    except RedisError as error:
+        logger.warning(
+            'Task metrics unavailable', extra=dict(error=str(error)),
+        )
+        task_stats = {}
+    return Response(
+        generate_latest(registry) + generate_latest(task_metrics(task_stats)),
+        media_type=CONTENT_TYPE,
+    )
@@ -1,8 +1,19 @@
-from fastapi import APIRouter
+import asyncio
+from datetime import datetime
+from http import HTTPStatus
 
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.core.auth import current_superuser
+from app.core.utils import as_utc
+from app.services import redis_service
+from app.tasks.archive_tasks import archive_old_events
 from app.tasks.cleanup_tasks import (
     cleanup_old_redis_data, cleanup_user_sessions,
 )
+from app.tasks.export_tasks import export_events_to_parquet
+from app.tasks.reconcile_tasks import rebuild_redis_counters
+from app.tasks.stats import queue_depths, summarize_task_stats
 
 router = APIRouter()
 
@@ -19,3 +30,49 @@ async def run_hourly_aggregation():
             redis_cleanup=cleanup_task.id, session_task=session_task.id,
         ),
     )
+
+
+@router.post('/run-export', dependencies=[Depends(current_superuser)])
+async def run_events_export(start: datetime, end: datetime):
+    """Export events of the time range into daily Parquet partitions.
+
+        The range is widened to whole UTC days, so every partition
+        and its manifest describe a complete day.
+    """
+    start, end = as_utc(start), as_utc(end)
+    if start >= end:
+        raise HTTPException(
+            HTTPStatus.BAD_REQUEST, 'The start must be earlier than the end.',
+        )
+    export_task = export_events_to_parquet.delay(
+        start.isoformat(), end.isoformat(),
+    )
+    return dict(status='started', tasks=dict(export=export_task.id))
+
+
+@router.post('/run-redis-rebuild', dependencies=[Depends(current_superuser)])
+async def run_redis_rebuild():
+    """Rebuild Redis realtime counters and activity lists from Postgres."""
+    rebuild_task = rebuild_redis_counters.delay()
+    return dict(status='started', tasks=dict(redis_rebuild=rebuild_task.id))
+
+
+@router.post('/run-archive', dependencies=[Depends(current_superuser)])
+async def run_events_archive():
+    """Archive events older than the retention and delete them."""
+    archive_task = archive_old_events.delay()
+    return dict(status='started', tasks=dict(archive=archive_task.id))
+
+
+@router.get('/stats', dependencies=[Depends(current_superuser)])
+async def read_task_stats():
+    """Execution statistics of Celery tasks and depths of their queues.
+
+        Durations and queue waits are reported with percentiles
+        estimated from histogram buckets.
+    """
+    tasks = summarize_task_stats(await redis_service.get_task_stats())
+    return dict(
+        tasks=tasks,
+        queues=await asyncio.to_thread(queue_depths),
+    )
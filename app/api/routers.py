@@ -3,8 +3,10 @@ from fastapi import APIRouter
 from app.api.endpoints import (
     analytics_router,
     auth_router,
+    diagnostics_router,
     event_router,
     health_router,
+    metrics_router,
     task_router,
     websocket_router,
 )
@@ -19,9 +21,15 @@ main_router.include_router(
 main_router.include_router(
     auth_router, prefix='/auth', tags=['Auth'],
 )
+main_router.include_router(
+    diagnostics_router, prefix='/diagnostics', tags=['Diagnostics'],
+)
 main_router.include_router(
     event_router, prefix='/event', tags=['Event'],
 )
+main_router.include_router(
+    metrics_router, prefix='/metrics', tags=['Metrics'],
+)
 main_router.include_router(
     task_router, prefix='/task', tags=['Task'],
 )
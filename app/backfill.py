@@ -0,0 +1,126 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from app.core.logging import setup_logging
+from app.core.utils import as_utc
+from app.tasks.backfill_tasks import (
+    CHUNK_WIDTHS,
+    backfill_aggregates,
+    backfill_chunks,
+    backfill_group,
+    retained_range,
+)
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_POLL_SECONDS = 5
+
+
+def _backfill_chunk(chunk: tuple[datetime, datetime]) -> dict[str, Any]:
+    chunk_start, chunk_end = chunk
+    return backfill_aggregates(chunk_start.isoformat(), chunk_end.isoformat())
+
+
+def run_in_processes(
+    chunks: Sequence[tuple[datetime, datetime]], workers: int,
+) -> list[dict[str, Any]]:
+    """Backfill chunks in a local process pool, reporting progress."""
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_backfill_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            results.append(future.result())
+            logger.info(
+                'Backfill progress %d/%d chunks: %s',
+                len(results), len(chunks), results[-1],
+            )
+    return results
+
+
+def run_on_celery(
+    chunks: Sequence[tuple[datetime, datetime]],
+    poll_interval: float = PROGRESS_POLL_SECONDS,
+) -> list[dict[str, Any]]:
+    """Backfill chunks on Celery workers, polling the group progress."""
+    group_result = backfill_group(chunks).apply_async()
+    reported = None
+    while not group_result.ready():
+        completed = group_result.completed_count()
+        if completed != reported:
+            logger.info(
+                'Backfill progress %d/%d chunks', completed, len(chunks),
+            )
+            reported = completed
+        time.sleep(poll_interval)
+    return group_result.get(propagate=False)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Backfill aggregates of a range: `python -m app.backfill`."""
+    parser = argparse.ArgumentParser(
+        description='Recalculate hourly aggregations and daily summaries.',
+    )
+    parser.add_argument('start', type=datetime.fromisoformat)
+    parser.add_argument('end', type=datetime.fromisoformat)
+    parser.add_argument('--chunk', choices=CHUNK_WIDTHS, default='day')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument(
+        '--celery',
+        action='store_true',
+        help='Run chunks on Celery workers instead of local processes.',
+    )
+    args = parser.parse_args(argv)
+    if as_utc(args.start) >= as_utc(args.end):
+        parser.error('start must be earlier than end')
+
+    setup_logging()
+    requested = as_utc(args.start), as_utc(args.end)
+    start, end = retained_range(*requested)
+    if start >= end:
+        logger.warning(
+            'Backfill of %s to %s skipped, outside the Redis retention',
+            *requested,
+        )
+        return 0
+    skipped = [
+        f'{skipped_start} to {skipped_end}'
+        for skipped_start, skipped_end in (
+            (requested[0], start), (end, requested[1]),
+        )
+        if skipped_start < skipped_end
+    ]
+    if skipped:
+        logger.warning(
+            'Backfill limited to %s to %s by the Redis retention, '
+            'skipped %s',
+            start, end, ' and '.join(skipped),
+        )
+    chunks = backfill_chunks(start, end, args.chunk)
+    logger.info('Backfill of %d %s chunks started', len(chunks), args.chunk)
+    results = run_on_celery(chunks) if args.celery else run_in_processes(
+        chunks, args.workers,
+    )
+    failed = [
+        result for result in results
+        if not isinstance(result, dict) or result.get('status') != 'success'
+    ]
+    logger.info(
+        'Backfill finished: %d chunks, %d failed, %d events',
+        len(results),
+        len(failed),
+        sum(
+            result.get('total_events', 0)
+            for result in results if isinstance(result, dict)
+        ),
+    )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
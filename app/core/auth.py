@@ -1,3 +1,4 @@
+from typing import Optional
 from uuid import UUID
 
 from fastapi import Depends
@@ -11,7 +12,7 @@ from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.db import get_async_session
+from app.core.db import AsyncSessionLocal, get_async_session
 from app.models import User
 from app.schemas import UserCreate
 
@@ -63,3 +64,14 @@ fastapi_users = FastAPIUsers[User, UUID](
 
 current_user = fastapi_users.current_user(active=True)
 current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+async def get_superuser_by_token(token: str) -> Optional[User]:
+    """Active superuser the bearer token belongs to, if any."""
+    async with AsyncSessionLocal() as session:
+        user = await get_jwt_strategy().read_token(
+            token, UserManager(SQLAlchemyUserDatabase(session, User)),
+        )
+    if user is None or not (user.is_active and user.is_superuser):
+        return None
+    return user
@@ -1,11 +1,16 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import before_task_publish, setup_logging
 from datetime import timedelta
 from app.core.config import settings
+from app.core.logging import setup_logging as setup_json_logging
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+TASK_QUEUES = ('analytics', 'maintenance', 'monitoring', 'realtime')
+
 celery_app = Celery('analytics_worker')
 
 celery_app.conf.update(
@@ -38,9 +43,13 @@ celery_app.conf.update(
 
     task_routes={
         'app.tasks.aggregation_tasks.*': {'queue': 'analytics'},
+        'app.tasks.archive_tasks.*': {'queue': 'maintenance'},
+        'app.tasks.backfill_tasks.*': {'queue': 'analytics'},
         'app.tasks.cleanup_tasks.*': {'queue': 'maintenance'},
+        'app.tasks.export_tasks.*': {'queue': 'maintenance'},
         'app.tasks.monitoring_tasks.*': {'queue': 'monitoring'},
         'app.tasks.realtime_tasks.*': {'queue': 'realtime'},
+        'app.tasks.reconcile_tasks.*': {'queue': 'maintenance'},
     },
 
     task_annotations={
@@ -61,9 +70,13 @@ celery_app.conf.update(
 
     imports=[
         'app.tasks.aggregation_tasks',
+        'app.tasks.archive_tasks',
+        'app.tasks.backfill_tasks',
         'app.tasks.cleanup_tasks',
+        'app.tasks.export_tasks',
         'app.tasks.monitoring_tasks',
         'app.tasks.realtime_tasks',
+        'app.tasks.reconcile_tasks',
     ],
 
     beat_schedule={
@@ -88,6 +101,26 @@ celery_app.conf.update(
             },
         },
 
+        'default_funnel': {
+            'task': 'app.tasks.aggregation_tasks.calculate_default_funnel',
+            'schedule': crontab(minute=10),
+            'options': {
+                'queue': 'analytics',
+                'expires': 3600,
+                'priority': 5,
+            },
+        },
+
+        'user_sessions': {
+            'task': 'app.tasks.aggregation_tasks.calculate_user_sessions',
+            'schedule': crontab(minute='*/15'),
+            'options': {
+                'queue': 'analytics',
+                'expires': 900,
+                'priority': 4,
+            },
+        },
+
         'daily_summary': {
             'task': 'app.tasks.aggregation_tasks.calculate_daily_summary',
             'schedule': crontab(minute=15, hour=0),
@@ -98,17 +131,27 @@ celery_app.conf.update(
             },
         },
 
+        'retention_matrices': {
+            'task': 'app.tasks.aggregation_tasks.update_retention_matrices',
+            'schedule': crontab(minute=30, hour=0),
+            'options': {
+                'queue': 'analytics',
+                'expires': 86400,
+                'priority': 3,
+            },
+        },
+
         'calculate_user_behavior_metrics': {
-            'task': 'app.tasks.aggregation_tasks.calculate_user_behavior_metrics',
+            'task': (
+                'app.tasks.aggregation_tasks.'
+                'calculate_user_behavior_metrics_batch'
+            ),
             'schedule': crontab(minute=0, hour=2),
             'options': {
                 'queue': 'analytics',
                 'expires': 7200,
                 'priority': 2,
             },
-            'kwargs': {
-                'user_id': 'batch_processing',
-            },
         },
 
         'redis_cleanup': {
@@ -131,6 +174,26 @@ celery_app.conf.update(
             },
         },
 
+        'counters_drift_check': {
+            'task': 'app.tasks.reconcile_tasks.check_counters_drift',
+            'schedule': crontab(minute=30, hour=4),
+            'options': {
+                'queue': 'maintenance',
+                'expires': 3600,
+                'priority': 1,
+            },
+        },
+
+        'events_archive': {
+            'task': 'app.tasks.archive_tasks.archive_old_events',
+            'schedule': crontab(minute=0, hour=5),
+            'options': {
+                'queue': 'maintenance',
+                'expires': 3600,
+                'priority': 1,
+            },
+        },
+
         'backup_current_stats': {
             'task': 'app.tasks.cleanup_tasks.backup_current_stats',
             'schedule': crontab(minute=30),
@@ -167,6 +230,18 @@ logger.info('Celery application configured', extra=dict(
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
     timezone='Europe/Moscow',
-    queues=['analytics', 'maintenance', 'monitoring', 'realtime'],
+    queues=list(TASK_QUEUES),
     scheduled_tasks=len(celery_app.conf.beat_schedule),
 ))
+
+
+@before_task_publish.connect
+def stamp_enqueue_time(headers: dict, **kwargs) -> None:
+    """Publish time of a task, workers derive its queue wait from it."""
+    headers.setdefault('enqueued_at', time.time())
+
+
+@setup_logging.connect
+def configure_worker_logging(**kwargs) -> None:
+    """Workers log through the JSON pipeline instead of Celery's setup."""
+    setup_json_logging()
@@ -24,6 +24,47 @@ class Settings(BaseSettings):
     flower_user: str = 'admin'
     flower_password: str = 'password'
 
+    export_dir: str = 'exports'
+    export_chunk_size: int = 50000
+
+    archive_dir: str = 'archive'
+    event_retention_days: int = 365
+    archive_delete_batch_size: int = 5000
+
+    analytics_query_open_ttl: int = 60
+    analytics_query_closed_ttl: int = 86400
+
+    retention_days: int = 90
+    retention_weeks: int = 26
+
+    user_metrics_partitions: int = 16
+
+    session_gap_minutes: int = 30
+    session_lookback_hours: int = 24
+
+    hourly_aggregation_catchup_hours: int = 48
+
+    redis_rebuild_partitions: int = 8
+
+    redis_memory_growth_window_minutes: int = 60
+    redis_memory_growth_ratio: float = 0.5
+    redis_memory_growth_min_bytes: int = 10 * 1024 * 1024
+
+    log_level: str = 'INFO'
+    log_sample_rates: dict[str, float] = {
+        'app.services.websocket_manager': 0.1,
+    }
+
+    loop_monitor_interval_ms: int = 250
+    loop_lag_threshold_ms: int = 100
+
+    profile_interval_ms: float = 2.0
+    profile_ttl_seconds: int = 3600
+
+    slow_query_threshold_ms: int = 500
+    slow_query_explain_rate: float = 0.0
+    slow_query_log_size: int = 100
+
     model_config = SettingsConfigDict(
         env_file='.env',
     )
@@ -1,8 +1,35 @@
-from sqlalchemy import Column, Integer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import json
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Optional
+
+from sqlalchemy import Column, event, Integer
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, create_async_engine,
+)
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
 
 from app.core.config import settings
+from app.core.metrics import db_query_duration
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_TYPE = re.compile(r'[\s(]*(\w*)')
+PLACEHOLDER = re.compile(r'\$\d+(?:::\w+(?:\[\])?)?|%\(\w+\)s|(?<!:):\w+\b')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+WHITESPACE = re.compile(r'\s+')
+EXPLAIN = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) '
+EXPLAIN_SAVEPOINT = 'slow_query_explain'
+
+slow_queries: deque[dict[str, Any]] = deque(
+    maxlen=settings.slow_query_log_size,
+)
 
 
 class PreBase:
@@ -15,7 +42,129 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany,
+):
+    context.query_started = time.perf_counter()
+
+
+def normalize_sql(statement: str) -> str:
+    """Statement with placeholders and literals replaced by `?`.
+
+    Lists of placeholders collapse into `(...)`, so statements with
+    IN lists of any length normalize to the same text.
+    """
+    statement = LITERAL.sub('?', PLACEHOLDER.sub('?', statement))
+    statement = PLACEHOLDER_LIST.sub('(...)', statement)
+    return WHITESPACE.sub(' ', statement).strip()
+
+
+def bind_shape(parameters: Any, executemany: bool) -> str:
+    """Types of bound values without the values, runs are counted."""
+    if executemany:
+        return f'{len(parameters)} x {bind_shape(parameters[0], False)}'
+    if isinstance(parameters, dict):
+        parameters = parameters.values()
+    return '(' + ', '.join(
+        type_name if count == 1 else f'{type_name} * {count}'
+        for type_name, count in (
+            (type_name, len(list(values)))
+            for type_name, values in groupby(
+                type(value).__name__ for value in parameters or ()
+            )
+        )
+    ) + ')'
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[Any]:
+    """Plan of the statement run again under a rolled back savepoint."""
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f'SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        try:
+            cursor.execute(EXPLAIN + statement, parameters)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute(f'ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}')
+            cursor.execute(f'RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        return json.loads(plan) if isinstance(plan, str) else plan
+    except Exception as error:
+        logger.warning(
+            'Slow query plan not captured', extra=dict(error=str(error)),
+        )
+        return None
+    finally:
+        cursor.close()
+
+
+def _record_slow_query(
+    conn,
+    statement: str,
+    parameters: Any,
+    executemany: bool,
+    statement_type: str,
+    duration: float,
+) -> None:
+    """Log a slow statement and keep it in the ring buffer.
+
+    A sample of slow SELECT statements on Postgres is run again with
+    EXPLAIN ANALYZE, other statements are never re-executed.
+    """
+    slow_query = dict(
+        statement=normalize_sql(statement),
+        bind_shape=bind_shape(parameters, executemany),
+        duration_ms=round(duration * 1000, 1),
+        recorded_at=datetime.now(timezone.utc).isoformat(),
+        plan=None,
+    )
+    if (
+        statement_type == 'SELECT'
+        and not executemany
+        and conn.dialect.name == 'postgresql'
+        and random.random() < settings.slow_query_explain_rate
+    ):
+        slow_query['plan'] = _explain(conn, statement, parameters)
+    slow_queries.append(slow_query)
+    logger.warning('Slow query', extra=dict(
+        statement=slow_query['statement'],
+        bind_shape=slow_query['bind_shape'],
+        duration_ms=slow_query['duration_ms'],
+    ))
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany,
+):
+    duration = time.perf_counter() - context.query_started
+    statement_type = STATEMENT_TYPE.match(statement).group(1).upper()
+    db_query_duration.labels(statement_type).observe(duration)
+    if duration * 1000 >= settings.slow_query_threshold_ms:
+        _record_slow_query(
+            conn,
+            statement,
+            parameters,
+            executemany,
+            statement_type,
+            duration,
+        )
+
+
+def instrument_engine(engine: AsyncEngine) -> AsyncEngine:
+    """Record durations of queries run through the engine.
+
+    Statements slower than the threshold are logged as slow queries.
+    """
+    event.listen(
+        engine.sync_engine, 'before_cursor_execute', _before_cursor_execute,
+    )
+    event.listen(
+        engine.sync_engine, 'after_cursor_execute', _after_cursor_execute,
+    )
+    return engine
+
+
+engine = instrument_engine(create_async_engine(settings.database_url))
 
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
 
@@ -1,11 +1,130 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.core.config import settings
+
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {
+    'message', 'asctime', 'taskName',
+}
+
+_listener: Optional[QueueListener] = None
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON line, `extra` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            timestamp=datetime.fromtimestamp(
+                record.created, timezone.utc,
+            ).isoformat(),
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage(),
+        )
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes a share of records below WARNING of sampled loggers.
+
+    A logger uses the rate of its nearest configured ancestor, the
+    lookup is cached per logger name.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._logger_rates: dict[str, Optional[float]] = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        if name not in self._logger_rates:
+            rate, prefix = None, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self._logger_rates[name] = rate
+        return self._logger_rates[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate is None or random.random() < rate
+
+
+class LoopSafeQueueHandler(QueueHandler):
+    """Enqueues a copy of records with their message merged.
+
+    Arguments and tracebacks may change or hold frames once the caller
+    moves on, so the message and traceback are formatted here, and
+    only the JSON serialization happens in the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not record.args and not record.exc_info:
+            return record
+        record = copy.copy(record)
+        if record.args:
+            record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(
+                record.exc_info,
+            )
+            record.exc_info = None
+        return record
+
+
+def _start_listener(handler: QueueHandler) -> None:
+    """Start the thread writing queued records to stdout."""
+    global _listener
+    handler.queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    _listener = QueueListener(handler.queue, stream_handler)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
 
 
 def setup_logging():
-    """Basic logging setup."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(levelname)s - %(name)s - %(message)s',
-        stream=sys.stdout,
-    )
+    """JSON logging through a queue drained by a background thread.
+
+    Callers only enqueue records, so the event loop never waits on
+    formatting or stdout. A forked child, such as a prefork Celery
+    worker, starts a listener of its own.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, LoopSafeQueueHandler) for h in root.handlers):
+        return
+    handler = LoopSafeQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter(settings.log_sample_rates))
+    _start_listener(handler)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level)
+    os.register_at_fork(after_in_child=lambda: _start_listener(handler))
+    atexit.register(_stop_listener)
@@ -0,0 +1,96 @@
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+    2.5, 5.0, 10.0,
+)
+
+registry = CollectorRegistry()
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route template.',
+    ('method', 'route', 'status'),
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+redis_command_duration = Histogram(
+    'redis_command_duration_seconds',
+    'Duration of RedisService methods.',
+    ('method',),
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+db_query_duration = Histogram(
+    'db_query_duration_seconds',
+    'Duration of database queries by statement type.',
+    ('statement',),
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+events_ingested = Counter(
+    'events_ingested_total',
+    'Events ingested through the API by type.',
+    ('event_type',),
+    registry=registry,
+)
+websocket_connections = Gauge(
+    'websocket_connections',
+    'Open dashboard WebSocket connections.',
+    registry=registry,
+)
+websocket_broadcast_duration = Histogram(
+    'websocket_broadcast_duration_seconds',
+    'Duration of a broadcast to every dashboard connection.',
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+event_loop_lag = Histogram(
+    'event_loop_lag_seconds',
+    'Delay of event loop callbacks behind their schedule.',
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+event_loop_tasks = Gauge(
+    'event_loop_tasks',
+    'Tasks pending on the event loop.',
+    registry=registry,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP request latency.
+
+    Requests are labelled by the matched route template, so path
+    parameters do not multiply the series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            http_request_duration.labels(
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                status,
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from types import FrameType
+from typing import Optional
+
+from app.core.auth import get_superuser_by_token
+from app.core.config import settings
+from app.services import redis_service
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b'x-profile'
+PROFILE_QUERY_FLAG = b'profile=1'
+PROFILE_ID_HEADER = b'x-profile-id'
+AWAIT_TARGETS = (
+    ('redis', 'redis'),
+    ('asyncpg', 'postgres'),
+    ('sqlalchemy', 'postgres'),
+)
+
+
+def _module(frame: FrameType) -> str:
+    return frame.f_globals.get('__name__', '?')
+
+
+def _frame_label(frame: FrameType) -> str:
+    return f'{_module(frame)}.{frame.f_code.co_qualname}'
+
+
+def _await_state(frames: list[FrameType]) -> str:
+    """What a suspended request waits on, judged from its innermost frames."""
+    for frame in reversed(frames):
+        module = _module(frame)
+        for prefix, target in AWAIT_TARGETS:
+            if module.startswith(prefix):
+                return f'await {target}'
+    return 'await other'
+
+
+def _awaited_frame(awaitable) -> Optional[FrameType]:
+    for attribute in ('cr_frame', 'gi_frame', 'ag_frame'):
+        frame = getattr(awaitable, attribute, None)
+        if frame is not None:
+            return frame
+    return None
+
+
+def _next_awaitable(awaitable):
+    for attribute in ('cr_await', 'gi_yieldfrom', 'ag_await'):
+        awaited = getattr(awaitable, attribute, None)
+        if awaited is not None:
+            return awaited
+    return None
+
+
+class RequestProfiler:
+    """Samples the stack of one request from a background thread.
+
+    While the request runs, its frames are read from the event loop
+    thread with `sys._current_frames`. While it is suspended, its
+    coroutine await chain is walked instead, so time spent waiting on
+    Redis or Postgres is attributed to the call that waits.
+    """
+
+    def __init__(
+        self, task: asyncio.Task, root: FrameType, interval: float,
+    ):
+        self.task = task
+        self.root = root
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.states: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample_forever, name='request-profiler', daemon=True,
+        )
+
+    def _running_frames(self) -> list[FrameType]:
+        frames = []
+        frame = sys._current_frames().get(self.thread_id)
+        while frame is not None:
+            frames.append(frame)
+            if frame is self.root:
+                return frames[::-1]
+            frame = frame.f_back
+        return []
+
+    def _suspended_frames(self) -> list[FrameType]:
+        frames, awaitable = [], self.task.get_coro()
+        while awaitable is not None:
+            frame = _awaited_frame(awaitable)
+            if frame is None:
+                break
+            if frames or frame is self.root:
+                frames.append(frame)
+            awaitable = _next_awaitable(awaitable)
+        return frames
+
+    def sample(self) -> None:
+        frames = self._running_frames()
+        if frames:
+            state = 'cpu'
+        else:
+            frames = self._suspended_frames()
+            state = _await_state(frames)
+        if not frames:
+            return
+        self.states[state] += 1
+        self.stacks[';'.join(
+            [_frame_label(frame) for frame in frames] + [f'[{state}]'],
+        )] += 1
+
+    def _sample_forever(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                continue
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format of flame graph tools."""
+        return '\n'.join(
+            f'{stack} {count}' for stack, count in self.stacks.most_common()
+        )
+
+
+def _profiling_requested(scope) -> bool:
+    if PROFILE_QUERY_FLAG in scope['query_string']:
+        return True
+    return any(name == PROFILE_HEADER for name, _ in scope['headers'])
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            scheme, _, token = value.decode('latin-1').partition(' ')
+            return token if scheme.lower() == 'bearer' else None
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests of superusers on demand.
+
+    Profiling is triggered by an `X-Profile` header or a `profile=1`
+    query flag. The report is saved in Redis under the id returned in
+    the `X-Profile-Id` response header. Other requests pass through
+    after a check of the query string and header names.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not _profiling_requested(scope):
+            return await self.app(scope, receive, send)
+        token = _bearer_token(scope)
+        if token is None or await get_superuser_by_token(token) is None:
+            return await self.app(scope, receive, send)
+        await self._profile(scope, receive, send)
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode()),
+                ]
+            await send(message)
+
+        profiler = RequestProfiler(
+            asyncio.current_task(),
+            sys._getframe(),
+            settings.profile_interval_ms / 1000,
+        )
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            duration = time.perf_counter() - started
+            await redis_service.save_profile(
+                profile_id,
+                dict(
+                    id=profile_id,
+                    method=scope['method'],
+                    path=scope['path'],
+                    duration_ms=round(duration * 1000, 1),
+                    interval_ms=settings.profile_interval_ms,
+                    samples=sum(profiler.states.values()),
+                    states=dict(profiler.states),
+                    collapsed=profiler.collapsed(),
+                ),
+                timedelta(seconds=settings.profile_ttl_seconds),
+            )
+            logger.info('Request profiled', extra=dict(
+                profile_id=profile_id, path=scope['path'],
+            ))
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, Float, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+
+
+class date_bin(FunctionElement):
+    """Truncate a timestamp to a bucket of the given stride.
+
+    Buckets are aligned to a Monday, so weekly buckets start on Mondays.
+    Compiles to `date_bin` on PostgreSQL and to epoch arithmetic on SQLite.
+    """
+    name = 'date_bin'
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+    def __init__(self, stride: timedelta, source):
+        super().__init__(
+            literal_column(str(int(stride.total_seconds()))), source,
+        )
+
+
+@compiles(date_bin)
+def _compile_date_bin(element, compiler, **kwargs):
+    stride, source = element.clauses
+    return (
+        f'date_bin(make_interval(secs => {compiler.process(stride)}), '
+        f'{compiler.process(source, **kwargs)}, '
+        f"TIMESTAMPTZ '{BUCKET_ORIGIN.isoformat()}')"
+    )
+
+
+@compiles(date_bin, 'sqlite')
+def _compile_date_bin_sqlite(element, compiler, **kwargs):
+    stride, source = element.clauses
+    stride = compiler.process(stride)
+    origin = int(BUCKET_ORIGIN.timestamp())
+    return (
+        f"datetime((CAST(strftime('%s', {compiler.process(source, **kwargs)})"
+        f' AS INTEGER) - {origin}) / {stride} * {stride} + {origin},'
+        f" 'unixepoch')"
+    )
+
+
+class epoch(FunctionElement):
+    """Seconds since the Unix epoch of a timestamp, with fractions."""
+    name = 'epoch'
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(epoch)
+def _compile_epoch(element, compiler, **kwargs):
+    source = compiler.process(element.clauses, **kwargs)
+    return f'EXTRACT(EPOCH FROM {source})'
+
+
+@compiles(epoch, 'sqlite')
+def _compile_epoch_sqlite(element, compiler, **kwargs):
+    source = compiler.process(element.clauses, **kwargs)
+    return f'((julianday({source}) - 2440587.5) * 86400.0)'
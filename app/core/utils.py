@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Return an aware UTC datetime, naive values are treated as UTC."""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def event_type_value(event_type) -> str:
+    """Value of an event type given as the enum, its value, or the
+    `EventType.NAME` text Python 3.11 formats the enum as in keys."""
+    value = getattr(event_type, 'value', event_type)
+    prefix, _, name = value.partition('.')
+    if prefix == 'EventType' and name:
+        return name.lower()
+    return value
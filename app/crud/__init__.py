@@ -1,2 +1,3 @@
-from app.crud.analytics import get_stats_summary #noqa
-from app.crud.event import create_event, get_event, get_events, update_stats# noqa
+from app.crud.analytics import count_events_by_type, count_hourly_events, get_daily_summary, get_funnel, get_hourly_aggregations, get_late_event_hours, get_query_result, get_recent_activity, get_retention_cohorts, get_retention_matrix, get_stats_summary, get_user_behavior_metrics, run_analytics_query, user_id_partition #noqa
+from app.crud.event import create_event, delete_events, get_event, get_events, get_oldest_event_timestamp, stream_events, update_stats# noqa
+from app.crud.session import calculate_sessions, get_session_stats, replace_user_sessions #noqa
@@ -1,10 +1,25 @@
-from datetime import timedelta
-from typing import Any
+import hashlib
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from enum import Enum
+from typing import Any, Optional
+from uuid import UUID
 
-from sqlalchemy import distinct, func, select
+from sqlalchemy import and_, cast, distinct, func, or_, select, String
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Event
+from app.core.config import settings
+from app.core.sql import date_bin
+from app.core.utils import as_utc
+from app.models import Event, UserSession
+from app.schemas import (
+    AnalyticsQuery, FunnelQuery, RetentionPeriod, TimeBucket,
+)
+from app.schemas.analytics import DATA_DIMENSION_PREFIX
+from app.services import FunnelCounter, redis_service
+
+FUNNEL_CHUNK_SIZE = 10000
+HOUR = timedelta(hours=1)
 
 
 async def get_stats_summary(session: AsyncSession) -> dict[str: Any]:
@@ -27,7 +42,7 @@ async def get_stats_summary(session: AsyncSession) -> dict[str: Any]:
             ).group_by(Event.event_type))
     ).all()
     last_24h_events = await session.scalar(select(func.count(Event.id).filter(
-        Event.timestamp >= ( - timedelta(hours=24)),
+        Event.timestamp >= datetime.now(timezone.utc) - timedelta(hours=24),
     )))
 
     return dict(
@@ -36,3 +51,454 @@ async def get_stats_summary(session: AsyncSession) -> dict[str: Any]:
         events_by_type=dict(events_by_type) or {},
         last_24h_events=(last_24h_events or 0),
     )
+
+
+BUCKET_WIDTHS = {
+    TimeBucket.MINUTE: timedelta(minutes=1),
+    TimeBucket.FIVE_MINUTES: timedelta(minutes=5),
+    TimeBucket.FIFTEEN_MINUTES: timedelta(minutes=15),
+    TimeBucket.HOUR: timedelta(hours=1),
+    TimeBucket.DAY: timedelta(days=1),
+    TimeBucket.WEEK: timedelta(weeks=1),
+}
+
+
+def _data_value(key: str):
+    """Text value of a key inside the event data."""
+    return cast(Event.data[key].as_string(), String)
+
+
+def _dimension_column(dimension: str, bucket: TimeBucket):
+    if dimension == 'event_type':
+        return Event.event_type
+    if dimension == 'time':
+        return date_bin(BUCKET_WIDTHS[bucket], Event.timestamp)
+    return _data_value(dimension.removeprefix(DATA_DIMENSION_PREFIX))
+
+
+def _format_dimension(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return as_utc(value).isoformat()
+    return value
+
+
+def get_query_hash(query: AnalyticsQuery) -> str:
+    """Hash of the normalized query, used as a cache key."""
+    return hashlib.sha256(json.dumps(
+        query.model_dump(mode='json'), sort_keys=True, separators=(',', ':'),
+    ).encode()).hexdigest()
+
+
+async def run_analytics_query(
+    session: AsyncSession, query: AnalyticsQuery, end: datetime,
+) -> list[dict[str, Any]]:
+    """Compile the query into one grouped aggregate and run it."""
+    labels = [f'dimension_{index}' for index in range(len(query.group_by))]
+    statement = select(
+        *(
+            _dimension_column(dimension, query.bucket).label(label)
+            for dimension, label in zip(query.group_by, labels)
+        ),
+        func.count(Event.id),
+        func.count(distinct(Event.user_id)),
+    ).where(
+        Event.timestamp >= query.start, Event.timestamp < end,
+    )
+    if query.event_types:
+        statement = statement.where(Event.event_type.in_(query.event_types))
+    if query.user_id:
+        statement = statement.where(Event.user_id == query.user_id)
+    for key, value in query.data_filters.items():
+        statement = statement.where(_data_value(key) == value)
+    if labels:
+        statement = statement.group_by(*labels).order_by(*labels)
+
+    rows = await session.execute(statement.limit(query.limit))
+    return [
+        dict(
+            zip(query.group_by, map(_format_dimension, row[:len(labels)])),
+            events=row[-2],
+            unique_users=row[-1],
+        )
+        for row in rows
+    ]
+
+
+async def get_query_result(
+    session: AsyncSession, query: AnalyticsQuery,
+) -> dict[str, Any]:
+    """Get the query result from the cache or compute and cache it.
+
+    Closed ranges in the past are cached for long, open ones briefly.
+    """
+    query_hash = get_query_hash(query)
+    cached_result = await redis_service.get_cached_query_result(query_hash)
+    if cached_result:
+        return dict(cached_result, cached=True)
+
+    now = datetime.now(timezone.utc)
+    is_closed = query.end is not None and query.end <= now
+    end = query.end if is_closed else now
+    result = dict(
+        query_hash=query_hash,
+        cached=False,
+        start=query.start.isoformat(),
+        end=end.isoformat(),
+        rows=await run_analytics_query(session, query, end),
+    )
+    await redis_service.cache_query_result(
+        query_hash,
+        result,
+        timedelta(seconds=(
+            settings.analytics_query_closed_ttl if is_closed
+            else settings.analytics_query_open_ttl
+        )),
+    )
+    return result
+
+
+async def get_funnel(
+    session: AsyncSession, query: FunnelQuery,
+) -> dict[str, Any]:
+    """Compute the funnel in one pass over (user, type, timestamp) chunks.
+
+    Events of the last step may happen up to a window after the range end.
+    """
+    window = timedelta(seconds=query.window_seconds)
+    counter = FunnelCounter(query.steps, window, query.end)
+    result = await session.stream(
+        select(Event.user_id, Event.event_type, Event.timestamp).where(
+            Event.event_type.in_(set(query.steps)),
+            Event.timestamp >= query.start,
+            Event.timestamp < query.end + window,
+        ).order_by(
+            Event.user_id, Event.timestamp, Event.id,
+        ).execution_options(yield_per=FUNNEL_CHUNK_SIZE),
+    )
+    async for rows in result.partitions(FUNNEL_CHUNK_SIZE):
+        for user_id, event_type, timestamp in rows:
+            counter.add(user_id, event_type, timestamp)
+    return dict(
+        start=query.start.isoformat(),
+        end=query.end.isoformat(),
+        window_seconds=query.window_seconds,
+        steps=counter.result(),
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+async def get_retention_cohorts(
+    session: AsyncSession,
+    cohort_width: timedelta,
+    start: datetime,
+    end: datetime,
+    first_cohort: datetime,
+) -> dict[datetime, int]:
+    """Count users active in the range by the cohort of their first event.
+
+    Cohorts are `cohort_width` buckets of the first seen timestamp,
+    cohorts older than `first_cohort` are skipped.
+    """
+    active_users = select(Event.user_id).where(
+        Event.timestamp >= start, Event.timestamp < end,
+    ).distinct().subquery()
+    first_seen = select(
+        active_users.c.user_id,
+        select(func.min(Event.timestamp)).where(
+            Event.user_id == active_users.c.user_id,
+        ).scalar_subquery().label('first_seen'),
+    ).subquery()
+    cohort = date_bin(cohort_width, first_seen.c.first_seen).label('cohort')
+    rows = await session.execute(
+        select(cohort, func.count()).where(
+            first_seen.c.first_seen >= first_cohort,
+        ).group_by('cohort'),
+    )
+    return {as_utc(cohort): users for cohort, users in rows}
+
+
+async def get_retention_matrix(
+    period: RetentionPeriod, cohorts: int,
+) -> dict[str, Any]:
+    """Get the latest cohorts of the retention matrix from Redis."""
+    today = datetime.now(timezone.utc).date()
+    if period == RetentionPeriod.DAILY:
+        step, latest_cohort = timedelta(days=1), today - timedelta(days=1)
+    else:
+        step = timedelta(weeks=1)
+        latest_cohort = today - timedelta(days=today.weekday())
+    cohort_dates = [
+        (latest_cohort - step * index).isoformat()
+        for index in reversed(range(cohorts))
+    ]
+    rows = await redis_service.get_retention_rows(period.value, cohort_dates)
+    matrix = []
+    for cohort in cohort_dates:
+        row = rows.get(cohort)
+        if not row:
+            continue
+        size = row.get(0, 0)
+        retained = [row.get(offset, 0) for offset in range(max(row) + 1)]
+        matrix.append(dict(
+            cohort=cohort,
+            size=size,
+            retained=retained,
+            rates=[
+                round(users / size, 4) if size else 0.0 for users in retained
+            ],
+        ))
+    return dict(period=period, cohorts=matrix)
+
+
+def user_id_partition(
+    index: int, partitions: int,
+) -> tuple[UUID, Optional[UUID]]:
+    """Bounds of an equal range of the UUID space.
+
+    Random UUIDs are uniformly spread, so ranges split users evenly.
+    """
+    space = 2 ** 128
+    upper_bound = None if index == partitions - 1 else UUID(
+        int=(index + 1) * space // partitions,
+    )
+    return UUID(int=index * space // partitions), upper_bound
+
+
+def _filter_users(
+    statement,
+    user_column,
+    user_id: Optional[UUID],
+    user_id_range: Optional[tuple[UUID, Optional[UUID]]],
+):
+    if user_id is not None:
+        statement = statement.where(user_column == user_id)
+    if user_id_range is not None:
+        lower_bound, upper_bound = user_id_range
+        statement = statement.where(user_column >= lower_bound)
+        if upper_bound is not None:
+            statement = statement.where(user_column < upper_bound)
+    return statement
+
+
+async def get_user_behavior_metrics(
+    session: AsyncSession,
+    since: datetime,
+    user_id: Optional[UUID] = None,
+    user_id_range: Optional[tuple[UUID, Optional[UUID]]] = None,
+) -> list[dict[str, Any]]:
+    """Per-user metrics since the moment.
+
+    Event counts come from one grouped query over events, session
+    counts and durations from the persisted session summaries.
+    """
+    event_rows = await session.execute(_filter_users(
+        select(
+            Event.user_id,
+            func.count(Event.id),
+            func.count(distinct(Event.event_type)),
+            func.min(Event.timestamp),
+            func.max(Event.timestamp),
+        ).where(Event.timestamp >= since).group_by(Event.user_id),
+        Event.user_id,
+        user_id,
+        user_id_range,
+    ))
+    session_rows = await session.execute(_filter_users(
+        select(
+            UserSession.user_id,
+            func.count(UserSession.id),
+            func.sum(UserSession.duration_seconds),
+        ).where(
+            UserSession.ended_at >= since,
+        ).group_by(UserSession.user_id),
+        UserSession.user_id,
+        user_id,
+        user_id_range,
+    ))
+    user_sessions = {
+        row_user_id: (sessions, duration)
+        for row_user_id, sessions, duration in session_rows
+    }
+
+    now = datetime.now(timezone.utc).isoformat()
+    metrics = []
+    for row_user_id, events, event_types, first_event, last_event in (
+        event_rows
+    ):
+        sessions, duration = user_sessions.get(row_user_id, (0, 0.0))
+        metrics.append(dict(
+            user_id=str(row_user_id),
+            events_count=events,
+            session_count=sessions,
+            session_duration_seconds=duration,
+            event_types_count=event_types,
+            first_event_at=as_utc(first_event).isoformat(),
+            last_event_at=as_utc(last_event).isoformat(),
+            timestamp=now,
+        ))
+    return metrics
+
+
+def _hour_ranges(hours: list[datetime]) -> list[list[datetime]]:
+    """Merge hours into contiguous `[start, end)` ranges."""
+    ranges = []
+    for hour in sorted(hours):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1][1] = hour + HOUR
+        else:
+            ranges.append([hour, hour + HOUR])
+    return ranges
+
+
+async def get_hourly_aggregations(
+    session: AsyncSession, hours: list[datetime],
+) -> dict[str, dict[str, Any]]:
+    """Event counts by type and unique users of every given clock hour."""
+    aggregations = {
+        hour: dict(events_by_type={}, unique_users=0, total_events=0)
+        for hour in sorted(hours)
+    }
+    if not hours:
+        return {}
+    in_hours = or_(*(
+        and_(Event.timestamp >= start, Event.timestamp < end)
+        for start, end in _hour_ranges(hours)
+    ))
+    bucket = date_bin(HOUR, Event.timestamp).label('hour')
+    events_by_type = await session.execute(
+        select(bucket, Event.event_type, func.count(Event.id))
+        .where(in_hours)
+        .group_by(bucket, Event.event_type),
+    )
+    for hour, event_type, events in events_by_type:
+        aggregation = aggregations[as_utc(hour)]
+        aggregation['events_by_type'][event_type] = events
+        aggregation['total_events'] += events
+    unique_users = await session.execute(
+        select(bucket, func.count(distinct(Event.user_id)))
+        .where(in_hours)
+        .group_by(bucket),
+    )
+    for hour, users in unique_users:
+        aggregations[as_utc(hour)]['unique_users'] = users
+    timestamp = datetime.now(timezone.utc).isoformat()
+    return {
+        hour.strftime('%Y-%m-%d-%H'): dict(
+            period='hourly',
+            hour=hour.strftime('%Y-%m-%d %H:00'),
+            **aggregation,
+            timestamp=timestamp,
+        )
+        for hour, aggregation in aggregations.items()
+    }
+
+
+async def get_late_event_hours(
+    session: AsyncSession,
+    ingested_since: datetime,
+    ingested_before: datetime,
+    start: datetime,
+    end: datetime,
+) -> list[datetime]:
+    """Hours of the range that received events in the ingestion window."""
+    bucket = date_bin(HOUR, Event.timestamp)
+    hours = await session.scalars(
+        select(bucket).distinct().where(
+            Event.ingested_at >= ingested_since,
+            Event.ingested_at < ingested_before,
+            Event.timestamp >= start,
+            Event.timestamp < end,
+        ),
+    )
+    return sorted(as_utc(hour) for hour in hours)
+
+
+async def get_daily_summary(
+    session: AsyncSession, day: date,
+) -> dict[str, Any]:
+    """Event counts and unique users by event type of a UTC day."""
+    start_of_day = datetime.combine(day, time.min, timezone.utc)
+    end_of_day = start_of_day + timedelta(days=1)
+    daily_stats_result = await session.execute(select(
+        Event.event_type,
+        func.count(Event.id),
+        func.count(distinct(Event.user_id)),
+    ).where(
+        Event.timestamp >= start_of_day, Event.timestamp < end_of_day,
+    ).group_by(Event.event_type))
+    daily_stats = [
+        dict(event_type=event_type, count=count, unique_users=unique_users)
+        for event_type, count, unique_users in daily_stats_result
+    ]
+    return dict(
+        date=day.isoformat(),
+        total_events=sum(event['count'] for event in daily_stats),
+        total_users=sum(event['unique_users'] for event in daily_stats),
+        events_by_type=daily_stats,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+async def count_events_by_type(
+    session: AsyncSession,
+    user_id_range: Optional[tuple[UUID, Optional[UUID]]] = None,
+) -> dict[str, int]:
+    """Number of events of every type."""
+    rows = await session.execute(_filter_users(
+        select(Event.event_type, func.count(Event.id)),
+        Event.user_id, None, user_id_range,
+    ).group_by(Event.event_type))
+    return {event_type.value: events for event_type, events in rows}
+
+
+async def count_hourly_events(
+    session: AsyncSession,
+    since: datetime,
+    user_id_range: Optional[tuple[UUID, Optional[UUID]]] = None,
+) -> dict[tuple[str, datetime], int]:
+    """Number of events of every type and clock hour of ingestion since
+    the moment, as the live counters count them."""
+    bucket = date_bin(HOUR, Event.ingested_at).label('hour')
+    rows = await session.execute(_filter_users(
+        select(Event.event_type, bucket, func.count(Event.id)),
+        Event.user_id, None, user_id_range,
+    ).where(Event.ingested_at >= since).group_by(Event.event_type, bucket))
+    return {
+        (event_type.value, as_utc(hour)): events
+        for event_type, hour, events in rows
+    }
+
+
+async def get_recent_activity(
+    session: AsyncSession,
+    since: datetime,
+    limit: int,
+    user_id_range: Optional[tuple[UUID, Optional[UUID]]] = None,
+) -> dict[UUID, list[dict[str, Any]]]:
+    """Latest events of users active since the moment, newest first."""
+    ranked = _filter_users(
+        select(
+            Event.user_id,
+            Event.event_type,
+            Event.timestamp,
+            func.row_number().over(
+                partition_by=Event.user_id,
+                order_by=(Event.timestamp.desc(), Event.id.desc()),
+            ).label('rank'),
+        ),
+        Event.user_id, None, user_id_range,
+    ).where(Event.timestamp >= since).subquery()
+    rows = await session.execute(
+        select(ranked.c.user_id, ranked.c.event_type, ranked.c.timestamp)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.user_id, ranked.c.rank),
+    )
+    activity = {}
+    for user_id, event_type, timestamp in rows:
+        activity.setdefault(user_id, []).append(dict(
+            event_type=event_type.value,
+            timestamp=as_utc(timestamp).isoformat(),
+        ))
+    return activity
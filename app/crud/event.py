@@ -1,10 +1,12 @@
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, Optional, Sequence
 from uuid import UUID
 
-from sqlalchemy import desc, select
+from sqlalchemy import delete, desc, func, Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.validators import check_event_exists
+from app.core.metrics import events_ingested
 from app.models import Event
 from app.services import redis_service
 from app.schemas import EventCreate
@@ -14,7 +16,7 @@ async def create_event(
     event: EventCreate, user_id: UUID, session: AsyncSession,
 ) -> Event:
     """Create new event."""
-    event_dict = event.model_dump()
+    event_dict = event.model_dump(exclude_none=True)
     event_dict['user_id'] = user_id
     event = Event(**event_dict)
     session.add(event)
@@ -25,6 +27,7 @@ async def create_event(
 
 async def update_stats(event_type: str, user_id: str) -> None:
     """Update Redis Statistics."""
+    events_ingested.labels(getattr(event_type, 'value', event_type)).inc()
     await redis_service.increment_event_counter(event_type)
     await redis_service.increment_hourly_event(event_type)
     await redis_service.add_user_activity(user_id, event_type)
@@ -57,3 +60,47 @@ async def get_events(
     if limit:
         query = query.limit(limit)
     return (await session.scalars(query)).all()
+
+
+async def stream_events(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    chunk_size: int,
+) -> AsyncIterator[Sequence[Row]]:
+    """Stream events of the time range in chunks from a server-side cursor."""
+    result = await session.stream(
+        select(
+            Event.id,
+            Event.user_id,
+            Event.event_type,
+            Event.timestamp,
+            Event.data,
+        ).where(
+            Event.timestamp >= start, Event.timestamp < end,
+        ).order_by(
+            Event.timestamp, Event.id,
+        ).execution_options(yield_per=chunk_size),
+    )
+    async for rows in result.partitions(chunk_size):
+        yield rows
+
+
+async def get_oldest_event_timestamp(
+    session: AsyncSession, before: datetime,
+) -> Optional[datetime]:
+    """Timestamp of the oldest event earlier than the moment."""
+    return await session.scalar(
+        select(func.min(Event.timestamp)).where(Event.timestamp < before),
+    )
+
+
+async def delete_events(
+    session: AsyncSession, event_ids: Sequence[int],
+) -> int:
+    """Delete events by id in a transaction of their own."""
+    result = await session.execute(
+        delete(Event).where(Event.id.in_(event_ids)),
+    )
+    await session.commit()
+    return result.rowcount
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import case, delete, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.sql import epoch
+from app.core.utils import as_utc
+from app.models import Event, UserSession
+
+
+async def calculate_sessions(
+    session: AsyncSession, start: datetime, end: datetime, gap: timedelta,
+) -> list[dict[str, Any]]:
+    """Split events of the range into sessions by the inactivity gap.
+
+    An event starts a new session when the previous event of the user
+    is more than `gap` earlier, numbering is a running sum of starts.
+    """
+    ordering = (Event.timestamp, Event.id)
+    ordered = select(
+        Event.id,
+        Event.user_id,
+        Event.timestamp,
+        func.lag(Event.timestamp).over(
+            partition_by=Event.user_id, order_by=ordering,
+        ).label('previous_timestamp'),
+    ).where(
+        Event.timestamp >= start, Event.timestamp < end,
+    ).subquery()
+    is_session_start = case(
+        (or_(
+            ordered.c.previous_timestamp.is_(None),
+            epoch(ordered.c.timestamp) - epoch(ordered.c.previous_timestamp)
+            > gap.total_seconds(),
+        ), 1),
+        else_=0,
+    )
+    numbered = select(
+        ordered.c.user_id,
+        ordered.c.timestamp,
+        func.sum(is_session_start).over(
+            partition_by=ordered.c.user_id,
+            order_by=(ordered.c.timestamp, ordered.c.id),
+        ).label('session_number'),
+    ).subquery()
+    rows = await session.execute(
+        select(
+            numbered.c.user_id,
+            func.min(numbered.c.timestamp),
+            func.max(numbered.c.timestamp),
+            func.count(),
+        ).group_by(numbered.c.user_id, numbered.c.session_number),
+    )
+    sessions = []
+    for user_id, started_at, ended_at, event_count in rows:
+        started_at, ended_at = as_utc(started_at), as_utc(ended_at)
+        sessions.append(dict(
+            user_id=user_id,
+            started_at=started_at,
+            ended_at=ended_at,
+            event_count=event_count,
+            duration_seconds=(ended_at - started_at).total_seconds(),
+        ))
+    return sessions
+
+
+async def replace_user_sessions(
+    session: AsyncSession, since: datetime, sessions: list[dict[str, Any]],
+) -> None:
+    """Replace persisted sessions started since the moment."""
+    await session.execute(
+        delete(UserSession).where(UserSession.started_at >= since),
+    )
+    if sessions:
+        await session.execute(insert(UserSession), sessions)
+    await session.commit()
+
+
+async def get_session_stats(
+    session: AsyncSession, start: datetime, end: datetime,
+) -> dict[str, Any]:
+    """Summary of persisted sessions started in the range."""
+    sessions, users, average_duration, average_events = (
+        await session.execute(select(
+            func.count(UserSession.id),
+            func.count(UserSession.user_id.distinct()),
+            func.avg(UserSession.duration_seconds),
+            func.avg(UserSession.event_count),
+        ).where(
+            UserSession.started_at >= start, UserSession.started_at < end,
+        ))
+    ).one()
+    return dict(
+        start=start.isoformat(),
+        end=end.isoformat(),
+        sessions=sessions,
+        users=users,
+        average_duration_seconds=round(average_duration or 0, 2),
+        average_events_per_session=round(average_events or 0, 2),
+    )
@@ -9,7 +9,9 @@ from dotenv import load_dotenv
 from app.api.routers import main_router
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.services import listen_redis_updates
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.services import listen_redis_updates, LoopMonitor
 
 load_dotenv()
 setup_logging()
@@ -18,15 +20,20 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Run a background redis listener, when the app starts."""
+    """Run a background redis listener and the event loop monitor."""
     redis_task = asyncio.create_task(listen_redis_updates())
     logger.info('Redis WebSocket listener started')
+    monitor_task = asyncio.create_task(LoopMonitor(
+        settings.loop_monitor_interval_ms / 1000,
+        settings.loop_lag_threshold_ms / 1000,
+    ).run())
     yield
-    redis_task.cancel()
-    try:
-        await redis_task
-    except asyncio.CancelledError:
-        pass
+    for task in (monitor_task, redis_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
     logger.info('Redis WebSocket listener stopped')
 
 
@@ -35,6 +42,8 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(main_router)
 
 @app.get('/')
@@ -48,5 +57,6 @@ async def root():
             realtime_stats='/analytics/stats/realtime',
             websocket='/ws/dashboard',
             health='/health/',
+            metrics='/metrics',
         ),
     )
@@ -1,2 +1,3 @@
 from app.models.event import Event, EventType #noqa
+from app.models.session import UserSession #noqa
 from app.models.user import User #noqa
@@ -28,6 +28,12 @@ class Event(Base):
         server_default=func.now(),
         nullable=False,
     )
+    ingested_at = Column(
+        DateTime(timezone=True),
+        index=True,
+        server_default=func.now(),
+        nullable=False,
+    )
     data = Column(JSON, default=lambda: dict)
 
     def __repr__(self):
@@ -0,0 +1,24 @@
+from sqlalchemy import (
+    Column, DateTime, Float, ForeignKey, Index, Integer, UUID,
+)
+
+from app.core.db import Base
+
+
+class UserSession(Base):
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey('user.id'),
+        nullable=False,
+    )
+    started_at = Column(DateTime(timezone=True), index=True, nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+    event_count = Column(Integer, nullable=False)
+    duration_seconds = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index('ix_usersession_user_id_started_at', 'user_id', 'started_at'),
+    )
+
+    def __repr__(self):
+        return f'<UserSession {self.id} user:{self.user_id}>'
@@ -1,4 +1,4 @@
-from app.schemas.analytics import StatsSummary #noqa
+from app.schemas.analytics import AnalyticsQuery, AnalyticsQueryResult, FunnelQuery, FunnelResult, FunnelStep, RetentionCohort, RetentionMatrix, RetentionPeriod, SessionStats, StatsSummary, TimeBucket #noqa
 from app.schemas.event import Event, EventBase, EventCreate #noqa
 from app.schemas.health import Health #noqa
 from app.schemas.user import UserCreate, UserRead, UserUpdate #noqa
\ No newline at end of file
@@ -1,4 +1,17 @@
-from pydantic import BaseModel
+import re
+from datetime import date, datetime as dt
+from enum import Enum
+from typing import Any, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from app.core.utils import as_utc
+from app.models import EventType
+
+DATA_DIMENSION_PREFIX = 'data.'
+DATA_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{1,64}$')
+BASE_DIMENSIONS = ('event_type', 'time')
 
 
 class StatsSummary(BaseModel):
@@ -6,3 +19,149 @@ class StatsSummary(BaseModel):
     total_users: int
     events_by_type: dict[str, int]
     last_24h_events: int
+
+
+class TimeBucket(str, Enum):
+    MINUTE = '1 minute'
+    FIVE_MINUTES = '5 minutes'
+    FIFTEEN_MINUTES = '15 minutes'
+    HOUR = '1 hour'
+    DAY = '1 day'
+    WEEK = '1 week'
+
+
+def _check_data_key(key: str) -> str:
+    if not DATA_KEY_PATTERN.match(key):
+        raise ValueError(f'Invalid data key: {key}')
+    return key
+
+
+class AnalyticsQuery(BaseModel):
+    """Ad-hoc aggregate over events.
+
+    `group_by` accepts `event_type`, `time` (bucketed by `bucket`)
+    and `data.<key>` for keys inside the event data. Without `end`
+    the range stays open up to the current moment.
+    """
+    start: dt
+    end: Optional[dt] = None
+    group_by: list[str] = Field(default_factory=list, max_length=5)
+    bucket: TimeBucket = TimeBucket.HOUR
+    event_types: list[EventType] = Field(default_factory=list)
+    user_id: Optional[UUID] = None
+    data_filters: dict[str, str] = Field(default_factory=dict, max_length=10)
+    limit: int = Field(1000, ge=1, le=10000)
+
+    @field_validator('group_by')
+    @classmethod
+    def check_group_by(cls, group_by: list[str]) -> list[str]:
+        for dimension in group_by:
+            if dimension.startswith(DATA_DIMENSION_PREFIX):
+                _check_data_key(dimension.removeprefix(DATA_DIMENSION_PREFIX))
+            elif dimension not in BASE_DIMENSIONS:
+                raise ValueError(f'Unknown dimension: {dimension}')
+        if len(set(group_by)) != len(group_by):
+            raise ValueError('Dimensions must be unique')
+        return group_by
+
+    @field_validator('event_types')
+    @classmethod
+    def normalize_event_types(
+        cls, event_types: list[EventType],
+    ) -> list[EventType]:
+        return sorted(set(event_types), key=lambda item: item.value)
+
+    @field_validator('data_filters')
+    @classmethod
+    def check_data_filters(
+        cls, data_filters: dict[str, str],
+    ) -> dict[str, str]:
+        for key in data_filters:
+            _check_data_key(key)
+        return dict(sorted(data_filters.items()))
+
+    @model_validator(mode='after')
+    def check_range(self) -> 'AnalyticsQuery':
+        self.start = as_utc(self.start)
+        if self.end is not None:
+            self.end = as_utc(self.end)
+        if self.end is not None and self.start >= self.end:
+            raise ValueError('The start must be earlier than the end')
+        return self
+
+
+class AnalyticsQueryResult(BaseModel):
+    query_hash: str
+    cached: bool
+    start: dt
+    end: dt
+    rows: list[dict[str, Any]]
+
+
+DEFAULT_FUNNEL_STEPS = [
+    EventType.PAGE_VIEW, EventType.CLICK, EventType.PURCHASE,
+]
+
+
+class FunnelQuery(BaseModel):
+    """Ordered funnel over a time range.
+
+    A user enters the funnel by the first step inside the range, the
+    following steps must happen in order within `window_seconds`.
+    """
+    start: dt
+    end: dt
+    steps: list[EventType] = Field(
+        default_factory=lambda: list(DEFAULT_FUNNEL_STEPS),
+        min_length=2,
+        max_length=10,
+    )
+    window_seconds: int = Field(3600, ge=1, le=7 * 24 * 3600)
+
+    @model_validator(mode='after')
+    def check_range(self) -> 'FunnelQuery':
+        self.start, self.end = as_utc(self.start), as_utc(self.end)
+        if self.start >= self.end:
+            raise ValueError('The start must be earlier than the end')
+        return self
+
+
+class FunnelStep(BaseModel):
+    event_type: EventType
+    users: int
+    conversion_rate: float
+    step_conversion_rate: float
+
+
+class FunnelResult(BaseModel):
+    start: dt
+    end: dt
+    window_seconds: int
+    steps: list[FunnelStep]
+    timestamp: dt
+
+
+class RetentionPeriod(str, Enum):
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+
+
+class RetentionCohort(BaseModel):
+    cohort: date
+    size: int
+    retained: list[int]
+    rates: list[float]
+
+
+class RetentionMatrix(BaseModel):
+    period: RetentionPeriod
+    cohorts: list[RetentionCohort]
+
+
+class SessionStats(BaseModel):
+    start: dt
+    end: dt
+    sessions: int
+    users: int
+    average_duration_seconds: float
+    average_events_per_session: float
@@ -1,9 +1,11 @@
-from datetime import datetime as dt
-from typing import Any
+from datetime import datetime as dt, timedelta, timezone
+from typing import Any, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator
 
+from app.core.config import settings
+from app.core.utils import as_utc
 from app.models import EventType
 
 
@@ -14,7 +16,25 @@ class EventBase(BaseModel):
 
 
 class EventCreate(EventBase):
-    pass
+    """Event to ingest.
+
+    `timestamp` backdates a late event, it is taken from superusers
+    only and must be within the event retention.
+    """
+    timestamp: Optional[dt] = None
+
+    @field_validator('timestamp')
+    @classmethod
+    def check_timestamp(cls, timestamp: Optional[dt]) -> Optional[dt]:
+        if timestamp is None:
+            return None
+        timestamp = as_utc(timestamp)
+        now = dt.now(timezone.utc)
+        if timestamp > now:
+            raise ValueError('The timestamp must not be in the future')
+        if timestamp < now - timedelta(days=settings.event_retention_days):
+            raise ValueError('The timestamp must be within the retention')
+        return timestamp
 
 
 class Event(EventBase):
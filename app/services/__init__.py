@@ -1,3 +1,7 @@
 from app.services.background_tasks import listen_redis_updates #noqa
+from app.services.loop_monitor import LoopMonitor #noqa
 from app.services.redis_service import redis_service #noqa
 from app.services.websocket_manager import manager #noqa
+from app.services.parquet_writer import ParquetExporter, daily_partitions #noqa
+from app.services.event_archive import archive_batch_dir, archived_ids, read_archived_events #noqa
+from app.services.funnel import FunnelCounter #noqa
@@ -8,8 +8,12 @@ logger = logging.getLogger(__name__)
 
 
 async def listen_redis_updates() -> None:
-    """Listen to Redis pub/sub and sends updates via WebSocket."""
-    pubsub = redis_service._client.pubsub()
+    """Listen to Redis pub/sub and sends updates via WebSocket.
+
+    The client decodes responses, so messages arrive as text.
+    """
+    async with redis_service.get_client() as client:
+        pubsub = client.pubsub()
     await pubsub.subscribe(DASHBOARD_UPDATES)
     logger.info(
         'Subscribed to Redis channel',
@@ -19,7 +23,7 @@ async def listen_redis_updates() -> None:
     async for message in pubsub.listen():
         if message['type'] == 'message':
             try:
-                await manager.broadcast(message['data'].decode('utf-8'))
+                await manager.broadcast(message['data'])
             except Exception as error:
                 logger.error(
                     'Error processing Redis message',
@@ -0,0 +1,141 @@
+import asyncio
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import (
+    Any, AsyncIterator, Iterable, Iterator, Optional, Sequence,
+)
+from uuid import UUID
+
+import pyarrow.parquet as pq
+
+from app.core.utils import as_utc
+from app.services.parquet_writer import (
+    DATA_COLUMN_PREFIX,
+    JSON_COLUMN_METADATA,
+    MANIFEST_NAME,
+    daily_partitions,
+)
+
+BATCH_DIR_PREFIX = 'archived_at='
+BATCH_DIR_FORMAT = '%Y%m%dT%H%M%S'
+
+
+def archive_batch_dir(archive_dir: str, archived_at: datetime) -> Path:
+    """Directory of one archival run, so reruns never reset partitions.
+
+    Layout: `{archive_dir}/archived_at=YYYYMMDDTHHMMSS/date=YYYY-MM-DD/`.
+    """
+    return Path(archive_dir) / (
+        f'{BATCH_DIR_PREFIX}{as_utc(archived_at).strftime(BATCH_DIR_FORMAT)}'
+    )
+
+
+def _read_ids(path: Path) -> list[int]:
+    return pq.read_table(path, columns=['id']).column('id').to_pylist()
+
+
+async def archived_ids(
+    batch_dir: Path, manifests: Sequence[dict[str, Any]],
+) -> AsyncIterator[list[int]]:
+    """Ids of events written by an archival run, a list per file read
+    in a worker thread."""
+    for manifest in manifests:
+        partition_dir = batch_dir / f'date={manifest["date"]}'
+        for file in manifest['files']:
+            yield await asyncio.to_thread(
+                _read_ids, partition_dir / file['path'],
+            )
+
+
+def _manifest_paths(archive_dir: str, days: Sequence[date]) -> Iterator[Path]:
+    """Manifests of complete partitions of the days from every run."""
+    for day in days:
+        yield from sorted(Path(archive_dir).glob(
+            f'{BATCH_DIR_PREFIX}*/date={day.isoformat()}/{MANIFEST_NAME}',
+        ))
+
+
+def _archived_event(
+    row: dict[str, Any], json_columns: set[str],
+) -> dict[str, Any]:
+    """Event with `data` rebuilt from its flattened columns."""
+    data = {}
+    for column, value in row.items():
+        if not column.startswith(DATA_COLUMN_PREFIX) or value is None:
+            continue
+        data[column.removeprefix(DATA_COLUMN_PREFIX)] = (
+            json.loads(value) if column in json_columns else value
+        )
+    return dict(
+        id=row['id'],
+        user_id=row['user_id'],
+        event_type=row['event_type'],
+        timestamp=row['timestamp'],
+        data=data,
+    )
+
+
+def _overlapping_files(
+    archive_dir: str, start: datetime, end: datetime,
+) -> list[tuple[datetime, Path]]:
+    """Files of complete partitions overlapping the range by their first
+    timestamp, with the timestamp."""
+    _, _, days = daily_partitions(start, end)
+    files = []
+    for manifest_path in _manifest_paths(archive_dir, days):
+        for file in json.loads(manifest_path.read_text())['files']:
+            min_timestamp = datetime.fromisoformat(file['min_timestamp'])
+            if (
+                min_timestamp < end
+                and datetime.fromisoformat(file['max_timestamp']) >= start
+            ):
+                files.append(
+                    (min_timestamp, manifest_path.parent / file['path']),
+                )
+    return sorted(files)
+
+
+def _ordered(events: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    return sorted(events, key=lambda event: (event['timestamp'], event['id']))
+
+
+def read_archived_events(
+    archive_dir: str,
+    start: datetime,
+    end: datetime,
+    event_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    user_id: Optional[UUID] = None,
+) -> list[dict[str, Any]]:
+    """Archived events of the time range ordered by timestamp.
+
+    Only files of partitions with a manifest that overlap the range are
+    read, earliest first, with the filters pushed into the reader, and
+    reading stops once later files cannot hold any of the first `limit`
+    events. Events archived by several runs are returned once, `data`
+    keys with null values are not restored.
+    """
+    start, end = as_utc(start), as_utc(end)
+    filters = [('timestamp', '>=', start), ('timestamp', '<', end)]
+    if event_type:
+        filters.append(('event_type', '=', event_type))
+    if user_id:
+        filters.append(('user_id', '=', str(user_id)))
+    events, last_timestamp = {}, None
+    for min_timestamp, path in _overlapping_files(archive_dir, start, end):
+        if last_timestamp is not None and min_timestamp > last_timestamp:
+            break
+        table = pq.read_table(path, filters=filters)
+        json_columns = {
+            field.name for field in table.schema
+            if field.metadata == JSON_COLUMN_METADATA
+        }
+        for row in table.to_pylist():
+            events[row['id']] = _archived_event(row, json_columns)
+        if limit is not None and len(events) >= limit:
+            first_events = _ordered(events.values())[:limit]
+            events = {event['id']: event for event in first_events}
+            if first_events:
+                last_timestamp = first_events[-1]['timestamp']
+    return _ordered(events.values())[:limit]
@@ -0,0 +1,77 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Hashable, Optional, Sequence
+
+from app.core.utils import as_utc
+
+
+def _rate(users: int, base_users: int) -> float:
+    return round(users / base_users, 4) if base_users else 0.0
+
+
+class FunnelCounter:
+    """One-pass funnel over events ordered by user and time.
+
+    For every step the counter keeps the latest funnel start that
+    reached it, so a later attempt of the same user can still convert
+    inside the window. Memory is bounded by the number of steps.
+    """
+
+    def __init__(
+        self,
+        steps: Sequence[Hashable],
+        window: timedelta,
+        entry_end: datetime,
+    ):
+        self.steps = list(steps)
+        self.window = window
+        self.entry_end = as_utc(entry_end)
+        self.users = [0] * len(self.steps)
+        self._step_indexes = defaultdict(list)
+        for index, step in enumerate(self.steps):
+            self._step_indexes[step].insert(0, index)
+        self._user_id = None
+        self._starts: list[Optional[datetime]] = [None] * len(self.steps)
+
+    def add(
+        self, user_id: Hashable, event_type: Hashable, timestamp: datetime,
+    ) -> None:
+        """Feed the next event, events must be ordered by user and time."""
+        if user_id != self._user_id:
+            self._flush_user()
+            self._user_id = user_id
+        timestamp = as_utc(timestamp)
+        for index in self._step_indexes.get(event_type, ()):
+            if index == 0:
+                if timestamp < self.entry_end:
+                    self._starts[0] = timestamp
+                continue
+            previous_start = self._starts[index - 1]
+            if (
+                previous_start is not None
+                and timestamp - previous_start <= self.window
+            ):
+                self._starts[index] = previous_start
+
+    def _flush_user(self) -> None:
+        for index, start in enumerate(self._starts):
+            if start is None:
+                break
+            self.users[index] += 1
+        self._starts = [None] * len(self.steps)
+
+    def result(self) -> list[dict[str, Any]]:
+        """Per-step user counts and conversion rates."""
+        self._flush_user()
+        self._user_id = None
+        return [
+            dict(
+                event_type=step,
+                users=users,
+                conversion_rate=_rate(users, self.users[0]),
+                step_conversion_rate=_rate(
+                    users, self.users[index - 1] if index else users,
+                ),
+            )
+            for index, (step, users) in enumerate(zip(self.steps, self.users))
+        ]
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.core.metrics import event_loop_lag, event_loop_tasks
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures event loop lag and catches code blocking the loop.
+
+    A coroutine sleeps for the interval and records how late it wakes
+    up, together with the number of pending tasks. A watchdog thread
+    logs the stack of the loop thread once the coroutine has been late
+    for longer than the threshold, while the blocking code still runs.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.heartbeat = time.monotonic()
+        self.loop_thread_id = None
+        self.loop = None
+        self._stopped = threading.Event()
+
+    async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self._stopped.clear()
+        watchdog = threading.Thread(
+            target=self._watch, name='loop-watchdog', daemon=True,
+        )
+        watchdog.start()
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                event_loop_lag.observe(
+                    max(now - self.heartbeat - self.interval, 0.0),
+                )
+                event_loop_tasks.set(len(asyncio.all_tasks()))
+                self.heartbeat = now
+        finally:
+            self._stopped.set()
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            self.report_blocked(blocked)
+
+    def report_blocked(self, blocked: float) -> None:
+        """Log the stack of the loop thread and its running task."""
+        frame = sys._current_frames().get(self.loop_thread_id)
+        task = asyncio.current_task(self.loop)
+        logger.warning('Event loop blocked', extra=dict(
+            blocked_ms=round(blocked * 1000, 1),
+            task=task.get_name() if task else None,
+            coroutine=task.get_coro().__qualname__ if task else None,
+            stack=''.join(traceback.format_stack(frame)) if frame else None,
+        ))
@@ -0,0 +1,247 @@
+import json
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import groupby
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.utils import as_utc
+
+COMPRESSION = 'zstd'
+DATA_COLUMN_PREFIX = 'data_'
+JSON_COLUMN_METADATA = {b'encoding': b'json'}
+MANIFEST_NAME = '_manifest.json'
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+EVENT_FIELDS = (
+    pa.field('id', pa.int64(), nullable=False),
+    pa.field('user_id', pa.string(), nullable=False),
+    pa.field('event_type', pa.string(), nullable=False),
+    pa.field('timestamp', pa.timestamp('us', tz='UTC'), nullable=False),
+)
+
+
+def daily_partitions(
+    start: datetime, end: datetime,
+) -> tuple[datetime, datetime, list[date]]:
+    """Widen the range to whole UTC days and list the days it covers."""
+    start, end = as_utc(start), as_utc(end)
+    first_day = start.date()
+    last_day = end.date() if end.time() == time.min else (
+        end.date() + timedelta(days=1)
+    )
+    days = [
+        first_day + timedelta(days=offset)
+        for offset in range((last_day - first_day).days)
+    ]
+    return (
+        datetime.combine(first_day, time.min, timezone.utc),
+        datetime.combine(last_day, time.min, timezone.utc),
+        days,
+    )
+
+
+def _to_json(value: Any) -> str:
+    return json.dumps(value, default=str, sort_keys=True)
+
+
+def _value_kinds(values: Sequence[Any]) -> set[type]:
+    """Types of the non-null values of a data key, integers out of the
+    int64 range counted as floats."""
+    return {
+        float if type(value) is int and not INT64_MIN <= value <= INT64_MAX
+        else type(value)
+        for value in values if value is not None
+    }
+
+
+def _data_column(
+    key: str, kinds: set[type],
+) -> tuple[pa.Field, Callable[[Any], Any]]:
+    """Pick the narrowest Arrow type that fits every kind of a data key.
+
+    Keys with mixed or nested values are stored as JSON text.
+    """
+    name = f'{DATA_COLUMN_PREFIX}{key}'
+    if kinds == {bool}:
+        return pa.field(name, pa.bool_()), bool
+    if kinds == {int}:
+        return pa.field(name, pa.int64()), int
+    if kinds and kinds <= {int, float}:
+        return pa.field(name, pa.float64()), float
+    if kinds <= {str}:
+        return pa.field(name, pa.string()), str
+    return pa.field(name, pa.string(), metadata=JSON_COLUMN_METADATA), _to_json
+
+
+def _event_data(row) -> dict[str, Any]:
+    return row.data if isinstance(row.data, dict) else {}
+
+
+def build_events_table(
+    rows: Sequence, data_kinds: Optional[dict[str, set[type]]] = None,
+) -> pa.Table:
+    """Build an Arrow table with `data` keys flattened into typed columns.
+
+    Types come from `data_kinds`, the kinds of values of every key over
+    a whole export, or from the rows alone.
+    """
+    columns = dict(
+        id=[row.id for row in rows],
+        user_id=[str(row.user_id) for row in rows],
+        event_type=[
+            getattr(row.event_type, 'value', row.event_type) for row in rows
+        ],
+        timestamp=[as_utc(row.timestamp) for row in rows],
+    )
+    fields = list(EVENT_FIELDS)
+    data_keys = sorted({key for row in rows for key in _event_data(row)})
+    for key in data_keys:
+        values = [_event_data(row).get(key) for row in rows]
+        field, convert = _data_column(
+            key, data_kinds[key] if data_kinds else _value_kinds(values),
+        )
+        fields.append(field)
+        columns[field.name] = [
+            None if value is None else convert(value) for value in values
+        ]
+    return pa.Table.from_pydict(columns, schema=pa.schema(fields))
+
+
+def _stored_rows(table: pa.Table) -> list[SimpleNamespace]:
+    """Rows of a written table with `data` rebuilt from its columns."""
+    json_columns = {
+        field.name for field in table.schema
+        if field.metadata == JSON_COLUMN_METADATA
+    }
+    return [
+        SimpleNamespace(
+            id=row['id'],
+            user_id=row['user_id'],
+            event_type=row['event_type'],
+            timestamp=row['timestamp'],
+            data={
+                column.removeprefix(DATA_COLUMN_PREFIX): (
+                    json.loads(value) if column in json_columns else value
+                )
+                for column, value in row.items()
+                if column.startswith(DATA_COLUMN_PREFIX)
+                and value is not None
+            },
+        )
+        for row in table.to_pylist()
+    ]
+
+
+def _replace_atomically(path: Path, write: Callable[[Path], None]) -> None:
+    """Write into a temporary file and move it in place."""
+    temporary_path = path.with_name(f'.{path.name}.tmp')
+    write(temporary_path)
+    os.replace(temporary_path, path)
+
+
+class ParquetExporter:
+    """Writes event chunks into daily Parquet partitions with manifests.
+
+    Layout: `{export_dir}/date=YYYY-MM-DD/part-NNNNN.parquet`. The
+    partition's `_manifest.json` is written last, so its presence marks
+    the day as complete for downstream jobs. A `data` key has one type
+    in every file of an export: files written before a later chunk
+    widened it are rewritten on finalizing.
+    """
+
+    def __init__(self, export_dir: str):
+        self.export_dir = Path(export_dir)
+        self._partitions: dict[date, list[dict[str, Any]]] = {}
+        self._data_kinds: dict[str, set[type]] = {}
+
+    def _partition_dir(self, day: date) -> Path:
+        return self.export_dir / f'date={day.isoformat()}'
+
+    def _reset_partition(self, day: date) -> list[dict[str, Any]]:
+        """Drop files of a previous export of the same day."""
+        partition_dir = self._partition_dir(day)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        (partition_dir / MANIFEST_NAME).unlink(missing_ok=True)
+        for stale_file in partition_dir.glob('part-*.parquet'):
+            stale_file.unlink()
+        return self._partitions.setdefault(day, [])
+
+    def write_chunk(self, rows: Sequence) -> int:
+        """Write a chunk of rows ordered by timestamp, split by day."""
+        for day, day_rows in groupby(
+            rows, key=lambda row: as_utc(row.timestamp).date(),
+        ):
+            files = self._partitions.get(day)
+            if files is None:
+                files = self._reset_partition(day)
+            day_rows = list(day_rows)
+            for key in {key for row in day_rows for key in _event_data(row)}:
+                self._data_kinds.setdefault(key, set()).update(_value_kinds(
+                    [_event_data(row).get(key) for row in day_rows],
+                ))
+            table = build_events_table(day_rows, self._data_kinds)
+            file_name = f'part-{len(files):05d}.parquet'
+            _replace_atomically(
+                self._partition_dir(day) / file_name,
+                lambda path: pq.write_table(
+                    table, path, compression=COMPRESSION,
+                ),
+            )
+            timestamps = table.column('timestamp')
+            files.append(dict(
+                path=file_name,
+                rows=table.num_rows,
+                min_timestamp=timestamps[0].as_py().isoformat(),
+                max_timestamp=timestamps[-1].as_py().isoformat(),
+                columns=table.schema.names,
+            ))
+        return len(rows)
+
+    def _widen_file(self, path: Path) -> None:
+        """Rewrite a file whose data columns have narrower types than
+        the export settled on."""
+        for field in pq.read_schema(path):
+            key = field.name.removeprefix(DATA_COLUMN_PREFIX)
+            if key == field.name:
+                continue
+            expected, _ = _data_column(key, self._data_kinds[key])
+            if not field.equals(expected, check_metadata=True):
+                break
+        else:
+            return
+        table = build_events_table(
+            _stored_rows(pq.read_table(path)), self._data_kinds,
+        )
+        _replace_atomically(
+            path,
+            lambda path: pq.write_table(table, path, compression=COMPRESSION),
+        )
+
+    def finalize(self, days: Sequence[date]) -> list[dict[str, Any]]:
+        """Write manifests for every day, including days without events."""
+        manifests = []
+        for day in days:
+            files = self._partitions.get(day)
+            if files is None:
+                files = self._reset_partition(day)
+            for file in files:
+                self._widen_file(self._partition_dir(day) / file['path'])
+            manifest = dict(
+                date=day.isoformat(),
+                format='parquet',
+                compression=COMPRESSION,
+                rows=sum(file['rows'] for file in files),
+                files=files,
+                generated_at=datetime.now(timezone.utc).isoformat(),
+            )
+            _replace_atomically(
+                self._partition_dir(day) / MANIFEST_NAME,
+                lambda path: path.write_text(json.dumps(manifest, indent=2)),
+            )
+            manifests.append(manifest)
+        return manifests
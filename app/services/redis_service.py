@@ -1,6 +1,7 @@
 import contextlib
 import json
-from datetime import datetime as dt
+import time
+from datetime import datetime as dt, timedelta, timezone
 from functools import wraps
 from typing import Any, Callable, Optional
 from uuid import UUID
@@ -8,17 +9,58 @@ from uuid import UUID
 import redis.asyncio as redis
 
 from app.core.config import settings
+from app.core.metrics import redis_command_duration
+from app.core.utils import event_type_value
 
 DASHBOARD_UPDATES = 'dashboard-updates'
 TIME_FORMAT = '%Y-%m-%d-%H'
+HOURLY_EVENTS_RETENTION = timedelta(hours=48)
+USER_ACTIVITY_RETENTION = timedelta(days=7)
+USER_ACTIVITY_LENGTH = 100
+
+RENEW_LOCK_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+'''
+RELEASE_LOCK_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+REMOVE_INACTIVE_USERS_SCRIPT = '''
+local user_ids = redis.call(
+    'zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2]
+)
+for _, user_id in ipairs(user_ids) do
+    redis.call('unlink', ARGV[3] .. user_id)
+end
+if #user_ids > 0 then
+    redis.call('zrem', KEYS[1], unpack(user_ids))
+end
+return #user_ids
+'''
+
+
+def hourly_event_expiry(hour: dt) -> dt:
+    """Moment the counters of the hour are no longer retained."""
+    return hour + timedelta(hours=1) + HOURLY_EVENTS_RETENTION
 
 
 def with_redis_client(func: Callable) -> Callable:
     """Decorator for automatically provisioning a Redis client."""
+    duration = redis_command_duration.labels(func.__name__)
+
     @wraps(func)
     async def wrapper(self, *args, **kwargs) -> Any:
-        async with self.get_client() as client:
-            return await func(self, client, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            async with self.get_client() as client:
+                return await func(self, client, *args, **kwargs)
+        finally:
+            duration.observe(time.perf_counter() - started)
     return wrapper
 
 
@@ -31,20 +73,76 @@ class RedisService:
 
     def _get_event_key(self, event_type: str) -> str:
         """Generate key for event type counter."""
-        return f'events:total:{event_type}'
+        return f'events:total:{event_type_value(event_type)}'
+
+    def _get_hourly_counts_key(self, hour: str) -> str:
+        """Generate key for hash of event counters of an hour."""
+        return f'events:counts:{hour}'
+
+    def _get_hourly_aggregation_key(self, hour: str) -> str:
+        """Generate key for aggregation of a closed hour."""
+        return f'events:hourly:{hour}'
 
-    def _get_hourly_event_key(self, event_type: str, hour: str) -> str:
-        """Generate key for hourly event counter."""
-        return f'events:hourly:{event_type}:{hour}'
+    def _get_daily_summary_key(self, day: str) -> str:
+        """Generate key for summary of a day."""
+        return f'summary:daily:{day}'
+
+    def _get_user_metrics_key(self, user_id: UUID) -> str:
+        """Generate key for user behavior metrics."""
+        return f'user:metrics:{user_id}'
 
     def _get_user_activity_key(self, user_id: UUID) -> str:
         """Generate key for user activity list."""
         return f'user:activity:{user_id}'
 
+    def _get_last_activity_key(self) -> str:
+        """Generate key for sorted set of users by last activity time."""
+        return 'user:last_activity'
+
+    def _get_query_cache_key(self, query_hash: str) -> str:
+        """Generate key for cached analytics query result."""
+        return f'analytics:query:{query_hash}'
+
+    def _get_profile_key(self, profile_id: str) -> str:
+        """Generate key for a request profile."""
+        return f'profile:{profile_id}'
+
+    def _get_default_funnel_key(self) -> str:
+        """Generate key for the precomputed default funnel."""
+        return 'funnel:default'
+
+    def _get_retention_key(self, period: str, cohort: str) -> str:
+        """Generate key for retention row of a cohort."""
+        return f'retention:{period}:{cohort}'
+
+    def _get_watermark_key(self, name: str) -> str:
+        """Generate key for the watermark of an incremental job."""
+        return f'watermark:{name}'
+
+    def _get_task_lock_key(self, name: str) -> str:
+        """Generate key for the lease lock of a task."""
+        return f'lock:task:{name}'
+
+    def _get_task_stats_key(self, task_name: str) -> str:
+        """Generate key for execution statistics of a Celery task."""
+        return f'stats:task:{task_name}'
+
+    def _get_task_names_key(self) -> str:
+        """Generate key for set of Celery tasks with statistics."""
+        return 'stats:tasks'
+
+    def _get_memory_series_key(self) -> str:
+        """Generate key for the time series of memory by key prefix."""
+        return 'stats:memory'
+
     def _get_event_pattern(self) -> str:
         """Pattern for scanning event keys."""
         return 'events:total:*'
 
+    def _get_hourly_counts_pattern(self) -> str:
+        """Pattern for scanning hashes of hourly event counters."""
+        return 'events:counts:*'
+
     def _get_user_activity_pattern(self) -> str:
         """Pattern for scanning user activity keys."""
         return 'user:activity:*'
@@ -55,10 +153,7 @@ class RedisService:
             self._client = redis.from_url(
                 self.redis_url, decode_responses=True,
             )
-        try:
-            yield self._client
-        finally:
-            await self._client.close()
+        yield self._client
 
     @with_redis_client
     async def increment_event_counter(
@@ -71,12 +166,32 @@ class RedisService:
     async def increment_hourly_event(
         self, client: redis.Redis, event_type: str,
     ) -> int:
-        """Increment the event counter for the current hour."""
-        return await client.incr(
-            self._get_hourly_event_key(
-                event_type=event_type, hour=dt.now().strftime(TIME_FORMAT),
-            ),
-        )
+        """Increment the event counter for the current hour.
+
+        Counters of an hour share one small hash, which Redis keeps in
+        the compact listpack encoding.
+        """
+        hour = dt.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        key = self._get_hourly_counts_key(hour.strftime(TIME_FORMAT))
+        async with client.pipeline(transaction=False) as pipe:
+            await pipe.hincrby(key, event_type_value(event_type), 1)
+            await pipe.expireat(key, hourly_event_expiry(hour))
+            events, _ = await pipe.execute()
+        return events
+
+    @with_redis_client
+    async def add_hourly_counts(
+        self,
+        client: redis.Redis,
+        hourly: dict[tuple[str, dt], int],
+    ) -> None:
+        """Add counts by event type and hour into the hourly hashes."""
+        async with client.pipeline(transaction=False) as pipe:
+            for (event_type, hour), events in hourly.items():
+                key = self._get_hourly_counts_key(hour.strftime(TIME_FORMAT))
+                await pipe.hincrby(key, event_type_value(event_type), events)
+                await pipe.expireat(key, hourly_event_expiry(hour))
+            await pipe.execute()
 
     @with_redis_client
     async def add_user_activity(
@@ -85,19 +200,68 @@ class RedisService:
         user_id: UUID,
         event_type: str,
         start_of_slice: int=0,
-        end_of_slice: int=99,
+        end_of_slice: int=USER_ACTIVITY_LENGTH - 1,
     ) -> None:
-        """Adds user activity."""
+        """Adds user activity and moves the user in the activity index."""
         key = self._get_user_activity_key(user_id=user_id)
+        now = dt.now(timezone.utc)
         activity_data = json.dumps({
-            "event_type": event_type,
-            "timestamp": dt.now().isoformat(),
+            "event_type": event_type_value(event_type),
+            "timestamp": now.isoformat(),
         })
         async with client.pipeline() as pipe:
             await pipe.lpush(key, activity_data)
             await pipe.ltrim(key, start_of_slice, end_of_slice)
+            await pipe.expire(key, USER_ACTIVITY_RETENTION)
+            await pipe.zadd(
+                self._get_last_activity_key(),
+                {str(user_id): now.timestamp()},
+            )
             await pipe.execute()
 
+    @with_redis_client
+    async def index_user_activity(
+        self, client: redis.Redis, last_activity: dict[str, dt],
+    ) -> None:
+        """Add users into the activity index, keeping later activity."""
+        if last_activity:
+            await client.zadd(
+                self._get_last_activity_key(),
+                {
+                    str(user_id): timestamp.timestamp()
+                    for user_id, timestamp in last_activity.items()
+                },
+                gt=True,
+            )
+
+    @with_redis_client
+    async def remove_inactive_users(
+        self,
+        client: redis.Redis,
+        inactive_since: dt,
+        batch_size: int = 500,
+    ) -> int:
+        """Delete activity of users inactive since the moment.
+
+        Stale users are read from the activity index in batches, so the
+        work depends only on the number of inactive users. A batch is
+        selected and deleted by one script, so activity recorded in
+        between is never deleted.
+        """
+        removed = 0
+        while True:
+            batch_removed = await client.eval(
+                REMOVE_INACTIVE_USERS_SCRIPT,
+                1,
+                self._get_last_activity_key(),
+                inactive_since.timestamp(),
+                batch_size,
+                self._get_user_activity_key(user_id=''),
+            )
+            removed += batch_removed
+            if batch_removed < batch_size:
+                return removed
+
     async def _scan_keys(
         self,
         pattern: str,
@@ -144,6 +308,127 @@ class RedisService:
                 timestamp=dt.now().isoformat(),
             )
 
+    @with_redis_client
+    async def get_event_counters(
+        self, client: redis.Redis, hours: list[dt],
+    ) -> tuple[dict[str, int], dict[tuple[str, dt], int]]:
+        """Get total counters and counters by type of the given hours."""
+        total_keys = await self._scan_keys(self._get_event_pattern(), client)
+        async with client.pipeline(transaction=False) as pipe:
+            for key in total_keys:
+                await pipe.get(key)
+            for hour in hours:
+                await pipe.hgetall(
+                    self._get_hourly_counts_key(hour.strftime(TIME_FORMAT)),
+                )
+            values = await pipe.execute()
+        totals = {
+            key.split(':')[-1]: int(value) if value else 0
+            for key, value in zip(total_keys, values)
+        }
+        hourly = {
+            (event_type, hour): int(events)
+            for hour, counts in zip(hours, values[len(total_keys):])
+            for event_type, events in counts.items()
+        }
+        return totals, hourly
+
+    @with_redis_client
+    async def rebuild_event_counters(
+        self,
+        client: redis.Redis,
+        totals: dict[str, int],
+        hourly: dict[tuple[str, dt], int],
+        hours: list[dt],
+    ) -> int:
+        """Overwrite total counters and the hashes of the given hours.
+
+        Returns the number of dropped total counters of unknown types.
+        """
+        stale_keys = [
+            key for key in await self._scan_keys(
+                self._get_event_pattern(), client,
+            )
+            if key.split(':')[-1] not in totals
+        ]
+        counts_by_hour = {hour: {} for hour in hours}
+        for (event_type, hour), events in hourly.items():
+            counts_by_hour.setdefault(hour, {})[event_type] = events
+        async with client.pipeline(transaction=False) as pipe:
+            for event_type, events in totals.items():
+                await pipe.set(self._get_event_key(event_type), events)
+            if stale_keys:
+                await pipe.unlink(*stale_keys)
+            for hour, counts in counts_by_hour.items():
+                key = self._get_hourly_counts_key(hour.strftime(TIME_FORMAT))
+                await pipe.delete(key)
+                if counts:
+                    await pipe.hset(key, mapping=counts)
+                    await pipe.expireat(key, hourly_event_expiry(hour))
+            await pipe.execute()
+        return len(stale_keys)
+
+    @with_redis_client
+    async def normalize_event_counters(self, client: redis.Redis) -> int:
+        """Merge counters keyed by `EventType.NAME` into the enum value.
+
+        Returns the number of merged counters.
+        """
+        merged = 0
+        for key in await self._scan_keys('events:total:EventType.*', client):
+            events = await client.getdel(key)
+            if events:
+                await client.incrby(
+                    self._get_event_key(key.split(':')[-1]), int(events),
+                )
+            merged += 1
+        for key in await self._scan_keys(
+            self._get_hourly_counts_pattern(), client,
+        ):
+            legacy = {
+                field: int(events)
+                for field, events in (await client.hgetall(key)).items()
+                if field != event_type_value(field)
+            }
+            if not legacy:
+                continue
+            async with client.pipeline(transaction=False) as pipe:
+                for field, events in legacy.items():
+                    await pipe.hincrby(key, event_type_value(field), events)
+                await pipe.hdel(key, *legacy)
+                await pipe.execute()
+            merged += len(legacy)
+        return merged
+
+    @with_redis_client
+    async def rebuild_user_activity(
+        self,
+        client: redis.Redis,
+        activity: dict[UUID, list[dict[str, Any]]],
+        batch_size: int = 500,
+    ) -> None:
+        """Replace activity lists of users, newest activity first."""
+        user_ids = list(activity)
+        for batch_start in range(0, len(user_ids), batch_size):
+            async with client.pipeline(transaction=False) as pipe:
+                for user_id in user_ids[batch_start:batch_start + batch_size]:
+                    key = self._get_user_activity_key(user_id=user_id)
+                    await pipe.delete(key)
+                    await pipe.rpush(key, *(
+                        json.dumps(entry) for entry in activity[user_id]
+                    ))
+                    last_activity = dt.fromisoformat(
+                        activity[user_id][0]['timestamp'],
+                    )
+                    await pipe.expireat(
+                        key, last_activity + USER_ACTIVITY_RETENTION,
+                    )
+                    await pipe.zadd(
+                        self._get_last_activity_key(),
+                        {str(user_id): last_activity.timestamp()},
+                    )
+                await pipe.execute()
+
     @with_redis_client
     async def publish_dashboard_update(
         self, client: redis.Redis, data: dict[str, Any],
@@ -151,10 +436,320 @@ class RedisService:
         """Publishes an update for WebSocket clients."""
         await client.publish(DASHBOARD_UPDATES, json.dumps(data))
 
+    @with_redis_client
+    async def save_user_metrics(
+        self,
+        client: redis.Redis,
+        metrics: list[dict[str, Any]],
+        ttl: timedelta,
+        batch_size: int = 1000,
+    ) -> None:
+        """Save metrics of many users with pipelined SETEX batches."""
+        for batch_start in range(0, len(metrics), batch_size):
+            async with client.pipeline(transaction=False) as pipe:
+                for user_metrics in metrics[
+                    batch_start:batch_start + batch_size
+                ]:
+                    await pipe.setex(
+                        self._get_user_metrics_key(user_metrics['user_id']),
+                        ttl,
+                        json.dumps(user_metrics),
+                    )
+                await pipe.execute()
+
+    @with_redis_client
+    async def save_hourly_aggregations(
+        self,
+        client: redis.Redis,
+        aggregations: dict[str, dict[str, Any]],
+        ttl: timedelta,
+        from_bucket: bool = False,
+    ) -> int:
+        """Save aggregations of many hours in one pipeline.
+
+        With `from_bucket` the TTL runs from the end of each hour, as
+        for aggregations written when the hour closes, and hours past
+        it are skipped. Returns the number of saved hours.
+        """
+        saved = 0
+        now = dt.now(timezone.utc)
+        async with client.pipeline(transaction=False) as pipe:
+            for hour, aggregation_data in aggregations.items():
+                expiry = ttl
+                if from_bucket:
+                    expiry += dt.strptime(hour, TIME_FORMAT).replace(
+                        tzinfo=timezone.utc,
+                    ) + timedelta(hours=1) - now
+                    if expiry < timedelta(seconds=1):
+                        continue
+                await pipe.setex(
+                    self._get_hourly_aggregation_key(hour),
+                    expiry,
+                    json.dumps(aggregation_data),
+                )
+                saved += 1
+            await pipe.execute()
+        return saved
+
+    @with_redis_client
+    async def save_daily_summaries(
+        self,
+        client: redis.Redis,
+        summaries: list[dict[str, Any]],
+        ttl: timedelta,
+        from_bucket: bool = False,
+    ) -> int:
+        """Save summaries of many days in one pipeline.
+
+        With `from_bucket` the TTL runs from the end of each day, as for
+        summaries written the day after, and days past it are skipped.
+        Returns the number of saved days.
+        """
+        saved = 0
+        now = dt.now(timezone.utc)
+        async with client.pipeline(transaction=False) as pipe:
+            for daily_summary in summaries:
+                expiry = ttl
+                if from_bucket:
+                    expiry += dt.fromisoformat(daily_summary['date']).replace(
+                        tzinfo=timezone.utc,
+                    ) + timedelta(days=1) - now
+                    if expiry < timedelta(seconds=1):
+                        continue
+                await pipe.setex(
+                    self._get_daily_summary_key(daily_summary['date']),
+                    expiry,
+                    json.dumps(daily_summary),
+                )
+                saved += 1
+            await pipe.execute()
+        return saved
+
+    @with_redis_client
+    async def get_watermark(
+        self, client: redis.Redis, name: str,
+    ) -> Optional[dt]:
+        """Get the moment an incremental job has processed up to."""
+        watermark = await client.get(self._get_watermark_key(name))
+        return dt.fromisoformat(watermark) if watermark else None
+
+    @with_redis_client
+    async def set_watermark(
+        self, client: redis.Redis, name: str, watermark: dt,
+    ) -> None:
+        """Set the moment an incremental job has processed up to."""
+        await client.set(
+            self._get_watermark_key(name), watermark.isoformat(),
+        )
+
+    @with_redis_client
+    async def acquire_lock(
+        self, client: redis.Redis, name: str, token: str, lease: timedelta,
+    ) -> bool:
+        """Take the lease lock unless another holder has it."""
+        return bool(await client.set(
+            self._get_task_lock_key(name), token, px=lease, nx=True,
+        ))
+
+    @with_redis_client
+    async def get_lock_holder(
+        self, client: redis.Redis, name: str,
+    ) -> Optional[str]:
+        """Token of the current holder of the lease lock."""
+        return await client.get(self._get_task_lock_key(name))
+
+    @with_redis_client
+    async def renew_lock(
+        self, client: redis.Redis, name: str, token: str, lease: timedelta,
+    ) -> bool:
+        """Extend the lease if the lock is still held with the token."""
+        return bool(await client.eval(
+            RENEW_LOCK_SCRIPT,
+            1,
+            self._get_task_lock_key(name),
+            token,
+            int(lease.total_seconds() * 1000),
+        ))
+
+    @with_redis_client
+    async def release_lock(
+        self, client: redis.Redis, name: str, token: str,
+    ) -> bool:
+        """Release the lock if it is still held with the token."""
+        return bool(await client.eval(
+            RELEASE_LOCK_SCRIPT, 1, self._get_task_lock_key(name), token,
+        ))
+
+    @with_redis_client
+    async def record_task_stats(
+        self,
+        client: redis.Redis,
+        task_name: str,
+        counters: dict[str, int],
+        sums: dict[str, float],
+        fields: dict[str, Any],
+    ) -> None:
+        """Add a task run into the task statistics in one round trip."""
+        key = self._get_task_stats_key(task_name)
+        async with client.pipeline(transaction=False) as pipe:
+            for field, amount in counters.items():
+                await pipe.hincrby(key, field, amount)
+            for field, amount in sums.items():
+                await pipe.hincrbyfloat(key, field, amount)
+            await pipe.hset(key, mapping=fields)
+            await pipe.sadd(self._get_task_names_key(), task_name)
+            await pipe.execute()
+
+    @with_redis_client
+    async def get_task_stats(
+        self, client: redis.Redis,
+    ) -> dict[str, dict[str, str]]:
+        """Get raw statistics of every recorded Celery task.
+
+        Tasks are listed in a set, so reading does not scan the keyspace.
+        """
+        task_names = sorted(
+            await client.smembers(self._get_task_names_key()),
+        )
+        async with client.pipeline(transaction=False) as pipe:
+            for task_name in task_names:
+                await pipe.hgetall(self._get_task_stats_key(task_name))
+            stats = await pipe.execute() if task_names else []
+        return {
+            task_name: task_stats
+            for task_name, task_stats in zip(task_names, stats)
+            if task_stats
+        }
+
+    @with_redis_client
+    async def add_memory_snapshot(
+        self,
+        client: redis.Redis,
+        snapshot: dict[str, Any],
+        at: dt,
+        retention: timedelta,
+    ) -> None:
+        """Add a memory snapshot, dropping those older than retention."""
+        key = self._get_memory_series_key()
+        async with client.pipeline(transaction=False) as pipe:
+            await pipe.zadd(key, {json.dumps(snapshot): at.timestamp()})
+            await pipe.zremrangebyscore(
+                key, '-inf', f'({(at - retention).timestamp()}',
+            )
+            await pipe.execute()
+
+    @with_redis_client
+    async def get_memory_snapshots(
+        self, client: redis.Redis, since: dt,
+    ) -> list[dict[str, Any]]:
+        """Get memory snapshots taken since the moment, oldest first."""
+        return [
+            json.loads(snapshot)
+            for snapshot in await client.zrangebyscore(
+                self._get_memory_series_key(), since.timestamp(), '+inf',
+            )
+        ]
+
+    @with_redis_client
+    async def get_cached_query_result(
+        self, client: redis.Redis, query_hash: str,
+    ) -> Optional[dict[str, Any]]:
+        """Get cached analytics query result."""
+        cached_result = await client.get(self._get_query_cache_key(query_hash))
+        return json.loads(cached_result) if cached_result else None
+
+    @with_redis_client
+    async def cache_query_result(
+        self,
+        client: redis.Redis,
+        query_hash: str,
+        result: dict[str, Any],
+        ttl: timedelta,
+    ) -> None:
+        """Cache analytics query result."""
+        await client.setex(
+            self._get_query_cache_key(query_hash), ttl, json.dumps(result),
+        )
+
+    @with_redis_client
+    async def save_default_funnel(
+        self, client: redis.Redis, funnel: dict[str, Any], ttl: timedelta,
+    ) -> None:
+        """Save the precomputed default funnel."""
+        await client.setex(
+            self._get_default_funnel_key(), ttl, json.dumps(funnel),
+        )
+
+    @with_redis_client
+    async def get_default_funnel(
+        self, client: redis.Redis,
+    ) -> Optional[dict[str, Any]]:
+        """Get the precomputed default funnel."""
+        funnel = await client.get(self._get_default_funnel_key())
+        return json.loads(funnel) if funnel else None
+
+    @with_redis_client
+    async def save_profile(
+        self,
+        client: redis.Redis,
+        profile_id: str,
+        profile: dict[str, Any],
+        ttl: timedelta,
+    ) -> None:
+        """Save the profile of a request."""
+        await client.setex(
+            self._get_profile_key(profile_id), ttl, json.dumps(profile),
+        )
+
+    @with_redis_client
+    async def get_profile(
+        self, client: redis.Redis, profile_id: str,
+    ) -> Optional[dict[str, Any]]:
+        """Get the profile of a request."""
+        profile = await client.get(self._get_profile_key(profile_id))
+        return json.loads(profile) if profile else None
+
+    @with_redis_client
+    async def save_retention_cells(
+        self,
+        client: redis.Redis,
+        period: str,
+        cells: dict[str, dict[int, int]],
+        ttl: timedelta,
+    ) -> None:
+        """Save retention cells, one small hash per cohort.
+
+        Hash fields are offsets since the cohort start, values are users.
+        """
+        async with client.pipeline() as pipe:
+            for cohort, offsets in cells.items():
+                key = self._get_retention_key(period, cohort)
+                await pipe.hset(key, mapping=offsets)
+                await pipe.expire(key, ttl)
+            await pipe.execute()
+
+    @with_redis_client
+    async def get_retention_rows(
+        self, client: redis.Redis, period: str, cohorts: list[str],
+    ) -> dict[str, dict[int, int]]:
+        """Get retention rows of the cohorts."""
+        async with client.pipeline() as pipe:
+            for cohort in cohorts:
+                await pipe.hgetall(self._get_retention_key(period, cohort))
+            rows = await pipe.execute()
+        return {
+            cohort: {int(offset): int(users) for offset, users in row.items()}
+            for cohort, row in zip(cohorts, rows) if row
+        }
+
     async def close(self) -> None:
         """Close connection."""
         if self._client:
             await self._client.aclose()
 
+    def reset(self) -> None:
+        """Forget the client, the next call creates a new pool."""
+        self._client = None
+
 
 redis_service = RedisService()
@@ -1,7 +1,13 @@
 import logging
+import time
 from datetime import datetime as dt
 
 from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from app.core.metrics import (
+    websocket_broadcast_duration, websocket_connections,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +21,14 @@ class ConnectionManager:
         self.user_connections: dict[str, list[WebSocket]] = {}
 
     async def connect(self, websocket: WebSocket, user_id: str) -> None:
-        """Accept a new Websocket connection."""
-        await websocket.accept()
+        """Register a Websocket connection, accepting it if still needed."""
+        if websocket.application_state == WebSocketState.CONNECTING:
+            await websocket.accept()
         if user_id not in self.user_connections:
             self.user_connections[user_id] = []
         if len(self.user_connections[user_id]) >= MAX_CONNECTIONS_PER_USER:
             oldest_connection = self.user_connections[user_id].pop(0)
+            websocket_connections.dec()
             try:
                 await oldest_connection.close(
                     code=1008, reason='Too many connections',
@@ -28,6 +36,7 @@ class ConnectionManager:
             except:
                 pass
         self.user_connections[user_id].append(websocket)
+        websocket_connections.inc()
         logger.info('WebSocket connection established', extra=dict(
             user_id=user_id, len_connections=len(self.user_connections),
         ))
@@ -43,6 +52,7 @@ class ConnectionManager:
 
         if websocket in self.user_connections[user_id]:
             self.user_connections[user_id].remove(websocket)
+            websocket_connections.dec()
         if not self.user_connections[user_id]:
             del self.user_connections[user_id]
 
@@ -61,6 +71,7 @@ class ConnectionManager:
 
     async def broadcast(self, message: str) -> None:
         """Sends messages to all clients."""
+        started = time.perf_counter()
         disconnected = []
         for user_id, connections in self.user_connections.items():
             for connection in connections:
@@ -80,6 +91,9 @@ class ConnectionManager:
 
         for user_id, connection in disconnected:
             await self.disconnect(user_id, connection)
+        websocket_broadcast_duration.observe(
+            time.perf_counter() - started,
+        )
 
 
 manager = ConnectionManager()
@@ -1,4 +1,9 @@
-from app.tasks.aggregation_tasks import calculate_daily_summary, calculate_hourly_aggregation, calculate_user_behavior_metrics, _calculate_daily_summary, _calculate_hourly_aggregation, _calculate_user_behavior_metrics #noqa
-from app.tasks.cleanup_tasks import backup_current_stats, cleanup_old_redis_data, cleanup_user_sessions, _backup_current_stats, _cleanup_old_redis_data, _cleanup_user_sessions #noqa
+from app.tasks.aggregation_tasks import calculate_daily_summary, calculate_default_funnel, calculate_hourly_aggregation, calculate_user_behavior_metrics, calculate_user_behavior_metrics_batch, calculate_user_sessions, calculate_user_behavior_partition, update_retention_matrices, _calculate_daily_summary, _calculate_default_funnel, _calculate_hourly_aggregation, _calculate_user_behavior_metrics, _calculate_user_behavior_partition, _calculate_user_sessions, _update_retention_matrices #noqa
+from app.tasks.archive_tasks import archive_old_events, _archive_old_events #noqa
+from app.tasks.backfill_tasks import backfill_aggregates, backfill_chunks, backfill_group, retained_range, _backfill_aggregates #noqa
+from app.tasks.cleanup_tasks import backup_current_stats, cleanup_old_redis_data, cleanup_user_sessions, index_user_activity, _backup_current_stats, _cleanup_old_redis_data, _cleanup_user_sessions, _index_user_activity #noqa
+from app.tasks.export_tasks import export_events_to_parquet, _export_events_to_parquet #noqa
 from app.tasks.monitoring_tasks import monitor_redis_memory, _monitor_redis_memory #noqa
 from app.tasks.realtime_tasks import update_realtime_metrics, _update_realtime_metrics #noqa
+from app.tasks.reconcile_tasks import check_counters_drift, normalize_event_counters, rebuild_redis_counters, _check_counters_drift, _normalize_event_counters, _rebuild_redis_counters #noqa
+from app.tasks.stats import queue_depths, summarize_task_stats, task_metrics #noqa
@@ -1,65 +1,108 @@
-import asyncio
-import json
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import distinct, func, select
+from celery import group
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.celery import celery_app
-from app.models import Event
+from app.core.config import settings
+from app.crud import (
+    calculate_sessions,
+    get_daily_summary,
+    get_funnel,
+    get_hourly_aggregations,
+    get_late_event_hours,
+    get_retention_cohorts,
+    get_user_behavior_metrics,
+    replace_user_sessions,
+    user_id_partition,
+)
+from app.schemas import FunnelQuery, RetentionPeriod
 from app.services import redis_service
-from app.tasks.decorators import celery_task_with_logging, with_async_session
+from app.tasks.decorators import (
+    celery_task_with_logging, with_async_session, with_task_lock,
+)
+from app.tasks.runtime import worker_runtime
+
+
+HOUR = timedelta(hours=1)
+HOURLY_WATERMARK = 'hourly_aggregation'
+HOURLY_INGESTION_WATERMARK = 'hourly_aggregation_ingested'
+HOURLY_AGGREGATION_TTL = timedelta(hours=48)
+LATE_EVENTS_OVERLAP = timedelta(minutes=5)
+DAILY_SUMMARY_TTL = timedelta(days=30)
 
 
 @celery_task_with_logging(
     'Hourly aggregation complete', 'Hourly aggregation failed',
 )
+@with_task_lock('hourly_aggregation')
 @with_async_session
 async def _calculate_hourly_aggregation(session: AsyncSession):
-    """Async implementation of aggregation."""
-    hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
-    hour_str = hour_ago.strftime('%Y-%m-%d-%H')
-
-    events_by_type = dict((await session.execute(
-        select(Event.event_type, func.count(Event.id)).where(
-            Event.timestamp >= hour_ago,
-        ).group_by(Event.event_type),
-    )).all())
-    unique_users = await session.scalar(
-        select(func.count(distinct(Event.user_id))).where(
-            Event.timestamp >= hour_ago,
-        ),
-    ) or 0
-    total_events = sum(events_by_type.values())
-    aggregation_data = dict(
-        period='hourly',
-        hour=hour_ago.strftime('%Y-%m-%d %H:00'),
-        events_by_type=events_by_type,
-        unique_users=unique_users,
-        total_events=total_events,
-        timestamp=datetime.now(timezone.utc).isoformat(),
+    """Async implementation of aggregation.
+
+    Aggregates every closed clock hour since the watermark, and the
+    earlier hours that received late events since the previous run.
+    Hours are rewritten as a whole, so repeated runs are idempotent.
+    """
+    now = datetime.now(timezone.utc)
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    horizon = current_hour - timedelta(
+        hours=settings.hourly_aggregation_catchup_hours,
+    )
+    watermark = await redis_service.get_watermark(HOURLY_WATERMARK) or (
+        current_hour - HOUR
+    )
+    first_hour = max(watermark, horizon)
+    closed_hours = [
+        first_hour + HOUR * offset
+        for offset in range((current_hour - first_hour) // HOUR)
+    ]
+    ingested_since = await redis_service.get_watermark(
+        HOURLY_INGESTION_WATERMARK,
     )
+    late_hours = await get_late_event_hours(
+        session, ingested_since - LATE_EVENTS_OVERLAP, now,
+        horizon, first_hour,
+    ) if ingested_since else []
 
-    async with redis_service.get_client() as client:
-        await client.setex(
-            f'events:hourly:{hour_str}',
-            timedelta(hours=48),
-            json.dumps(aggregation_data),
-        )
-    await redis_service.publish_dashboard_update(dict(
-        event_type='hourly_aggregation',
-        data=aggregation_data,
-    ))
+    aggregations = await get_hourly_aggregations(
+        session, late_hours + closed_hours,
+    )
+    await redis_service.save_hourly_aggregations(
+        aggregations, HOURLY_AGGREGATION_TTL,
+    )
+    await redis_service.set_watermark(HOURLY_WATERMARK, current_hour)
+    await redis_service.set_watermark(HOURLY_INGESTION_WATERMARK, now)
+
+    hour_str = None
+    if closed_hours:
+        hour_str = closed_hours[-1].strftime('%Y-%m-%d-%H')
+        await redis_service.publish_dashboard_update(dict(
+            event_type='hourly_aggregation',
+            data=aggregations[hour_str],
+        ))
     return dict(
-        hour=hour_str, total_events=total_events, unique_users=unique_users,
+        hour=hour_str,
+        hours=len(closed_hours),
+        late_hours=len(late_hours),
+        total_events=sum(
+            aggregations[hour.strftime('%Y-%m-%d-%H')]['total_events']
+            for hour in closed_hours
+        ),
     )
 
 
 @celery_app.task
 def calculate_hourly_aggregation():
-    """Data aggregation for the last hour."""
-    return asyncio.run(_calculate_hourly_aggregation())
+    """Data aggregation for the closed hours since the last run."""
+    return worker_runtime.run(_calculate_hourly_aggregation())
+
+
+SESSIONS_WATERMARK = 'sessions'
+USER_METRICS_PERIOD = timedelta(hours=24)
+USER_METRICS_TTL = timedelta(hours=24)
 
 
 @celery_task_with_logging(
@@ -70,99 +113,240 @@ async def _calculate_user_behavior_metrics(
     session: AsyncSession, user_id: UUID,
 ):
     """Async implementation of calculation user behavior metrics."""
-    user_events = (
-        await session.execute(select(Event).where(
-            Event.user_id == user_id,
-            Event.timestamp >= (
-                datetime.now(timezone.utc) - timedelta(hours=24)
-            ),
-        ).order_by(Event.timestamp))
-    ).scalars().all()
-
-    if not user_events:
+    metrics = await get_user_behavior_metrics(
+        session,
+        datetime.now(timezone.utc) - USER_METRICS_PERIOD,
+        user_id=user_id,
+    )
+    if not metrics:
         return dict(
             message='No events found for user in last 24 hours',
             user_id=user_id,
         )
 
-    first_event_timestamp = user_events[0].timestamp
-    last_event_timestamp = user_events[-1].timestamp
-    session_duration = (
-        last_event_timestamp - first_event_timestamp
-    ).total_seconds()
-    metrics = dict(
-        user_id=user_id,
-        session_count=len(user_events),
-        session_duration_seconds=session_duration,
-        event_types_count=len(set(
-            [event.event_type for event in user_events]
-        )),
-        first_event_at=first_event_timestamp.isoformat(),
-        last_event_at=last_event_timestamp.isoformat(),
-        timestamp=datetime.now(timezone.utc).isoformat(),
-    )
-
-    async with redis_service.get_client() as client:
-        await client.setex(
-            f'user:metrics:{user_id}',
-            timedelta(hours=24),
-            json.dumps(metrics),
-        )
+    await redis_service.save_user_metrics(metrics, USER_METRICS_TTL)
     return dict(
         user_id=user_id,
         timestamp=datetime.now(timezone.utc).isoformat(),
-        metrics=metrics,
+        metrics=metrics[0],
     )
 
 
 @celery_app.task
 def calculate_user_behavior_metrics(user_id: UUID):
     """Calculating user behavior metrics."""
-    return asyncio.run(_calculate_user_behavior_metrics(user_id))
+    return worker_runtime.run(_calculate_user_behavior_metrics(user_id))
+
+
+@celery_task_with_logging(
+    'User behavior partition calculated',
+    'User behavior partition calculation failed',
+)
+@with_async_session
+async def _calculate_user_behavior_partition(
+    session: AsyncSession, index: int, partitions: int,
+):
+    """Async implementation of calculation metrics of a user id range."""
+    metrics = await get_user_behavior_metrics(
+        session,
+        datetime.now(timezone.utc) - USER_METRICS_PERIOD,
+        user_id_range=user_id_partition(index, partitions),
+    )
+    await redis_service.save_user_metrics(metrics, USER_METRICS_TTL)
+    return dict(users=len(metrics), partition=index, partitions=partitions)
+
+
+@celery_app.task
+def calculate_user_behavior_partition(index: int, partitions: int):
+    """Behavior metrics of all active users in one user id range."""
+    return worker_runtime.run(
+        _calculate_user_behavior_partition(index, partitions),
+    )
+
+
+@celery_app.task
+def calculate_user_behavior_metrics_batch(partitions: Optional[int] = None):
+    """Fan out behavior metrics of all active users by user id ranges."""
+    partitions = partitions or settings.user_metrics_partitions
+    group_result = group(
+        calculate_user_behavior_partition.s(index, partitions)
+        for index in range(partitions)
+    ).apply_async()
+    return dict(
+        status='started', group_id=group_result.id, partitions=partitions,
+    )
 
 
 @celery_task_with_logging(
     'Daily summary calculated', 'Daily summary calculation failed.',
 )
+@with_task_lock('daily_summary')
 @with_async_session
 async def _calculate_daily_summary(session: AsyncSession):
     """Async implementation of calculation daily summary."""
-    start_of_day = datetime.combine(
-        datetime.now(timezone.utc).date() - timedelta(hours=24),
-        datetime.min.time(),
-    )
-    end_of_day = start_of_day + timedelta(hours=24)
-    start_of_day_string = start_of_day.strftime('%Y-%m-%d')
-
-    daily_stats_result = await session.execute(select(
-        Event.event_type,
-        func.count(Event.id),
-        func.count(distinct(Event.user_id)),
-    ).where(
-        Event.timestamp >= start_of_day, Event.timestamp < end_of_day,
-    ).group_by(Event.event_type))
-    daily_stats = [
-        dict(event_type=event_type, count=count, unique_users=unique_users)
-        for event_type, count, unique_users in daily_stats_result
-    ]
-    daily_summary = dict(
-        date=start_of_day_string,
-        total_events=sum(event['count'] for event in daily_stats),
-        total_users=sum(event['unique_users'] for event in daily_stats),
-        events_by_type=daily_stats,
-        timestamp=datetime.now(timezone.utc).isoformat(),
+    daily_summary = await get_daily_summary(
+        session, datetime.now(timezone.utc).date() - timedelta(days=1),
     )
-
-    async with redis_service.get_client() as client:
-        await client.setex(
-            f'summary:daily:{start_of_day_string}',
-            timedelta(days=30),
-            json.dumps(daily_summary),
-        )
-    return dict(date=start_of_day_string, summary=daily_summary)
+    await redis_service.save_daily_summaries(
+        [daily_summary], DAILY_SUMMARY_TTL,
+    )
+    return dict(date=daily_summary['date'], summary=daily_summary)
 
 
 @celery_app.task
 def calculate_daily_summary():
     """Daily summary for the previous day."""
-    return asyncio.run(_calculate_daily_summary())
+    return worker_runtime.run(_calculate_daily_summary())
+
+
+@celery_task_with_logging(
+    'Default funnel calculated', 'Default funnel calculation failed',
+)
+@with_task_lock('default_funnel')
+@with_async_session
+async def _calculate_default_funnel(session: AsyncSession):
+    """Async implementation of calculation default funnel."""
+    end = datetime.now(timezone.utc).replace(
+        minute=0, second=0, microsecond=0,
+    )
+    funnel = await get_funnel(
+        session, FunnelQuery(start=end - timedelta(hours=24), end=end),
+    )
+    await redis_service.save_default_funnel(funnel, timedelta(hours=2))
+    return dict(
+        end=funnel['end'],
+        users=[step['users'] for step in funnel['steps']],
+    )
+
+
+@celery_app.task
+def calculate_default_funnel():
+    """Default funnel for the last 24 closed hours."""
+    return worker_runtime.run(_calculate_default_funnel())
+
+
+@celery_task_with_logging(
+    'Retention matrices updated', 'Retention matrices update failed',
+)
+@with_task_lock('retention_matrices')
+@with_async_session
+async def _update_retention_matrices(
+    session: AsyncSession, day: Optional[str] = None,
+):
+    """Async implementation of update retention matrices.
+
+    Only the given day (yesterday by default) is processed: it adds one
+    diagonal to the daily matrix and refreshes the current week column
+    of the weekly one. Cells are overwritten, so reruns are idempotent.
+    """
+    day = date.fromisoformat(day) if day else (
+        datetime.now(timezone.utc).date() - timedelta(days=1)
+    )
+    day_start = datetime.combine(day, time.min, timezone.utc)
+    day_end = day_start + timedelta(days=1)
+    week_start = day_start - timedelta(days=day.weekday())
+
+    daily_cohorts = await get_retention_cohorts(
+        session,
+        timedelta(days=1),
+        day_start,
+        day_end,
+        day_start - timedelta(days=settings.retention_days),
+    )
+    weekly_cohorts = await get_retention_cohorts(
+        session,
+        timedelta(weeks=1),
+        week_start,
+        day_end,
+        week_start - timedelta(weeks=settings.retention_weeks),
+    )
+    await redis_service.save_retention_cells(
+        RetentionPeriod.DAILY.value,
+        {
+            cohort.date().isoformat(): {(day_start - cohort).days: users}
+            for cohort, users in daily_cohorts.items()
+        },
+        timedelta(days=settings.retention_days),
+    )
+    await redis_service.save_retention_cells(
+        RetentionPeriod.WEEKLY.value,
+        {
+            cohort.date().isoformat(): {(week_start - cohort).days // 7: users}
+            for cohort, users in weekly_cohorts.items()
+        },
+        timedelta(weeks=settings.retention_weeks),
+    )
+    return dict(
+        day=day.isoformat(),
+        daily_cohorts=len(daily_cohorts),
+        weekly_cohorts=len(weekly_cohorts),
+    )
+
+
+@celery_app.task
+def update_retention_matrices(day: Optional[str] = None):
+    """Daily and weekly retention cohorts for the previous day."""
+    return worker_runtime.run(_update_retention_matrices(day))
+
+
+def _sessions_resume_point(
+    sessions: list[dict], closed_before: datetime,
+) -> datetime:
+    """The earliest open session start, moved back until no session
+    spans it, so the next run never splits a persisted session."""
+    watermark = min(
+        (
+            user_session['started_at'] for user_session in sessions
+            if user_session['ended_at'] > closed_before
+        ),
+        default=closed_before,
+    )
+    while True:
+        spanning_starts = [
+            user_session['started_at'] for user_session in sessions
+            if user_session['started_at'] < watermark
+            <= user_session['ended_at']
+        ]
+        if not spanning_starts:
+            return watermark
+        watermark = min(spanning_starts)
+
+
+@celery_task_with_logging(
+    'User sessions calculated', 'User sessions calculation failed',
+)
+@with_task_lock('user_sessions')
+@with_async_session
+async def _calculate_user_sessions(session: AsyncSession):
+    """Async implementation of sessionization.
+
+    Events since the watermark are split into sessions by the inactivity
+    gap. Sessions without events for a gap are final and persisted,
+    the rest are recalculated by the next run.
+    """
+    now = datetime.now(timezone.utc)
+    gap = timedelta(minutes=settings.session_gap_minutes)
+    closed_before = now - gap
+    since = await redis_service.get_watermark(SESSIONS_WATERMARK) or (
+        now - timedelta(hours=settings.session_lookback_hours)
+    )
+
+    sessions = await calculate_sessions(session, since, now, gap)
+    final_sessions = [
+        user_session for user_session in sessions
+        if user_session['ended_at'] <= closed_before
+    ]
+    await replace_user_sessions(session, since, final_sessions)
+    watermark = _sessions_resume_point(sessions, closed_before)
+    await redis_service.set_watermark(SESSIONS_WATERMARK, watermark)
+    return dict(
+        sessions=len(final_sessions),
+        open_sessions=len(sessions) - len(final_sessions),
+        watermark=watermark.isoformat(),
+    )
+
+
+@celery_app.task
+def calculate_user_sessions():
+    """Sessionization of user activity since the last run."""
+    return worker_runtime.run(_calculate_user_sessions())
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.core.utils import as_utc
+from app.crud import delete_events, get_oldest_event_timestamp, stream_events
+from app.services import ParquetExporter, archive_batch_dir, archived_ids
+from app.tasks.decorators import (
+    celery_task_with_logging, with_async_session, with_task_lock,
+)
+from app.tasks.runtime import worker_runtime
+
+DAY = timedelta(days=1)
+
+
+@celery_task_with_logging('Events archived', 'Events archival failed')
+@with_task_lock('events_archive')
+@with_async_session
+async def _archive_old_events(session: AsyncSession):
+    """Async implementation of archival.
+
+    The oldest whole UTC day older than the retention is written into
+    Parquet partitions of a run directory, a day per run so the run
+    stays within the task time limit. Once the day's manifest is
+    written, its archived events are deleted by id in bounded
+    transactions, so events arriving late for the day stay for the
+    next run.
+    """
+    archived_at = datetime.now(timezone.utc)
+    cutoff = datetime.combine(
+        (archived_at - timedelta(days=settings.event_retention_days)).date(),
+        time.min,
+        timezone.utc,
+    )
+    oldest = await get_oldest_event_timestamp(session, cutoff)
+    if oldest is None:
+        return dict(archived_rows=0, deleted_rows=0, days=[], more_days=False)
+    day = as_utc(oldest).date()
+    batch_dir = archive_batch_dir(settings.archive_dir, archived_at)
+    exporter = ParquetExporter(str(batch_dir))
+    archived_rows = deleted_rows = 0
+    day_start = datetime.combine(day, time.min, timezone.utc)
+    async for rows in stream_events(
+        session, day_start, day_start + DAY, settings.export_chunk_size,
+    ):
+        archived_rows += await asyncio.to_thread(exporter.write_chunk, rows)
+    manifests = await asyncio.to_thread(exporter.finalize, [day])
+    async for file_ids in archived_ids(batch_dir, manifests):
+        for offset in range(
+            0, len(file_ids), settings.archive_delete_batch_size,
+        ):
+            deleted_rows += await delete_events(
+                session,
+                file_ids[offset:offset + settings.archive_delete_batch_size],
+            )
+    return dict(
+        archived_rows=archived_rows,
+        deleted_rows=deleted_rows,
+        days=[day.isoformat()],
+        more_days=(
+            await get_oldest_event_timestamp(session, cutoff) is not None
+        ),
+        archive_dir=str(batch_dir),
+    )
+
+
+@celery_app.task
+def archive_old_events():
+    """Moving events older than the retention into archive files, the
+    next run is queued while older days remain."""
+    result = worker_runtime.run(_archive_old_events())
+    if result.get('more_days'):
+        archive_old_events.delay()
+    return result
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+
+from celery import group
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.celery import celery_app
+from app.core.sql import BUCKET_ORIGIN
+from app.core.utils import as_utc
+from app.crud import get_daily_summary, get_hourly_aggregations
+from app.services import redis_service
+from app.tasks.aggregation_tasks import (
+    DAILY_SUMMARY_TTL, HOUR, HOURLY_AGGREGATION_TTL,
+)
+from app.tasks.decorators import celery_task_with_logging, with_async_session
+from app.tasks.runtime import worker_runtime
+
+CHUNK_WIDTHS = dict(hour=timedelta(hours=1), day=timedelta(days=1))
+RETENTION = max(
+    HOUR + HOURLY_AGGREGATION_TTL, timedelta(days=1) + DAILY_SUMMARY_TTL,
+)
+
+
+def _floor(moment: datetime, width: timedelta) -> datetime:
+    return moment - (moment - BUCKET_ORIGIN) % width
+
+
+def retained_range(
+    start: datetime, end: datetime, now: Optional[datetime] = None,
+) -> tuple[datetime, datetime]:
+    """The part of the range whose keys Redis would still keep.
+
+    Backfilled keys expire as live keys do, from the end of their
+    bucket, so older buckets would be aggregated and dropped on write.
+    """
+    now = now or datetime.now(timezone.utc)
+    return max(as_utc(start), now - RETENTION), min(as_utc(end), now)
+
+
+def backfill_chunks(
+    start: datetime, end: datetime, chunk: str = 'day',
+) -> list[tuple[datetime, datetime]]:
+    """Split the range, widened to whole chunks, into chunk ranges."""
+    width = CHUNK_WIDTHS[chunk]
+    chunk_start = _floor(as_utc(start), width)
+    end = as_utc(end)
+    chunks = []
+    while chunk_start < end:
+        chunks.append((chunk_start, chunk_start + width))
+        chunk_start += width
+    return chunks
+
+
+@celery_task_with_logging('Backfill chunk complete', 'Backfill chunk failed')
+@with_async_session
+async def _backfill_aggregates(session: AsyncSession, start: str, end: str):
+    """Async implementation of backfill of a chunk.
+
+    Rewrites hourly aggregations of every hour of the chunk and daily
+    summaries of the days starting in it, under the live keys. Their
+    TTL runs from the end of the hour or day as for live keys, buckets
+    already past it are not written.
+    """
+    start = as_utc(datetime.fromisoformat(start))
+    end = as_utc(datetime.fromisoformat(end))
+    hours = [start + HOUR * offset for offset in range((end - start) // HOUR)]
+    aggregations = await get_hourly_aggregations(session, hours)
+    saved_hours = await redis_service.save_hourly_aggregations(
+        aggregations, HOURLY_AGGREGATION_TTL, from_bucket=True,
+    )
+    summaries = [
+        await get_daily_summary(session, hour.date())
+        for hour in hours if hour.hour == 0
+    ]
+    saved_days = await redis_service.save_daily_summaries(
+        summaries, DAILY_SUMMARY_TTL, from_bucket=True,
+    )
+    return dict(
+        start=start.isoformat(),
+        end=end.isoformat(),
+        hours=len(hours),
+        days=len(summaries),
+        saved_hours=saved_hours,
+        saved_days=saved_days,
+        total_events=sum(
+            aggregation['total_events']
+            for aggregation in aggregations.values()
+        ),
+    )
+
+
+@celery_app.task
+def backfill_aggregates(start: str, end: str):
+    """Hourly aggregations and daily summaries of one backfill chunk."""
+    return worker_runtime.run(_backfill_aggregates(start, end))
+
+
+def backfill_group(chunks: Sequence[tuple[datetime, datetime]]) -> group:
+    """Celery group with a backfill task per chunk."""
+    return group(
+        backfill_aggregates.s(chunk_start.isoformat(), chunk_end.isoformat())
+        for chunk_start, chunk_end in chunks
+    )
@@ -1,70 +1,186 @@
-import asyncio
 import json
 import logging
+import time
+from collections import Counter
 from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
 
 from app.core.celery import celery_app
+from app.core.utils import as_utc, event_type_value
 from app.services import redis_service
-from app.tasks.decorators import celery_task_with_logging
+from app.services.redis_service import (
+    USER_ACTIVITY_RETENTION, hourly_event_expiry,
+)
+from app.tasks.decorators import celery_task_with_logging, with_task_lock
+from app.tasks.runtime import worker_runtime
 
 logger = logging.getLogger(__name__)
 
 TIME_FORMAT = '%Y-%m-%d-%H'
+SWEEP_BATCH_SIZE = 500
+
+
+def _hourly_key_hour(key: str) -> Optional[datetime]:
+    """Hour of an hourly key of any shape, `None` for unknown shapes."""
+    try:
+        return datetime.strptime(
+            key.rsplit(':', 1)[-1], TIME_FORMAT,
+        ).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+async def _scan_batches(
+    client, pattern: str, batch_size: int = SWEEP_BATCH_SIZE,
+) -> AsyncIterator[list[str]]:
+    """Keys matching the pattern in batches of the given size."""
+    keys = []
+    async for key in client.scan_iter(pattern, count=batch_size):
+        keys.append(str(key))
+        if len(keys) == batch_size:
+            yield keys
+            keys = []
+    if keys:
+        yield keys
+
+
+async def _sweep_batch(
+    client, keys: list[str], now: datetime,
+) -> tuple[int, int]:
+    """Set the missing TTL of aggregations, sweep legacy counters.
+
+    Aggregations `events:hourly:{hour}` keep any TTL they have, as
+    late or catch-up writes start it later than the hour implies; one
+    is only set when missing, and Redis deletes the key if that moment
+    has passed. Legacy per-type counters `events:hourly:{type}:{hour}`
+    are unlinked past the counter retention and otherwise moved into
+    the hourly hashes, types written as `EventType.NAME` merged into
+    their value.
+    """
+    expired_keys, legacy_keys, legacy_counters, past_expiries = [], [], [], []
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            hour = _hourly_key_hour(key)
+            if hour is None:
+                continue
+            expiry = hourly_event_expiry(hour)
+            if key.count(':') != 3:
+                past_expiries.append(expiry <= now)
+                await pipe.expireat(key, expiry, nx=True)
+            elif expiry <= now:
+                expired_keys.append(key)
+            else:
+                legacy_keys.append(key)
+                legacy_counters.append(
+                    (event_type_value(key.split(':')[2]), hour),
+                )
+        if expired_keys:
+            await pipe.unlink(*expired_keys)
+        results = await pipe.execute()
+    expired_count = len(expired_keys) + sum(
+        past and bool(expired)
+        for past, expired in zip(past_expiries, results)
+    )
+    if not legacy_keys:
+        return expired_count, 0
+    async with client.pipeline(transaction=False) as pipe:
+        for key in legacy_keys:
+            await pipe.getdel(key)
+        legacy_values = await pipe.execute()
+    hourly = Counter()
+    for counter, value in zip(legacy_counters, legacy_values):
+        if value:
+            hourly[counter] += int(value)
+    await redis_service.add_hourly_counts(dict(hourly))
+    return expired_count, len(legacy_keys)
 
 
 @celery_task_with_logging('Redis cleanup completed', 'Redis cleanup failed')
+@with_task_lock('redis_cleanup')
 async def _cleanup_old_redis_data():
-    """Async implementation of cleanup."""
-    deleted_count = 0
+    """Async implementation of cleanup.
+
+    Hourly keys get a TTL at write time, the sweep only handles legacy
+    keys: aggregations without a TTL get one, per-type counters are
+    unlinked once expired or migrated into the hourly hashes.
+    """
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    deleted_count = migrated_count = scanned_count = 0
     async with redis_service.get_client() as client:
-        async for key in client.scan_iter('events:hourly:*', count=100):
-            key_date = datetime.strptime(
-                str(key).split(':')[-1], TIME_FORMAT,
-            ).replace(tzinfo=timezone.utc)
-            if datetime.now(timezone.utc) - key_date > timedelta(hours=48):
-                await client.delete(key)
-                deleted_count += 1
-                logger.debug(
-                    'Deleted old hourly key',
-                    extra=dict(key=str(key)),
-                    )
-    return dict(deleted_count=deleted_count)
+        async for keys in _scan_batches(client, 'events:hourly:*'):
+            deleted, migrated = await _sweep_batch(
+                client, keys, now,
+            )
+            deleted_count += deleted
+            migrated_count += migrated
+            scanned_count += len(keys)
+    duration = time.monotonic() - started
+    return dict(
+        deleted_count=deleted_count,
+        migrated_count=migrated_count,
+        scanned_count=scanned_count,
+        duration_seconds=round(duration, 3),
+        keys_per_second=round(scanned_count / duration) if duration else 0,
+    )
 
 
 @celery_app.task
 def cleanup_old_redis_data():
     """Cleaning old data from Redis."""
-    return asyncio.run(_cleanup_old_redis_data())
+    return worker_runtime.run(_cleanup_old_redis_data())
 
 
 @celery_task_with_logging(
     'User sessions cleanup completed', 'User sessions cleanup failed',
 )
+@with_task_lock('user_sessions_cleanup')
 async def _cleanup_user_sessions():
-    """Async implementation of cleanup."""
-    deleted_count = 0
-    async with redis_service.get_client() as client:
-        async for key in client.scan_iter('user:activity:*', count=100):
-            last_activity = await client.lindex(key, 0)
-            if last_activity:
-                activity_time = datetime.fromisoformat(
-                    json.loads(last_activity)['timestamp'],
-                )
-                if activity_time < (
-                    datetime.now(timezone.utc) - timedelta(days=7)
-                ):
-                    await client.delete(key)
-                    deleted_count += 1
-                    logger.debug(
-                        'Deleted old user session', extra=dict(key=key),
-                    )
+    """Async implementation of cleanup.
+
+    Inactive users come from the last-activity index, so the runtime
+    does not depend on the number of active users.
+    """
+    deleted_count = await redis_service.remove_inactive_users(
+        datetime.now(timezone.utc) - USER_ACTIVITY_RETENTION,
+    )
     return dict(deleted_count=deleted_count)
 
 
 @celery_app.task
 def cleanup_user_sessions():
     """Cleaning old user sessions."""
-    return asyncio.run(_cleanup_user_sessions())
+    return worker_runtime.run(_cleanup_user_sessions())
+
+
+@celery_task_with_logging(
+    'User activity indexed', 'User activity indexing failed',
+)
+async def _index_user_activity():
+    """Async implementation of indexing activity lists written before
+    the last-activity index existed."""
+    indexed_count = 0
+    async with redis_service.get_client() as client:
+        async for keys in _scan_batches(client, 'user:activity:*'):
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    await pipe.lindex(key, 0)
+                last_activities = await pipe.execute()
+            last_activity = {
+                key.split(':')[-1]: as_utc(datetime.fromisoformat(
+                    json.loads(activity)['timestamp'],
+                ))
+                for key, activity in zip(keys, last_activities) if activity
+            }
+            await redis_service.index_user_activity(last_activity)
+            indexed_count += len(last_activity)
+    return dict(indexed_count=indexed_count)
+
+
+@celery_app.task
+def index_user_activity():
+    """One-off indexing of legacy user activity lists."""
+    return worker_runtime.run(_index_user_activity())
 
 
 @celery_task_with_logging('Stats backup completed', 'Stats backup failed')
@@ -82,4 +198,4 @@ async def _backup_current_stats():
 @celery_app.task
 def backup_current_stats():
     """Backing up current statistics."""
-    return asyncio.run(_backup_current_stats())
+    return worker_runtime.run(_backup_current_stats())
@@ -1,10 +1,21 @@
+import asyncio
 import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
 from functools import wraps
+from typing import Optional
 
 from app.core.db import AsyncSessionLocal
+from app.services import redis_service
 
 logger = logging.getLogger(__name__)
 
+LOCK_LEASE = timedelta(seconds=60)
+LOCK_POLL_INTERVAL = timedelta(seconds=1)
+
 
 def celery_task_with_logging(log_success_message, log_error_msg):
     """
@@ -36,6 +47,87 @@ def celery_task_with_logging(log_success_message, log_error_msg):
     return decorator
 
 
+def _lock_token() -> str:
+    """Unique token of a lock holder, readable in skipped run results."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}'
+
+
+class TaskLockLost(Exception):
+    """The lease of a running task expired or was taken over."""
+
+
+async def _renew_lease(
+    name: str, token: str, lease: timedelta, holder: asyncio.Task,
+) -> None:
+    """Renew the lease every third of its length until cancelled, and
+    cancel the holder once the lease is lost."""
+    renewed_at = time.monotonic()
+    while True:
+        await asyncio.sleep(lease.total_seconds() / 3)
+        try:
+            renewed = await redis_service.renew_lock(name, token, lease)
+        except Exception as error:
+            logger.warning(
+                'Task lock renewal failed',
+                extra=dict(lock=name, error=str(error)),
+            )
+            renewed = time.monotonic() - renewed_at < lease.total_seconds()
+        else:
+            renewed_at = time.monotonic()
+        if not renewed:
+            logger.warning('Task lock lost', extra=dict(lock=name))
+            holder.cancel()
+            return
+
+
+def with_task_lock(
+    name: str,
+    lease: timedelta = LOCK_LEASE,
+    wait: Optional[timedelta] = None,
+):
+    """
+    Decorator for Celery tasks that allows a single run at a time.
+
+    The run holds a Redis lease lock renewed while it works, so a
+    crashed worker frees it within the lease. A duplicate run waits up
+    to `wait` for the lock and is skipped after that. A run whose lease
+    is lost is cancelled at its next await and fails with
+    `TaskLockLost`. Renewal runs on the same event loop, so a run that
+    blocks the loop for longer than the lease loses the lock unnoticed.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _lock_token()
+            deadline = time.monotonic() + (
+                wait.total_seconds() if wait else 0
+            )
+            while not await redis_service.acquire_lock(name, token, lease):
+                if time.monotonic() >= deadline:
+                    holder = await redis_service.get_lock_holder(name)
+                    logger.info(
+                        'Task run skipped',
+                        extra=dict(lock=name, holder=holder),
+                    )
+                    return dict(skipped=True, lock=name, holder=holder)
+                await asyncio.sleep(LOCK_POLL_INTERVAL.total_seconds())
+            run = asyncio.create_task(func(*args, **kwargs))
+            renewal = asyncio.create_task(
+                _renew_lease(name, token, lease, run),
+            )
+            try:
+                return await run
+            except asyncio.CancelledError:
+                if renewal.done() and not renewal.cancelled():
+                    raise TaskLockLost(f'Task lock {name} lost') from None
+                raise
+            finally:
+                renewal.cancel()
+                await redis_service.release_lock(name, token)
+        return wrapper
+    return decorator
+
+
 def with_async_session(func):
     """Decorator to provide async database session to Celery tasks."""
     @wraps(func)
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.crud import stream_events
+from app.services import ParquetExporter, daily_partitions
+from app.tasks.decorators import celery_task_with_logging, with_async_session
+from app.tasks.runtime import worker_runtime
+
+
+@celery_task_with_logging('Events export completed', 'Events export failed')
+@with_async_session
+async def _export_events_to_parquet(
+    session: AsyncSession, start: str, end: str,
+):
+    """Async implementation of export."""
+    range_start, range_end, days = daily_partitions(
+        datetime.fromisoformat(start), datetime.fromisoformat(end),
+    )
+    exporter = ParquetExporter(settings.export_dir)
+    exported_rows = 0
+    async for rows in stream_events(
+        session, range_start, range_end, settings.export_chunk_size,
+    ):
+        exported_rows += await asyncio.to_thread(exporter.write_chunk, rows)
+    manifests = await asyncio.to_thread(exporter.finalize, days)
+    return dict(
+        exported_rows=exported_rows,
+        start=range_start.isoformat(),
+        end=range_end.isoformat(),
+        partitions=[manifest['date'] for manifest in manifests],
+    )
+
+
+@celery_app.task
+def export_events_to_parquet(start: str, end: str):
+    """Export events of the time range into daily Parquet partitions."""
+    return worker_runtime.run(_export_events_to_parquet(start, end))
@@ -1,24 +1,181 @@
-import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
 
 from app.core.celery import celery_app
+from app.core.config import settings
 from app.services import redis_service
 from app.tasks.decorators import celery_task_with_logging
+from app.tasks.runtime import worker_runtime
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SAMPLE_SIZE = 50
+KEYSPACE_SAMPLE_SIZE = 1000
+MEMORY_SERIES_RETENTION = timedelta(days=7)
+KEY_PREFIXES = (
+    'events:total:',
+    'events:counts:',
+    'events:hourly:',
+    'summary:daily:',
+    'user:activity:',
+    'user:metrics:',
+    'user:last_activity',
+    'analytics:query:',
+    'retention:',
+    'metrics:minute:',
+    'backup:stats:',
+    'stats:',
+    'profile:',
+    'watermark:',
+    'lock:',
+    'celery-task-meta-',
+)
+
+
+def _key_prefix(key: str) -> str:
+    for prefix in KEY_PREFIXES:
+        if key.startswith(prefix):
+            return prefix
+    return 'other'
+
+
+async def _sample_counters_memory(client, pattern: str, hashed: bool):
+    """Memory of a sample of counter keys, per key and per counter."""
+    keys = []
+    async for key in client.scan_iter(pattern, count=MEMORY_SAMPLE_SIZE):
+        keys.append(key)
+        if len(keys) == MEMORY_SAMPLE_SIZE:
+            break
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            await pipe.memory_usage(key)
+            await pipe.object('encoding', key)
+            if hashed:
+                await pipe.hlen(key)
+        results = await pipe.execute() if keys else []
+    step = 3 if hashed else 2
+    memory = sum(result or 0 for result in results[::step])
+    counters = sum(results[2::step]) if hashed else len(keys)
+    encodings = {}
+    for encoding in results[1::step]:
+        encodings[encoding] = encodings.get(encoding, 0) + 1
+    return dict(
+        sampled_keys=len(keys),
+        counters=counters,
+        bytes=memory,
+        bytes_per_counter=round(memory / counters, 1) if counters else 0,
+        encodings=encodings,
+    )
+
+
+async def _sample_keyspace_memory(client) -> dict[str, dict[str, int]]:
+    """Key count and memory per prefix estimated from random keys.
+
+    Every sampled key stands for `dbsize / samples` keys, so the
+    estimates cost a fixed number of commands whatever the keyspace
+    size. Prefixes holding a tiny share of keys may be missed.
+    """
+    keys_total = await client.dbsize()
+    if not keys_total:
+        return {}
+    async with client.pipeline(transaction=False) as pipe:
+        for _ in range(min(KEYSPACE_SAMPLE_SIZE, keys_total)):
+            await pipe.randomkey()
+        keys = [key for key in await pipe.execute() if key]
+    if not keys:
+        return {}
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            await pipe.memory_usage(key)
+        usages = await pipe.execute()
+    samples: dict[str, list[int]] = {}
+    for key, usage in zip(keys, usages):
+        sample = samples.setdefault(_key_prefix(key), [0, 0])
+        sample[0] += 1
+        sample[1] += usage or 0
+    scale = keys_total / len(keys)
+    return {
+        prefix: dict(
+            sampled_keys=count,
+            keys=round(count * scale),
+            bytes=round(memory * scale),
+        )
+        for prefix, (count, memory) in sorted(samples.items())
+    }
+
+
+def _growth_alerts(
+    prefixes: dict[str, dict[str, int]],
+    previous: dict[str, Any],
+) -> list[dict[str, Any]]:
+    """Prefixes grown past the ratio and minimum since a snapshot."""
+    alerts = []
+    for prefix, estimate in prefixes.items():
+        before = previous['prefixes'].get(prefix, {}).get('bytes', 0)
+        growth = estimate['bytes'] - before
+        if (
+            growth >= settings.redis_memory_growth_min_bytes
+            and growth >= before * settings.redis_memory_growth_ratio
+        ):
+            alerts.append(dict(
+                prefix=prefix,
+                bytes=estimate['bytes'],
+                previous_bytes=before,
+                growth_bytes=growth,
+                since=previous['at'],
+            ))
+    return alerts
 
 
 @celery_task_with_logging(
     'Redis memory usage', 'Redis memory monitoring failed',
 )
 async def _monitor_redis_memory():
-    """Async implementation of memory monitoring."""
+    """Async implementation of memory monitoring.
+
+    Compares the memory per counter of hourly hashes with legacy
+    per-type string counters that have not been migrated yet, and
+    keeps a time series of memory per key prefix, warning about
+    prefixes growing faster than the configured ratio.
+    """
+    now = datetime.now(timezone.utc)
+    window = timedelta(minutes=settings.redis_memory_growth_window_minutes)
     async with redis_service.get_client() as client:
         info = await client.info('memory')
-        return dict(
-            memory_used=info.get('used_memory', 0),
-            memory_peak=info.get('used_memory_peak', 0),
+        hashed = await _sample_counters_memory(
+            client, 'events:counts:*', hashed=True,
+        )
+        legacy = await _sample_counters_memory(
+            client, 'events:hourly:*:*', hashed=False,
         )
+        prefixes = await _sample_keyspace_memory(client)
+    snapshots = await redis_service.get_memory_snapshots(now - window)
+    alerts = _growth_alerts(prefixes, snapshots[0]) if snapshots else []
+    for alert in alerts:
+        logger.warning('Redis key prefix growing fast', extra=alert)
+    await redis_service.add_memory_snapshot(
+        dict(at=now.isoformat(), prefixes=prefixes),
+        now,
+        MEMORY_SERIES_RETENTION,
+    )
+    return dict(
+        memory_used=info.get('used_memory', 0),
+        memory_peak=info.get('used_memory_peak', 0),
+        hourly_counters=dict(
+            hash=hashed,
+            legacy=legacy,
+            saved_bytes_per_counter=round(
+                legacy['bytes_per_counter'] - hashed['bytes_per_counter'],
+                1,
+            ) if hashed['counters'] and legacy['counters'] else None,
+        ),
+        prefixes=prefixes,
+        alerts=alerts,
+    )
 
 
 @celery_app.task
 def monitor_redis_memory():
     """Monitoring Redis memory usage."""
-    return asyncio.run(_monitor_redis_memory())
+    return worker_runtime.run(_monitor_redis_memory())
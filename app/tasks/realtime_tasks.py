@@ -1,10 +1,10 @@
-import asyncio
 import json
 from datetime import datetime, timedelta, timezone
 
 from app.core.celery import celery_app
 from app.services import redis_service
 from app.tasks.decorators import celery_task_with_logging
+from app.tasks.runtime import worker_runtime
 
 
 @celery_task_with_logging(
@@ -35,4 +35,4 @@ async def _update_realtime_metrics():
 @celery_app.task
 def update_realtime_metrics():
     """Real-time metrics update every minute."""
-    return asyncio.run(_update_realtime_metrics())
+    return worker_runtime.run(_update_realtime_metrics())
@@ -0,0 +1,187 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.crud import (
+    count_events_by_type,
+    count_hourly_events,
+    get_recent_activity,
+    user_id_partition,
+)
+from app.services import redis_service
+from app.services.redis_service import (
+    HOURLY_EVENTS_RETENTION, USER_ACTIVITY_LENGTH, USER_ACTIVITY_RETENTION,
+)
+from app.tasks.decorators import (
+    celery_task_with_logging, with_async_session, with_task_lock,
+)
+from app.tasks.runtime import worker_runtime
+
+HOUR = timedelta(hours=1)
+MAX_REPORTED_DIFFERENCES = 100
+REBUILD_LOCK_WAIT = timedelta(minutes=5)
+
+
+def _counter_hours(now: datetime) -> list[datetime]:
+    """Clock hours whose counters Redis still keeps."""
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    return [
+        current_hour - HOUR * offset
+        for offset in range(HOURLY_EVENTS_RETENTION // HOUR, -1, -1)
+    ]
+
+
+@with_async_session
+async def _scan_counters(
+    session: AsyncSession,
+    user_id_range: tuple[UUID, Optional[UUID]],
+    since: datetime,
+):
+    return (
+        await count_events_by_type(session, user_id_range),
+        await count_hourly_events(session, since, user_id_range),
+    )
+
+
+@with_async_session
+async def _scan_activity(
+    session: AsyncSession,
+    user_id_range: tuple[UUID, Optional[UUID]],
+    since: datetime,
+):
+    return await get_recent_activity(
+        session, since, USER_ACTIVITY_LENGTH, user_id_range,
+    )
+
+
+def _partition_ranges() -> list[tuple[UUID, Optional[UUID]]]:
+    partitions = settings.redis_rebuild_partitions
+    return [
+        user_id_partition(index, partitions) for index in range(partitions)
+    ]
+
+
+async def _postgres_counters(hours: list[datetime]):
+    """Counter values recomputed from parallel user id range scans."""
+    scans = await asyncio.gather(*(
+        _scan_counters(user_id_range, hours[0])
+        for user_id_range in _partition_ranges()
+    ))
+    totals, hourly = Counter(), Counter()
+    for partition_totals, partition_hourly in scans:
+        totals.update(partition_totals)
+        hourly.update(partition_hourly)
+    return dict(totals), dict(hourly)
+
+
+def _flatten_counters(
+    totals: dict[str, int], hourly: dict[tuple[str, datetime], int],
+) -> dict[tuple[str, Optional[str]], int]:
+    """Counters by event type and hour, `None` hour for totals."""
+    counters = {
+        (event_type, None): events for event_type, events in totals.items()
+    }
+    for (event_type, hour), events in hourly.items():
+        counters[event_type, hour.isoformat()] = events
+    return counters
+
+
+@celery_task_with_logging(
+    'Redis counters rebuilt', 'Redis counters rebuild failed',
+)
+@with_task_lock('redis_counters', wait=REBUILD_LOCK_WAIT)
+async def _rebuild_redis_counters():
+    """Async implementation of rebuild.
+
+    Counters of hours Redis keeps and activity lists of recently
+    active users are recomputed from the event table. Events ingested
+    during the rebuild may be counted twice or missed by the current hour.
+    """
+    now = datetime.now(timezone.utc)
+    hours = _counter_hours(now)
+    totals, hourly = await _postgres_counters(hours)
+    stale_counters = await redis_service.rebuild_event_counters(
+        totals, hourly, hours,
+    )
+
+    user_activity = {}
+    for partition_activity in await asyncio.gather(*(
+        _scan_activity(user_id_range, now - USER_ACTIVITY_RETENTION)
+        for user_id_range in _partition_ranges()
+    )):
+        user_activity.update(partition_activity)
+    await redis_service.rebuild_user_activity(user_activity)
+    return dict(
+        counters=len(totals) + len(hourly),
+        stale_counters=stale_counters,
+        users=len(user_activity),
+    )
+
+
+@celery_app.task
+def rebuild_redis_counters():
+    """Rebuilding Redis realtime counters from Postgres."""
+    return worker_runtime.run(_rebuild_redis_counters())
+
+
+@celery_task_with_logging(
+    'Redis counters drift checked', 'Redis counters drift check failed',
+)
+@with_task_lock('redis_counters')
+async def _check_counters_drift():
+    """Async implementation of drift check, Redis is left untouched."""
+    hours = _counter_hours(datetime.now(timezone.utc))
+    expected = _flatten_counters(*await _postgres_counters(hours))
+    actual = _flatten_counters(
+        *await redis_service.get_event_counters(hours),
+    )
+    counters = sorted(
+        expected.keys() | actual.keys(),
+        key=lambda counter: (counter[1] or '', counter[0]),
+    )
+    differences = [
+        dict(
+            event_type=event_type,
+            hour=hour,
+            redis=actual.get((event_type, hour), 0),
+            postgres=expected.get((event_type, hour), 0),
+        )
+        for event_type, hour in counters
+        if actual.get((event_type, hour), 0) != expected.get(
+            (event_type, hour), 0,
+        )
+    ]
+    return dict(
+        drifted_counters=len(differences),
+        checked_counters=len(counters),
+        differences=differences[:MAX_REPORTED_DIFFERENCES],
+    )
+
+
+@celery_app.task
+def check_counters_drift():
+    """Comparing Redis counters with Postgres aggregates."""
+    return worker_runtime.run(_check_counters_drift())
+
+
+@celery_task_with_logging(
+    'Redis counters normalized', 'Redis counters normalization failed',
+)
+@with_task_lock('redis_counters', wait=REBUILD_LOCK_WAIT)
+async def _normalize_event_counters():
+    """Async implementation of merging counters written under the
+    `EventType.NAME` form of event types into their values."""
+    merged_counters = await redis_service.normalize_event_counters()
+    return dict(merged_counters=merged_counters)
+
+
+@celery_app.task
+def normalize_event_counters():
+    """One-off merge of counters keyed by the enum name."""
+    return worker_runtime.run(_normalize_event_counters())
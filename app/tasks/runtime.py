@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Any, Coroutine, Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, engine, instrument_engine
+from app.services import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRuntime:
+    """Long-lived event loop of a Celery worker process.
+
+    The loop owns the process' DB engine and Redis pool, so connections
+    are reused across tasks instead of being bound to a loop per task.
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.engine: Optional[AsyncEngine] = None
+
+    def start(self) -> None:
+        """Create the loop with its own DB engine and Redis pool."""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.engine = instrument_engine(create_async_engine(
+            settings.database_url, pool_pre_ping=True,
+        ))
+        AsyncSessionLocal.configure(bind=self.engine)
+        redis_service.reset()
+        logger.info('Worker event loop started')
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """Run a task body on the loop of the process.
+
+        A soft time limit raises from inside the loop and leaves the
+        body pending, so it is cancelled and drained before the error
+        propagates instead of resuming with the next task.
+        """
+        if self.loop is None:
+            self.start()
+        task = self.loop.create_task(coroutine)
+        try:
+            return self.loop.run_until_complete(task)
+        except BaseException:
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    self.loop.run_until_complete(task)
+            raise
+
+    async def _dispose(self) -> None:
+        await redis_service.close()
+        redis_service.reset()
+        await self.engine.dispose()
+
+    def stop(self) -> None:
+        """Close connections of the loop and the loop itself."""
+        if self.loop is None:
+            return
+        try:
+            self.loop.run_until_complete(self._dispose())
+        finally:
+            AsyncSessionLocal.configure(bind=engine)
+            self.loop.close()
+            asyncio.set_event_loop(None)
+            self.loop, self.engine = None, None
+            logger.info('Worker event loop stopped')
+
+
+worker_runtime = WorkerRuntime()
+
+
+@worker_process_init.connect
+def start_worker_runtime(**kwargs) -> None:
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+def stop_worker_runtime(**kwargs) -> None:
+    worker_runtime.stop()
@@ -0,0 +1,224 @@
+import logging
+import math
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Any, Iterator, Optional
+
+from celery import states
+from celery.signals import task_postrun, task_prerun
+from prometheus_client import CollectorRegistry, Metric
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+from prometheus_client.registry import Collector
+from prometheus_client.utils import floatToGoString
+
+from app.core.celery import TASK_QUEUES, celery_app
+from app.services import redis_service
+from app.tasks.runtime import worker_runtime
+
+logger = logging.getLogger(__name__)
+
+TASK_DURATION_BUCKETS = (
+    0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+)
+OUTCOMES = ('successes', 'failures', 'retries', 'skipped')
+TIMINGS = ('duration', 'wait')
+
+_started: dict[str, tuple[float, float]] = {}
+
+
+def _outcome(state: Optional[str], retval: Any) -> str:
+    """Tasks report handled errors and skipped runs in their result."""
+    if state == states.RETRY:
+        return 'retries'
+    if state == states.FAILURE or (
+        isinstance(retval, dict) and retval.get('status') == 'error'
+    ):
+        return 'failures'
+    if isinstance(retval, dict) and retval.get('skipped'):
+        return 'skipped'
+    return 'successes'
+
+
+def task_run_stats(
+    queue: str,
+    outcome: str,
+    duration: float,
+    wait: Optional[float],
+    finished_at: datetime,
+) -> tuple[dict[str, int], dict[str, float], dict[str, Any]]:
+    """Counter increments, sum increments and fields of a task run."""
+    timings = dict(duration=duration)
+    if wait is not None:
+        timings['wait'] = max(wait, 0.0)
+    counters = dict(runs=1, **{outcome: 1})
+    for timing, seconds in timings.items():
+        counters[
+            f'{timing}_bucket:{bisect_left(TASK_DURATION_BUCKETS, seconds)}'
+        ] = 1
+        counters[f'{timing}_count'] = 1
+    return (
+        counters,
+        {f'{timing}_sum': seconds for timing, seconds in timings.items()},
+        dict(
+            queue=queue,
+            last_status=outcome,
+            last_duration=round(duration, 3),
+            last_run_at=finished_at.isoformat(),
+        ),
+    )
+
+
+@task_prerun.connect
+def start_task_timer(task_id: str, **kwargs) -> None:
+    _started[task_id] = (time.perf_counter(), time.time())
+
+
+@task_postrun.connect
+def record_task_run(
+    task_id: str, task, retval: Any = None, state: str = None, **kwargs,
+) -> None:
+    """Record duration, outcome and queue wait of a finished run."""
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started[0]
+    enqueued_at = getattr(task.request, 'enqueued_at', None)
+    queue = (task.request.delivery_info or {}).get('routing_key') or 'celery'
+    try:
+        worker_runtime.run(redis_service.record_task_stats(
+            task.name,
+            *task_run_stats(
+                queue,
+                _outcome(state, retval),
+                duration,
+                started[1] - enqueued_at if enqueued_at else None,
+                datetime.now(timezone.utc),
+            ),
+        ))
+    except Exception as error:
+        logger.warning(
+            'Task statistics not recorded',
+            extra=dict(task=task.name, error=str(error)),
+        )
+
+
+def _percentile(buckets: list[int], count: int, quantile: float):
+    """Upper bound of the bucket holding the quantile, `None` above all."""
+    cumulative = 0
+    for upper_bound, bucket in zip(TASK_DURATION_BUCKETS, buckets):
+        cumulative += bucket
+        if cumulative >= quantile * count:
+            return upper_bound
+    return None
+
+
+def _buckets(raw: dict[str, str], timing: str) -> list[int]:
+    return [
+        int(raw.get(f'{timing}_bucket:{index}', 0))
+        for index in range(len(TASK_DURATION_BUCKETS) + 1)
+    ]
+
+
+def _timing_summary(raw: dict[str, str], timing: str) -> dict[str, Any]:
+    count = int(raw.get(f'{timing}_count', 0))
+    buckets = _buckets(raw, timing)
+    return dict(
+        count=count,
+        avg=round(float(raw[f'{timing}_sum']) / count, 3) if count else None,
+        p50=_percentile(buckets, count, 0.5) if count else None,
+        p95=_percentile(buckets, count, 0.95) if count else None,
+    )
+
+
+def summarize_task_stats(
+    stats: dict[str, dict[str, str]],
+) -> dict[str, dict[str, Any]]:
+    """Task statistics with averages and bucket percentiles."""
+    return {
+        task_name: dict(
+            queue=raw.get('queue'),
+            runs=int(raw.get('runs', 0)),
+            **{outcome: int(raw.get(outcome, 0)) for outcome in OUTCOMES},
+            **{timing: _timing_summary(raw, timing) for timing in TIMINGS},
+            last_status=raw.get('last_status'),
+            last_duration=float(raw.get('last_duration', 0)),
+            last_run_at=raw.get('last_run_at'),
+        )
+        for task_name, raw in stats.items()
+    }
+
+
+def queue_depths() -> dict[str, Optional[int]]:
+    """Messages waiting in every task queue, `None` if unavailable."""
+    depths = {}
+    with celery_app.connection_for_read() as connection:
+        for queue in TASK_QUEUES:
+            try:
+                depths[queue] = connection.default_channel.queue_declare(
+                    queue=queue, passive=True,
+                ).message_count
+            except Exception as error:
+                logger.warning(
+                    'Queue depth unavailable',
+                    extra=dict(queue=queue, error=str(error)),
+                )
+                depths[queue] = None
+    return depths
+
+
+class TaskStatsCollector(Collector):
+    """Task statistics read from Redis as Prometheus metrics."""
+
+    def __init__(self, stats: dict[str, dict[str, str]]):
+        self.stats = stats
+
+    def _histogram(
+        self, name: str, documentation: str, timing: str,
+    ) -> HistogramMetricFamily:
+        family = HistogramMetricFamily(
+            name, documentation, labels=('task', 'queue'),
+        )
+        upper_bounds = [
+            floatToGoString(bound)
+            for bound in TASK_DURATION_BUCKETS + (math.inf,)
+        ]
+        for task_name, raw in self.stats.items():
+            family.add_metric(
+                (task_name, raw.get('queue', '')),
+                list(zip(upper_bounds, accumulate(_buckets(raw, timing)))),
+                float(raw.get(f'{timing}_sum', 0)),
+            )
+        return family
+
+    def collect(self) -> Iterator[Metric]:
+        runs = CounterMetricFamily(
+            'celery_task_runs_total',
+            'Finished Celery task runs by outcome.',
+            labels=('task', 'queue', 'outcome'),
+        )
+        for task_name, raw in self.stats.items():
+            for outcome in OUTCOMES:
+                runs.add_metric(
+                    (task_name, raw.get('queue', ''), outcome),
+                    int(raw.get(outcome, 0)),
+                )
+        yield runs
+        yield self._histogram(
+            'celery_task_duration_seconds',
+            'Celery task run duration.',
+            'duration',
+        )
+        yield self._histogram(
+            'celery_task_queue_wait_seconds',
+            'Time from publishing a Celery task to its start.',
+            'wait',
+        )
+
+
+def task_metrics(stats: dict[str, dict[str, str]]) -> CollectorRegistry:
+    """Task statistics as Prometheus metrics."""
+    registry = CollectorRegistry()
+    registry.register(TaskStatsCollector(stats))
+    return registry
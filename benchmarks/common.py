@@ -0,0 +1,246 @@
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from sqlalchemy.ext.asyncio import (
+    AsyncSession, async_sessionmaker, create_async_engine,
+)
+
+from app.core.db import Base, get_async_session, instrument_engine
+from app.models import EventType
+from app.services import redis_service
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+FAKE_REDIS = 'fake'
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+EVENT_TYPE_WEIGHTS = {
+    EventType.PAGE_VIEW: 0.7,
+    EventType.CLICK: 0.25,
+    EventType.PURCHASE: 0.05,
+}
+
+
+def random_event_types(rng: random.Random, count: int) -> list[EventType]:
+    """Event types in the mix of production traffic."""
+    return rng.choices(
+        list(EVENT_TYPE_WEIGHTS), list(EVENT_TYPE_WEIGHTS.values()), k=count,
+    )
+
+
+def event_data(rng: random.Random, event_type: EventType) -> dict[str, Any]:
+    """Payload of an event, purchases carry an amount."""
+    data = dict(page=f'/page/{rng.randrange(50)}')
+    if event_type == EventType.PURCHASE:
+        data.update(amount=round(rng.uniform(1, 200), 2), currency='USD')
+    return data
+
+
+def percentile(values: list[float], quantile: float) -> Optional[float]:
+    """Nearest-rank percentile of the values, `None` without values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(quantile * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies: list[float]) -> dict[str, Any]:
+    """Percentiles of latencies in seconds, in milliseconds."""
+    return dict(
+        count=len(latencies),
+        **{
+            name: round(percentile(latencies, quantile) * 1000, 3)
+            if latencies else None
+            for name, quantile in PERCENTILES
+        },
+    )
+
+
+async def measure(
+    operation: Callable[[int], Awaitable[bool]],
+    count: int,
+    concurrency: int,
+) -> dict[str, Any]:
+    """Run the operation `count` times from concurrent workers.
+
+    The operation gets the run index and returns whether it succeeded,
+    exceptions count as errors.
+    """
+    latencies, errors, indexes = [], 0, iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for index in indexes:
+            started = time.perf_counter()
+            try:
+                succeeded = await operation(index)
+            except Exception:
+                succeeded = False
+            latencies.append(time.perf_counter() - started)
+            errors += not succeeded
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return dict(
+        operations=count,
+        errors=errors,
+        seconds=round(elapsed, 3),
+        per_second=round(count / elapsed, 1) if elapsed else None,
+        latency_ms=latency_summary(latencies),
+    )
+
+
+class RedisCommandCounter:
+    """Counts Redis commands and round trips issued by this process.
+
+    Commands are counted on the client, so counts are the same for
+    a redis-server and fakeredis. A pipeline execution is one round
+    trip, pub/sub connections are not counted.
+    """
+
+    def __init__(self):
+        self.commands: Counter = Counter()
+        self.round_trips = 0
+
+    @contextmanager
+    def counting(self):
+        execute_command = redis.Redis.execute_command
+        pipeline_command = Pipeline.execute_command
+        pipeline_execute = Pipeline.execute
+
+        async def count_command(client, *args, **options):
+            self.commands[str(args[0]).upper()] += 1
+            self.round_trips += 1
+            return await execute_command(client, *args, **options)
+
+        def count_pipelined(pipe, *args, **kwargs):
+            self.commands[str(args[0]).upper()] += 1
+            return pipeline_command(pipe, *args, **kwargs)
+
+        async def count_execute(pipe, *args, **kwargs):
+            self.round_trips += 1
+            return await pipeline_execute(pipe, *args, **kwargs)
+
+        redis.Redis.execute_command = count_command
+        Pipeline.execute_command = count_pipelined
+        Pipeline.execute = count_execute
+        try:
+            yield self
+        finally:
+            redis.Redis.execute_command = execute_command
+            Pipeline.execute_command = pipeline_command
+            Pipeline.execute = pipeline_execute
+
+    def per_operation(self, operations: int) -> dict[str, Any]:
+        """Commands and round trips per operation, by command too."""
+        return dict(
+            commands=round(sum(self.commands.values()) / operations, 2),
+            round_trips=round(self.round_trips / operations, 2),
+            by_command={
+                command: round(count / operations, 2)
+                for command, count in self.commands.most_common()
+            },
+        )
+
+
+def create_redis_client(url: str) -> redis.Redis:
+    """Client of a local redis-server, or of fakeredis for `fake`."""
+    if url != FAKE_REDIS:
+        return redis.from_url(url, decode_responses=True)
+    try:
+        from fakeredis import FakeAsyncRedis
+    except ImportError:
+        raise SystemExit(
+            'fakeredis is not installed: pip install "fakeredis[lua]"',
+        )
+    return FakeAsyncRedis(decode_responses=True)
+
+
+@asynccontextmanager
+async def use_redis(url: str, flush: bool = False):
+    """Point the Redis service at the server for the duration."""
+    client = create_redis_client(url)
+    if flush:
+        await client.flushdb()
+    previous, redis_service._client = redis_service._client, client
+    try:
+        yield client
+    finally:
+        redis_service._client = previous
+        await client.aclose()
+
+
+@asynccontextmanager
+async def use_database(app, url: Optional[str]):
+    """Serve the app sessions from the database, creating its tables.
+
+    Without a URL, a SQLite database in a temporary directory is used.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = instrument_engine(create_async_engine(
+            url or f'sqlite+aiosqlite:///{directory}/benchmark.sqlite3',
+        ))
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False,
+        )
+
+        async def get_benchmark_session():
+            async with sessions() as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = get_benchmark_session
+        try:
+            yield sessions
+        finally:
+            app.dependency_overrides.pop(get_async_session, None)
+            await engine.dispose()
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(
+    benchmark: str, parameters: dict[str, Any], results: dict[str, Any],
+    output: Optional[Path] = None,
+) -> Path:
+    """Write results with the commit and environment they came from."""
+    finished_at = datetime.now(timezone.utc)
+    output = output or RESULTS_DIR / (
+        f'{benchmark}-{finished_at:%Y%m%dT%H%M%S}.json'
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(
+        dict(
+            benchmark=benchmark,
+            commit=_commit(),
+            finished_at=finished_at.isoformat(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            parameters=parameters,
+            results=results,
+        ),
+        indent=2,
+    ))
+    return output
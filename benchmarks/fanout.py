@@ -0,0 +1,317 @@
+"""Dashboard fan-out load generator.
+
+Opens authenticated `/ws/dashboard` connections against a running app,
+publishes to the `dashboard-updates` channel at a fixed rate and
+measures how long broadcasts take to reach every connection:
+
+    python -m benchmarks.fanout --spawn --connections 5000 --rate 10 \
+        --duration 30 --redis-url redis://localhost:6379/15
+
+With `--spawn`, a uvicorn server is started on `--port` with the
+given Redis, otherwise `--server-pid` of a running instance enables
+the CPU measurement. Pub/sub crosses processes, so a redis-server is
+needed, fakeredis is not enough.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import redis.asyncio as redis
+from jose import jwt
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
+
+from app.core.config import settings
+from app.services.background_tasks import DASHBOARD_UPDATES
+from benchmarks.common import latency_summary, write_results
+
+HANDSHAKE_CONCURRENCY = 200
+SERVER_START_TIMEOUT = 30
+
+
+def dashboard_token(user_id: uuid.UUID) -> str:
+    return jwt.encode({'sub': str(user_id)}, settings.secret, 'HS256')
+
+
+def process_cpu_seconds(pid: int) -> Optional[float]:
+    """User and system CPU time of a process, `None` off Linux."""
+    try:
+        stat = Path(f'/proc/{pid}/stat').read_text()
+    except OSError:
+        return None
+    fields = stat.rpartition(')')[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def raise_open_files_limit() -> None:
+    """Every connection is a file descriptor, on both ends."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def spawn_server(host: str, port: int, redis_url: str) -> subprocess.Popen:
+    """Start the app with uvicorn, the limit of open files inherited."""
+    return subprocess.Popen(
+        [
+            sys.executable, '-m', 'uvicorn', 'app.main:app',
+            '--host', host, '--port', str(port), '--log-level', 'warning',
+        ],
+        env=dict(os.environ, REDIS_URL=redis_url, LOG_LEVEL='WARNING'),
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_for_server(base_url: str) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            try:
+                await client.get('/')
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+class DashboardClient:
+    """One authenticated dashboard connection recording deliveries.
+
+    Latency is measured from the publish timestamp in the message,
+    so the publisher and clients share a clock.
+    """
+
+    def __init__(self, deliveries: dict[int, list[float]]):
+        self.deliveries = deliveries
+        self.websocket: Optional[ClientConnection] = None
+        self.received = 0
+        self.closed = False
+
+    async def open(self, url: str, handshakes: asyncio.Semaphore) -> None:
+        async with handshakes:
+            self.websocket = await connect(url, max_size=None)
+            await self.websocket.send(json.dumps(dict(
+                type='auth', token=dashboard_token(uuid.uuid4()),
+            )))
+            json.loads(await self.websocket.recv())
+
+    async def receive(self) -> None:
+        try:
+            async for raw in self.websocket:
+                received_at = time.time()
+                message = json.loads(raw)
+                if message.get('message_type') != 'broadcast':
+                    continue
+                try:
+                    content = json.loads(message['content'])
+                    sequence = content['benchmark_seq']
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self.deliveries[sequence].append(
+                    received_at - content['sent_at'],
+                )
+                self.received += 1
+        except ConnectionClosed:
+            pass
+        self.closed = True
+
+    async def keep_alive(self, interval: float) -> None:
+        """Message the server before it drops the idle connection.
+
+        The message has no `action`, so the server does no work for it
+        and only the broadcasts are measured.
+        """
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                await self.websocket.send(json.dumps(dict(type='keepalive')))
+            except ConnectionClosed:
+                return
+            await asyncio.sleep(interval)
+
+
+async def publish(
+    client: redis.Redis, rate: float, duration: float, payload_size: int,
+) -> int:
+    """Publish numbered messages on schedule, return how many."""
+    loop = asyncio.get_running_loop()
+    count = int(rate * duration)
+    started = loop.time()
+    for sequence in range(count):
+        await asyncio.sleep(max(started + sequence / rate - loop.time(), 0))
+        await client.publish(DASHBOARD_UPDATES, json.dumps(dict(
+            benchmark_seq=sequence,
+            sent_at=time.time(),
+            padding='x' * payload_size,
+        )))
+    return count
+
+
+async def run_fanout(
+    url: str,
+    redis_url: str,
+    connections: int,
+    rate: float,
+    duration: float,
+    payload_size: int = 0,
+    keepalive: float = 20,
+    drain: float = 2,
+    server_pid: Optional[int] = None,
+) -> dict:
+    """Connect the clients, publish, and summarize the deliveries."""
+    deliveries: dict[int, list[float]] = defaultdict(list)
+    handshakes = asyncio.Semaphore(HANDSHAKE_CONCURRENCY)
+    clients = [DashboardClient(deliveries) for _ in range(connections)]
+    started = time.perf_counter()
+    opened = await asyncio.gather(
+        *(client.open(url, handshakes) for client in clients),
+        return_exceptions=True,
+    )
+    connect_seconds = time.perf_counter() - started
+    connected = [
+        client for client, error in zip(clients, opened) if error is None
+    ]
+    tasks = [
+        asyncio.create_task(coroutine)
+        for client in connected
+        for coroutine in (client.receive(), client.keep_alive(keepalive))
+    ]
+    publisher = redis.from_url(redis_url, decode_responses=True)
+    try:
+        server_cpu = server_pid and process_cpu_seconds(server_pid)
+        client_cpu = time.process_time()
+        started = time.perf_counter()
+        published = await publish(publisher, rate, duration, payload_size)
+        await asyncio.sleep(drain)
+        elapsed = time.perf_counter() - started
+        client_cpu = time.process_time() - client_cpu
+        if server_cpu is not None:
+            server_cpu = process_cpu_seconds(server_pid) - server_cpu
+    finally:
+        await publisher.aclose()
+        for task in tasks:
+            task.cancel()
+        for client in connected:
+            await client.websocket.close()
+    expected = published * len(connected)
+    delivered = sum(len(latencies) for latencies in deliveries.values())
+    return dict(
+        connections=dict(
+            requested=connections,
+            connected=len(connected),
+            failed=connections - len(connected),
+            closed_by_server=sum(client.closed for client in connected),
+            connect_seconds=round(connect_seconds, 3),
+        ),
+        messages=dict(
+            published=published,
+            expected=expected,
+            delivered=delivered,
+            dropped=expected - delivered,
+            drop_rate=round(1 - delivered / expected, 6) if expected else None,
+        ),
+        delivery_latency_ms=latency_summary([
+            latency
+            for latencies in deliveries.values()
+            for latency in latencies
+        ]),
+        broadcast_latency_ms=latency_summary([
+            max(latencies) for latencies in deliveries.values()
+        ]),
+        server_cpu=dict(
+            seconds=round(server_cpu, 3),
+            utilization=round(server_cpu / elapsed, 3),
+        ) if server_cpu is not None else None,
+        client_cpu_utilization=round(client_cpu / elapsed, 3),
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    raise_open_files_limit()
+    server, server_pid = None, args.server_pid
+    if args.spawn:
+        server = spawn_server(args.host, args.port, args.redis_url)
+        server_pid = server.pid
+    try:
+        await wait_for_server(f'http://{args.host}:{args.port}')
+        results = await run_fanout(
+            f'ws://{args.host}:{args.port}/ws/dashboard',
+            args.redis_url,
+            args.connections,
+            args.rate,
+            args.duration,
+            args.payload_size,
+            args.keepalive,
+            args.drain,
+            server_pid,
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    path = write_results(
+        'fanout',
+        dict(
+            connections=args.connections,
+            rate=args.rate,
+            duration=args.duration,
+            payload_size=args.payload_size,
+            keepalive=args.keepalive,
+            spawned=args.spawn,
+        ),
+        results,
+        args.output,
+    )
+    messages = results['messages']
+    print(
+        f'{results["connections"]["connected"]} connections, '
+        f'{messages["delivered"]}/{messages["expected"]} delivered, '
+        f'delivery p50 {results["delivery_latency_ms"]["p50"]} ms, '
+        f'p99 {results["delivery_latency_ms"]["p99"]} ms, '
+        f'broadcast p99 {results["broadcast_latency_ms"]["p99"]} ms'
+    )
+    if results['client_cpu_utilization'] > 0.9:
+        print('The load generator was CPU bound, latencies are inflated')
+    print(f'Results written to {path}')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument(
+        '--rate', type=float, default=5, help='messages published per second',
+    )
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--payload-size', type=int, default=256)
+    parser.add_argument('--keepalive', type=float, default=20)
+    parser.add_argument(
+        '--drain', type=float, default=2,
+        help='seconds to wait for deliveries after publishing',
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--redis-url', default=settings.redis_url)
+    parser.add_argument('--spawn', action='store_true')
+    parser.add_argument('--server-pid', type=int)
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--log-level', default='WARNING')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.getLogger().setLevel(args.log_level)
+    asyncio.run(main(args))
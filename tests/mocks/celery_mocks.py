@@ -45,6 +45,8 @@ def mock_redis_for_tasks():
     mock.delete = AsyncMock()
     mock.info = AsyncMock(return_value={'used_memory': 1024000})
     mock.lindex = AsyncMock(return_value=None)
+    mock.dbsize = AsyncMock(return_value=0)
+    mock.zrangebyscore = AsyncMock(return_value=[])
     mock.__aenter__ = AsyncMock(return_value=mock)
     mock.__aexit__ = AsyncMock()
     return mock
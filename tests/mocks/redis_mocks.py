@@ -125,3 +125,11 @@ async def redis_for_close_test(mock_redis_dependencies):
     """Redis for close method tests."""
     mock_redis_dependencies.aclose = AsyncMock()
     return mock_redis_dependencies
+
+
+@pytest.fixture
+def redis_for_query_cache(mock_redis_dependencies):
+    """Redis without cached analytics query results."""
+    mock_redis_dependencies.get = AsyncMock(return_value=None)
+    mock_redis_dependencies.setex = AsyncMock()
+    return mock_redis_dependencies
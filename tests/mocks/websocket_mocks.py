@@ -3,6 +3,7 @@ import uuid
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from starlette.websockets import WebSocketState
 
 from tests.mocks.redis_mocks import create_redis_client, create_redis_pubsub
 
@@ -15,6 +16,7 @@ def create_websocket_mock(**kwargs):
     mock.receive_json = AsyncMock()
     mock.close = AsyncMock()
     mock.client = AsyncMock(host='127.0.0.1', port=8000)
+    mock.application_state = WebSocketState.CONNECTING
 
     for key, value in kwargs.items():
         setattr(mock, key, value)
@@ -82,8 +84,8 @@ def mock_redis_for_websocket():
 
     async def mock_listen():
         messages = [
-            {'type': 'message', 'data': b'{"event": "dashboard_update"}'},
-            {'type': 'message', 'data': b'{"event": "stats_update"}'},
+            {'type': 'message', 'data': '{"event": "dashboard_update"}'},
+            {'type': 'message', 'data': '{"event": "stats_update"}'},
         ]
         for message in messages:
             yield message
@@ -1,6 +1,20 @@
+import asyncio
+import json
+import sys
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.db import instrument_engine, normalize_sql, slow_queries
+from app.core.metrics import registry
+from app.core.profiling import RequestProfiler
+from app.models import Event, EventType
+from app.services import LoopMonitor, redis_service
 
 
 async def test_stats_summary_access_denied_for_regular_user(
@@ -148,3 +162,273 @@ async def test_stats_realtime_with_mocked_data(
         assert data['events_by_type']['page_view'] == 150
         assert data['events_by_type']['click'] == 75
         assert data['active_users'] == 2
+
+
+async def test_stats_realtime_keeps_shared_client(
+    superuser_client, mock_redis_dependencies,
+):
+    """Concurrent requests share the Redis pool and leave it open."""
+    responses = await asyncio.gather(*(
+        superuser_client.get('/analytics/stats/realtime') for _ in range(2)
+    ))
+    assert [response.status_code for response in responses] == [
+        HTTPStatus.OK, HTTPStatus.OK,
+    ]
+    mock_redis_dependencies.aclose.assert_not_awaited()
+    assert redis_service._client is mock_redis_dependencies
+
+
+async def test_query_groups_by_dimensions(
+    superuser_client, sample_event_data, redis_for_query_cache,
+):
+    """Test ad-hoc query grouped by event type, time bucket and data key."""
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    for event_type, page in (
+        ('page_view', 'home'), ('page_view', 'home'), ('click', 'cart'),
+    ):
+        response = await superuser_client.post('/event/', json={
+            **sample_event_data,
+            'event_type': event_type,
+            'data': {'page': page},
+        })
+        assert response.status_code == HTTPStatus.CREATED
+
+    response = await superuser_client.post('/analytics/query', json={
+        'start': start.isoformat(),
+        'group_by': ['event_type', 'time', 'data.page'],
+        'bucket': '1 day',
+    })
+    assert response.status_code == HTTPStatus.OK
+
+    data = response.json()
+    assert data['cached'] is False
+    rows = {(row['event_type'], row['data.page']): row for row in data['rows']}
+    assert rows[('page_view', 'home')]['events'] == 2
+    assert rows[('page_view', 'home')]['unique_users'] == 1
+    assert rows[('click', 'cart')]['events'] == 1
+    assert all(row['time'].endswith('00:00:00+00:00') for row in data['rows'])
+    ttl = redis_for_query_cache.setex.call_args[0][1]
+    assert ttl == timedelta(seconds=60)
+
+
+async def test_query_returns_cached_result(
+    superuser_client, redis_for_query_cache,
+):
+    """Test that a cached query result is returned without querying."""
+    cached_result = {
+        'query_hash': 'hash',
+        'cached': False,
+        'start': '2026-01-01T00:00:00+00:00',
+        'end': '2026-01-02T00:00:00+00:00',
+        'rows': [{'events': 5, 'unique_users': 2}],
+    }
+    redis_for_query_cache.get = AsyncMock(
+        return_value=json.dumps(cached_result),
+    )
+    response = await superuser_client.post('/analytics/query', json={
+        'start': '2026-01-01T00:00:00Z', 'end': '2026-01-02T00:00:00Z',
+    })
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['cached'] is True
+    assert response.json()['rows'] == cached_result['rows']
+    redis_for_query_cache.setex.assert_not_called()
+
+
+async def test_query_rejects_unknown_dimension(superuser_client):
+    """Test query validation of group by dimensions."""
+    response = await superuser_client.post('/analytics/query', json={
+        'start': '2026-01-01T00:00:00Z', 'group_by': ['user_id'],
+    })
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_funnel_conversion(superuser_client, db_session):
+    """Test funnel counts ordered steps inside the conversion window."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    converted, retried, late, skipped = (uuid.uuid4() for _ in range(4))
+    steps = [
+        (converted, EventType.PAGE_VIEW, 0),
+        (converted, EventType.CLICK, 10),
+        (converted, EventType.PURCHASE, 20),
+        (retried, EventType.PAGE_VIEW, 0),
+        (retried, EventType.PAGE_VIEW, 120),
+        (retried, EventType.CLICK, 150),
+        (late, EventType.PAGE_VIEW, 0),
+        (late, EventType.CLICK, 90),
+        (skipped, EventType.CLICK, 0),
+        (skipped, EventType.PAGE_VIEW, 10),
+    ]
+    db_session.add_all([
+        Event(
+            user_id=user_id,
+            event_type=event_type,
+            timestamp=start + timedelta(minutes=minutes),
+            data={},
+        )
+        for user_id, event_type, minutes in steps
+    ])
+    await db_session.commit()
+
+    response = await superuser_client.post('/analytics/funnel', json={
+        'start': start.isoformat(),
+        'end': (start + timedelta(days=1)).isoformat(),
+        'window_seconds': 3600,
+    })
+    assert response.status_code == HTTPStatus.OK
+
+    data = response.json()
+    assert [step['event_type'] for step in data['steps']] == [
+        'page_view', 'click', 'purchase',
+    ]
+    assert [step['users'] for step in data['steps']] == [4, 2, 1]
+    assert [step['conversion_rate'] for step in data['steps']] == [
+        1.0, 0.5, 0.25,
+    ]
+    assert data['steps'][2]['step_conversion_rate'] == 0.5
+
+
+async def test_default_funnel_not_calculated(
+    superuser_client, redis_for_query_cache,
+):
+    """Test that the default funnel is not found before the first run."""
+    response = await superuser_client.get('/analytics/funnel/default')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+async def test_retention_matrix(superuser_client, mock_redis_dependencies):
+    """Test retention matrix is built from cohort rows."""
+    pipeline = mock_redis_dependencies.pipeline.return_value
+    pipeline.execute.return_value = [{}] * 28 + [
+        {'0': '4', '1': '2'}, {'0': '5'},
+    ]
+    response = await superuser_client.get(
+        '/analytics/retention', params={'cohorts': 30},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    cohorts = response.json()['cohorts']
+    assert [cohort['size'] for cohort in cohorts] == [4, 5]
+    assert cohorts[0]['retained'] == [4, 2]
+    assert cohorts[0]['rates'] == [1.0, 0.5]
+    assert cohorts[1]['cohort'] == (
+        datetime.now(timezone.utc).date() - timedelta(days=1)
+    ).isoformat()
+
+
+def test_normalize_sql():
+    """Normalized statements do not depend on literals or IN lengths."""
+    assert normalize_sql(
+        "SELECT  id FROM event\nWHERE user_id IN ($1::UUID, $2::UUID)"
+        " AND data = 'x' LIMIT 10",
+    ) == 'SELECT id FROM event WHERE user_id IN (...) AND data = ? LIMIT ?'
+
+
+async def test_slow_queries_endpoint(superuser_client):
+    """Statements over the threshold are listed with their bind shapes."""
+    engine = instrument_engine(create_async_engine('sqlite+aiosqlite://'))
+    slow_queries.clear()
+    with patch('app.core.db.settings.slow_query_threshold_ms', 0):
+        async with engine.connect() as conn:
+            await conn.execute(
+                text('SELECT :value, :name'), dict(value=1, name='a'),
+            )
+    await engine.dispose()
+
+    response = await superuser_client.get('/diagnostics/slow-queries')
+    assert response.status_code == HTTPStatus.OK
+    slow_query = response.json()[0]
+    assert slow_query['statement'] == 'SELECT ?, ?'
+    assert slow_query['bind_shape'] == '(int, str)'
+    assert slow_query['plan'] is None
+
+
+async def test_request_profiling(superuser_client):
+    """Superuser requests with the profile flag are profiled."""
+    with (
+        patch(
+            'app.core.profiling.get_superuser_by_token',
+            AsyncMock(return_value=object()),
+        ),
+        patch(
+            'app.core.profiling.redis_service.save_profile', AsyncMock(),
+        ) as save_profile,
+    ):
+        response = await superuser_client.get(
+            '/analytics/stats/realtime',
+            params={'profile': 1},
+            headers={'Authorization': 'Bearer token'},
+        )
+        unprofiled = await superuser_client.get('/analytics/stats/realtime')
+
+    assert response.status_code == HTTPStatus.OK
+    profile_id, profile = save_profile.call_args.args[:2]
+    assert response.headers['x-profile-id'] == profile_id
+    assert profile['path'] == '/analytics/stats/realtime'
+    assert 'x-profile-id' not in unprofiled.headers
+    save_profile.assert_called_once()
+
+
+async def test_request_profiler_samples_suspended_request():
+    """Suspended requests are sampled along their await chain."""
+    started = asyncio.Event()
+
+    async def wait_for_backend():
+        started.set()
+        await asyncio.sleep(1)
+
+    async def handle_request():
+        profiler_root.append(sys._getframe())
+        await wait_for_backend()
+
+    profiler_root = []
+    task = asyncio.create_task(handle_request())
+    await started.wait()
+    profiler = RequestProfiler(task, profiler_root[0], 0.001)
+    profiler.sample()
+    task.cancel()
+
+    assert profiler.states == {'await other': 1}
+    stack = profiler.collapsed()
+    assert 'handle_request;' in stack
+    assert 'wait_for_backend;' in stack
+    assert stack.endswith('[await other] 1')
+
+
+async def test_loop_monitor_reports_blocking_code():
+    """Blocking the loop is measured as lag and reported with a stack."""
+    monitor = LoopMonitor(0.01, 0.05)
+    observed = registry.get_sample_value('event_loop_lag_seconds_count')
+    observed_lag = registry.get_sample_value('event_loop_lag_seconds_sum')
+    with patch.object(monitor, 'report_blocked') as report_blocked:
+        monitor_task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.03)
+        time.sleep(0.2)
+        await asyncio.sleep(0.03)
+        monitor_task.cancel()
+
+    report_blocked.assert_called_once()
+    assert report_blocked.call_args.args[0] >= 0.05
+    assert registry.get_sample_value(
+        'event_loop_lag_seconds_count',
+    ) > observed
+    assert registry.get_sample_value(
+        'event_loop_lag_seconds_sum',
+    ) - observed_lag >= 0.15
+
+
+async def test_run_export_mixed_timezones(superuser_client):
+    """Naive bounds of the export range are taken as UTC."""
+    with patch(
+        'app.api.endpoints.tasks.export_events_to_parquet.delay',
+    ) as delay:
+        response = await superuser_client.post('/task/run-export', params=dict(
+            start='2026-01-01T00:00:00', end='2026-01-02T00:00:00+03:00',
+        ))
+    assert response.status_code == HTTPStatus.OK
+    delay.assert_called_once_with(
+        '2026-01-01T00:00:00+00:00', '2026-01-01T21:00:00+00:00',
+    )
+    response = await superuser_client.post('/task/run-export', params=dict(
+        start='2026-01-02T00:00:00', end='2026-01-02T00:00:00+00:00',
+    ))
+    assert response.status_code == HTTPStatus.BAD_REQUEST
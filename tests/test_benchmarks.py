@@ -0,0 +1,91 @@
+import json
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from app.main import app
+from benchmarks.common import (
+    latency_summary, percentile, use_database, write_results,
+)
+from benchmarks.dataset import generate_events
+from benchmarks.fanout import DashboardClient
+from benchmarks.ingest import run_ingest
+
+
+def test_percentile():
+    """Percentiles are taken by nearest rank."""
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 1.0) == 100
+    assert percentile([], 0.5) is None
+    assert latency_summary([0.002])['p99'] == 2
+
+
+def test_write_results(tmp_path):
+    """Results are written with their parameters and commit."""
+    path = write_results(
+        'ingest', dict(events=1), dict(total=1), tmp_path / 'result.json',
+    )
+    result = json.loads(path.read_text())
+    assert result['benchmark'] == 'ingest'
+    assert result['parameters'] == dict(events=1)
+    assert 'commit' in result
+
+
+def test_generate_events():
+    """Synthetic events are time ordered, past and skewed to top users."""
+    now = datetime(2026, 1, 7, 12, 30, tzinfo=timezone.utc)
+    user_ids = [uuid.uuid4() for _ in range(100)]
+    days = list(generate_events(
+        random.Random(0), user_ids, 5000, days=3, now=now,
+    ))
+    rows = [row for day in days for row in day]
+    assert len(rows) == 5000
+    assert len(days) == 4
+    for day in days:
+        assert [row[2] for row in day] == sorted(row[2] for row in day)
+    assert max(row[2] for row in rows) < now.replace(minute=0)
+    assert all(row[2] <= row[3] <= now for row in rows)
+    events_per_user = Counter(row[0] for row in rows)
+    assert events_per_user[user_ids[0]] > 10 * events_per_user[user_ids[-1]]
+    assert {row[1] for row in rows} == {'PAGE_VIEW', 'CLICK', 'PURCHASE'}
+
+
+async def test_ingest_benchmark(tmp_path):
+    """The ingest benchmark posts events through the app."""
+    async with use_database(
+        app, f'sqlite+aiosqlite:///{tmp_path}/benchmark.sqlite3',
+    ) as sessions:
+        results = await run_ingest(
+            sessions, events=10, concurrency=1, users=3, warmup=2,
+        )
+    assert set(results) == {'post_event', 'update_stats'}
+    assert results['post_event']['errors'] == 0
+    assert results['post_event']['latency_ms']['count'] == 10
+    assert 'commands' in results['update_stats']['redis']
+
+
+async def test_dashboard_client_records_broadcasts():
+    """Only benchmark broadcasts are recorded as deliveries."""
+    messages = [
+        dict(message_type='realtime_stats', data={}),
+        dict(message_type='broadcast', content=json.dumps(dict(
+            benchmark_seq=3, sent_at=time.time(),
+        ))),
+        dict(message_type='broadcast', content='{"event_type": "stats"}'),
+    ]
+
+    async def websocket():
+        for message in messages:
+            yield json.dumps(message)
+
+    deliveries = defaultdict(list)
+    client = DashboardClient(deliveries)
+    client.websocket = websocket()
+    await client.receive()
+    assert list(deliveries) == [3]
+    assert client.received == 1
+    assert client.closed
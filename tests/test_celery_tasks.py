@@ -1,27 +1,119 @@
+import asyncio
 import json
+import signal
+import uuid
 from datetime import datetime, timedelta, timezone
-from unittest.mock import AsyncMock, patch
+from http import HTTPStatus
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, call, patch
 
+import pyarrow.parquet as pq
 import pytest
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import select
 
+from app.backfill import main as backfill_main
+from app.crud import update_stats, user_id_partition
+from app.models import Event, EventType, UserSession
+from app.services import ParquetExporter, read_archived_events
+from app.services.redis_service import (
+    HOURLY_EVENTS_RETENTION,
+    REMOVE_INACTIVE_USERS_SCRIPT,
+    hourly_event_expiry,
+)
 from app.tasks import (
+    _archive_old_events,
+    _backfill_aggregates,
     _calculate_daily_summary,
+    _calculate_default_funnel,
     _calculate_hourly_aggregation,
     _calculate_user_behavior_metrics,
+    _calculate_user_behavior_partition,
+    _calculate_user_sessions,
+    _check_counters_drift,
     _cleanup_old_redis_data,
     _cleanup_user_sessions,
+    _index_user_activity,
+    _export_events_to_parquet,
     _monitor_redis_memory,
+    _rebuild_redis_counters,
     _update_realtime_metrics,
+    _update_retention_matrices,
+    archive_old_events,
+    backfill_chunks,
+    retained_range,
+)
+from app.tasks.decorators import (
+    celery_task_with_logging, with_async_session, with_task_lock,
+)
+from app.tasks.runtime import WorkerRuntime
+from app.tasks.stats import (
+    record_task_run, start_task_timer, summarize_task_stats, task_run_stats,
 )
-from app.tasks.decorators import celery_task_with_logging, with_async_session
 
 
 @pytest.mark.usefixtures('db_session', 'sample_events')
 async def test_hourly_aggregation_success(redis_patched):
     """Hourly aggregation test."""
+    redis_patched.get = AsyncMock(return_value=None)
     result = await _calculate_hourly_aggregation()
     assert result['status'] == 'success'
-    assert redis_patched.setex.called
+    assert result['hours'] == 1
+    assert redis_patched.pipeline.return_value.setex.called
+    watermarks = {
+        call.args[0]: call.args[1] for call in redis_patched.set.call_args_list
+    }
+    current_hour = datetime.now(timezone.utc).replace(
+        minute=0, second=0, microsecond=0,
+    )
+    assert watermarks['watermark:hourly_aggregation'] == (
+        current_hour.isoformat()
+    )
+
+
+async def test_hourly_aggregation_late_events(redis_patched, db_session):
+    """Late events re-aggregate their already closed hour."""
+    now = datetime.now(timezone.utc)
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    late_hour = current_hour - timedelta(hours=3)
+    watermarks = {
+        'watermark:hourly_aggregation': current_hour.isoformat(),
+        'watermark:hourly_aggregation_ingested': (
+            now - timedelta(minutes=10)
+        ).isoformat(),
+    }
+    redis_patched.get = AsyncMock(side_effect=watermarks.get)
+    db_session.add_all([
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=EventType.CLICK,
+            timestamp=late_hour + timedelta(minutes=15),
+            data={},
+        ),
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=EventType.CLICK,
+            timestamp=current_hour - timedelta(hours=5),
+            ingested_at=now - timedelta(hours=4),
+            data={},
+        ),
+    ])
+    await db_session.commit()
+
+    result = await _calculate_hourly_aggregation()
+    assert result['status'] == 'success'
+    assert result['hours'] == 0
+    assert result['late_hours'] == 1
+    written = {
+        call.args[0]: json.loads(call.args[2])
+        for call in redis_patched.pipeline.return_value.setex.call_args_list
+    }
+    assert list(written) == [
+        f'events:hourly:{late_hour.strftime("%Y-%m-%d-%H")}',
+    ]
+    assert written[
+        f'events:hourly:{late_hour.strftime("%Y-%m-%d-%H")}'
+    ]['events_by_type'] == {'click': 1}
 
 
 @pytest.mark.usefixtures('db_session', 'redis_patched')
@@ -33,6 +125,31 @@ async def test_user_metrics_success(sample_events):
     assert result['user_id'] == user_id
 
 
+@pytest.mark.usefixtures('db_session')
+async def test_user_metrics_partitions(redis_patched, sample_events):
+    """User metrics partitions test."""
+    for index in range(4):
+        result = await _calculate_user_behavior_partition(index, 4)
+        assert result['status'] == 'success'
+    pipeline = redis_patched.pipeline.return_value
+    users = {
+        json.loads(call.args[2])['user_id']
+        for call in pipeline.setex.call_args_list
+    }
+    assert users == {
+        str(user_id) for user_id in sample_events['users'].values()
+    }
+
+
+def test_user_id_partition_covers_uuid_space():
+    """User id ranges are adjacent and cover all ids."""
+    partitions = [user_id_partition(index, 3) for index in range(3)]
+    assert partitions[0][0] == uuid.UUID(int=0)
+    assert partitions[0][1] == partitions[1][0]
+    assert partitions[1][1] == partitions[2][0]
+    assert partitions[2][1] is None
+
+
 @pytest.mark.usefixtures('db_session', 'redis_patched', 'sample_events')
 async def test_daily_summary_success():
     """Daily summary test."""
@@ -40,41 +157,266 @@ async def test_daily_summary_success():
     assert result['status'] == 'success'
 
 
+async def test_default_funnel_success(redis_patched, db_session):
+    """Default funnel test."""
+    end = datetime.now(timezone.utc).replace(minute=0, second=0)
+    user_id = uuid.uuid4()
+    db_session.add_all([
+        Event(
+            user_id=user_id,
+            event_type=event_type,
+            timestamp=end - timedelta(minutes=minutes),
+            data={},
+        )
+        for event_type, minutes in (
+            (EventType.PAGE_VIEW, 30), (EventType.CLICK, 20),
+        )
+    ])
+    await db_session.commit()
+
+    result = await _calculate_default_funnel()
+    assert result['status'] == 'success'
+    assert result['users'] == [1, 1, 0]
+    assert redis_patched.setex.called
+
+
+async def test_retention_matrices_process_one_day(redis_patched, db_session):
+    """Retention matrices test."""
+    returning_user, new_user = uuid.uuid4(), uuid.uuid4()
+    day = datetime(2026, 1, 7, 12, tzinfo=timezone.utc)
+    db_session.add_all([
+        Event(
+            user_id=user_id,
+            event_type=EventType.PAGE_VIEW,
+            timestamp=timestamp,
+            data={},
+        )
+        for user_id, timestamp in (
+            (returning_user, day - timedelta(days=2)),
+            (returning_user, day),
+            (new_user, day),
+            (new_user, day + timedelta(hours=1)),
+        )
+    ])
+    await db_session.commit()
+
+    result = await _update_retention_matrices('2026-01-07')
+    assert result['status'] == 'success'
+    assert result['daily_cohorts'] == 2
+
+    pipeline = redis_patched.pipeline.return_value
+    cells = {
+        call.args[0]: call.kwargs['mapping']
+        for call in pipeline.hset.call_args_list
+    }
+    assert cells['retention:daily:2026-01-05'] == {2: 1}
+    assert cells['retention:daily:2026-01-07'] == {0: 1}
+    assert cells['retention:weekly:2026-01-05'] == {0: 2}
+
+
+async def test_user_sessions_split_by_gap(redis_patched, db_session):
+    """Sessionization test."""
+    redis_patched.get = AsyncMock(return_value=None)
+    now = datetime.now(timezone.utc)
+    finished_user, active_user = uuid.uuid4(), uuid.uuid4()
+    db_session.add_all([
+        Event(
+            user_id=user_id,
+            event_type=EventType.PAGE_VIEW,
+            timestamp=now - timedelta(minutes=minutes_ago),
+            data={},
+        )
+        for user_id, minutes_ago in (
+            (finished_user, 300),
+            (finished_user, 290),
+            (finished_user, 200),
+            (active_user, 5),
+        )
+    ])
+    await db_session.commit()
+
+    result = await _calculate_user_sessions()
+    assert result['status'] == 'success'
+    assert result['sessions'] == 2
+    assert result['open_sessions'] == 1
+
+    sessions = (await db_session.scalars(
+        select(UserSession).order_by(UserSession.started_at),
+    )).all()
+    assert [user_session.event_count for user_session in sessions] == [2, 1]
+    assert sessions[0].duration_seconds == pytest.approx(600, abs=1)
+    watermark = datetime.fromisoformat(redis_patched.set.call_args[0][1])
+    assert watermark == now - timedelta(minutes=5)
+
+
 async def test_cleanup_redis_success(redis_patched):
-    """Redis cleanup test."""
+    """Legacy sweep tolerates every hourly key shape."""
+    recent_hour = datetime.now(timezone.utc).strftime('%Y-%m-%d-%H')
+
     async def mock_scan_iter(pattern, count=100):
         yield 'events:hourly:2026-01-01-00'
+        yield 'events:hourly:click:2026-01-01-00'
+        yield f'events:hourly:{recent_hour}'
+        yield f'events:hourly:click:{recent_hour}'
+        yield f'events:hourly:EventType.CLICK:{recent_hour}'
+        yield 'events:hourly:unexpected'
 
     redis_patched.scan_iter = mock_scan_iter
+    pipeline = redis_patched.pipeline.return_value
+    pipeline.execute.side_effect = [[True, False, 1], ['7', '2'], []]
     result = await _cleanup_old_redis_data()
     assert result['status'] == 'success'
-    assert redis_patched.delete.called
+    assert result['deleted_count'] == 2
+    assert result['migrated_count'] == 2
+    assert result['scanned_count'] == 6
+    pipeline.unlink.assert_called_once_with(
+        'events:hourly:click:2026-01-01-00',
+    )
+    assert [
+        call.args[0] for call in pipeline.expireat.call_args_list[:2]
+    ] == ['events:hourly:2026-01-01-00', f'events:hourly:{recent_hour}']
+    assert [call.args[0] for call in pipeline.getdel.call_args_list] == [
+        f'events:hourly:click:{recent_hour}',
+        f'events:hourly:EventType.CLICK:{recent_hour}',
+    ]
+    pipeline.hincrby.assert_called_once_with(
+        f'events:counts:{recent_hour}', 'click', 9,
+    )
+    assert not redis_patched.delete.called
 
 
-async def test_cleanup_sessions(redis_patched):
-    """Session cleanup test."""
-    redis_patched.lindex = AsyncMock(
-        return_value=json.dumps({
-            'timestamp': (
-                datetime.now(timezone.utc) - timedelta(days=10)
-            ).isoformat(),
-        }),
+async def test_cleanup_redis_retention_boundary(redis_patched):
+    """Counters are swept at their expiry, aggregations keep their TTL."""
+    current_hour = datetime.now(timezone.utc).replace(
+        minute=0, second=0, microsecond=0,
     )
+    retained = current_hour - HOURLY_EVENTS_RETENTION
+    expired = retained - timedelta(hours=1)
 
     async def mock_scan_iter(pattern, count=100):
-        yield 'user:activity:test'
+        for hour in (expired, retained):
+            yield f'events:hourly:click:{hour:%Y-%m-%d-%H}'
+        yield f'events:hourly:{expired:%Y-%m-%d-%H}'
 
     redis_patched.scan_iter = mock_scan_iter
+    pipeline = redis_patched.pipeline.return_value
+    pipeline.execute.side_effect = [[False, 1], ['3'], []]
+    result = await _cleanup_old_redis_data()
+    assert result['deleted_count'] == 1
+    assert result['migrated_count'] == 1
+    pipeline.unlink.assert_called_once_with(
+        f'events:hourly:click:{expired:%Y-%m-%d-%H}',
+    )
+    pipeline.getdel.assert_called_once_with(
+        f'events:hourly:click:{retained:%Y-%m-%d-%H}',
+    )
+    assert pipeline.expireat.call_args_list[0] == call(
+        f'events:hourly:{expired:%Y-%m-%d-%H}',
+        hourly_event_expiry(expired),
+        nx=True,
+    )
+
+
+async def test_cleanup_sessions(redis_patched):
+    """Session cleanup removes users found in the last-activity index."""
+    batches = iter([500, 2])
+
+    async def mock_eval(script, *args):
+        return next(batches) if script == REMOVE_INACTIVE_USERS_SCRIPT else 1
+
+    redis_patched.eval = AsyncMock(side_effect=mock_eval)
     result = await _cleanup_user_sessions()
     assert result['status'] == 'success'
-    assert redis_patched.delete.called
+    assert result['deleted_count'] == 502
+    removals = [
+        call.args[1:] for call in redis_patched.eval.call_args_list
+        if call.args[0] == REMOVE_INACTIVE_USERS_SCRIPT
+    ]
+    assert len(removals) == 2
+    assert removals[0][:2] == (1, 'user:last_activity')
+    assert removals[0][-2:] == (500, 'user:activity:')
 
 
 @pytest.mark.usefixtures('redis_patched')
-async def test_monitor_memory():
-    """Memory monitoring test."""
+async def test_index_user_activity(redis_patched):
+    """Legacy activity lists are indexed by their naive or aware time."""
+    async def mock_scan_iter(pattern, count=100):
+        yield 'user:activity:u1'
+        yield 'user:activity:u2'
+
+    redis_patched.scan_iter = mock_scan_iter
+    redis_patched.pipeline.return_value.execute.side_effect = [
+        [
+            json.dumps({'timestamp': '2026-01-01T10:00:00'}),
+            json.dumps({'timestamp': '2026-01-01T10:00:00+03:00'}),
+        ],
+    ]
+    result = await _index_user_activity()
+    assert result['indexed_count'] == 2
+    redis_patched.zadd.assert_called_once_with(
+        'user:last_activity',
+        {
+            'u1': datetime(2026, 1, 1, 10, tzinfo=timezone.utc).timestamp(),
+            'u2': datetime(2026, 1, 1, 7, tzinfo=timezone.utc).timestamp(),
+        },
+        gt=True,
+    )
+
+
+@pytest.mark.usefixtures('redis_patched')
+async def test_monitor_memory(redis_patched):
+    """Memory monitoring compares hashed and legacy hourly counters."""
+    async def mock_scan_iter(pattern, count=100):
+        if pattern == 'events:counts:*':
+            yield 'events:counts:2026-01-01-00'
+        else:
+            yield 'events:hourly:click:2026-01-01-00'
+            yield 'events:hourly:purchase:2026-01-01-00'
+
+    redis_patched.scan_iter = mock_scan_iter
+    redis_patched.pipeline.return_value.execute.side_effect = [
+        [96, 'listpack', 3],
+        [56, 'int', 56, 'int'],
+    ]
     result = await _monitor_redis_memory()
     assert result['status'] == 'success'
+    counters = result['hourly_counters']
+    assert counters['hash']['bytes_per_counter'] == 32
+    assert counters['hash']['encodings'] == {'listpack': 1}
+    assert counters['legacy']['bytes_per_counter'] == 56
+    assert counters['saved_bytes_per_counter'] == 24
+
+
+async def test_monitor_memory_prefix_growth(redis_patched):
+    """Memory per key prefix is estimated and fast growth alerted."""
+    async def mock_scan_iter(pattern, count=100):
+        for key in ():
+            yield key
+
+    redis_patched.scan_iter = mock_scan_iter
+    redis_patched.dbsize = AsyncMock(return_value=400)
+    redis_patched.zrangebyscore = AsyncMock(return_value=[json.dumps(dict(
+        at='2026-01-01T00:00:00+00:00',
+        prefixes={'user:activity:': dict(keys=100, bytes=1000)},
+    ))])
+    redis_patched.pipeline.return_value.execute.side_effect = [
+        [
+            'user:activity:1', 'user:activity:2', 'events:total:click',
+            'unknown',
+        ],
+        [200_000, 200_000, 100, 50],
+        [1, 0],
+    ]
+    result = await _monitor_redis_memory()
+    assert result['prefixes']['user:activity:'] == dict(
+        sampled_keys=2, keys=200, bytes=40_000_000,
+    )
+    assert result['prefixes']['other']['keys'] == 100
+    assert [alert['prefix'] for alert in result['alerts']] == [
+        'user:activity:',
+    ]
+    snapshot = redis_patched.pipeline.return_value.zadd.call_args.args[1]
+    assert json.loads(next(iter(snapshot)))['prefixes'] == result['prefixes']
 
 
 async def test_realtime_metrics(redis_with_stats):
@@ -85,8 +427,181 @@ async def test_realtime_metrics(redis_with_stats):
     assert redis_with_stats.setex.called
 
 
-async def test_task_error_handling_publish():
+async def test_export_events_to_parquet(db_session, tmp_path):
+    """Parquet export test."""
+    now = datetime.now(timezone.utc)
+    db_session.add_all([
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=EventType.PURCHASE,
+            timestamp=now,
+            data={'amount': 10, 'currency': 'USD', 'items': [1, 2]},
+        ),
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=EventType.PURCHASE,
+            timestamp=now,
+            data={'amount': 2.5},
+        ),
+    ])
+    await db_session.commit()
+
+    with patch('app.tasks.export_tasks.settings.export_dir', str(tmp_path)):
+        result = await _export_events_to_parquet(
+            (now - timedelta(days=1)).isoformat(), now.isoformat(),
+        )
+
+    assert result['status'] == 'success'
+    assert result['exported_rows'] == 2
+    assert result['partitions'] == [
+        (now - timedelta(days=1)).date().isoformat(), now.date().isoformat(),
+    ]
+    partition_dir = tmp_path / f'date={now.date().isoformat()}'
+    manifest = json.loads((partition_dir / '_manifest.json').read_text())
+    assert manifest['rows'] == 2
+    table = pq.read_table(partition_dir / manifest['files'][0]['path'])
+    assert table.column('data_amount').to_pylist() == [10.0, 2.5]
+    assert table.column('data_currency').to_pylist() == ['USD', None]
+    assert table.column('data_items').to_pylist() == ['[1, 2]', None]
+
+
+def test_parquet_exporter_widens_data_types(tmp_path):
+    """A data key has the same type in every file of an export."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    exporter = ParquetExporter(str(tmp_path))
+    for offset, data in enumerate((
+        {'amount': 10, 'currency': 'USD', 'first': True},
+        {'amount': 2.5, 'currency': 1},
+    )):
+        exporter.write_chunk([SimpleNamespace(
+            id=offset,
+            user_id=uuid.uuid4(),
+            event_type=EventType.PURCHASE,
+            timestamp=start + timedelta(minutes=offset),
+            data=data,
+        )])
+    exporter.finalize([start.date()])
+
+    tables = [
+        pq.read_table(path)
+        for path in sorted((tmp_path / 'date=2026-01-01').glob('*.parquet'))
+    ]
+    assert tables[0].schema.field('data_amount').type == (
+        tables[1].schema.field('data_amount').type
+    )
+    assert [table.column('data_amount')[0].as_py() for table in tables] == [
+        10.0, 2.5,
+    ]
+    assert [
+        table.column('data_currency')[0].as_py() for table in tables
+    ] == ['"USD"', '1']
+    assert tables[0].column('data_first').to_pylist() == [True]
+
+
+async def test_archive_old_events(db_session, tmp_path):
+    """Old events are archived, deleted and readable from the archive."""
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=400)
+    clicked_user_id = uuid.uuid4()
+    db_session.add_all([
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=EventType.PURCHASE,
+            timestamp=old,
+            data={'amount': 10, 'items': [1, 2]},
+        ),
+        Event(
+            user_id=clicked_user_id,
+            event_type=EventType.CLICK,
+            timestamp=old + timedelta(seconds=1),
+            data={},
+        ),
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=EventType.CLICK,
+            timestamp=now,
+            data={},
+        ),
+    ])
+    await db_session.commit()
+
+    with patch('app.tasks.archive_tasks.settings.archive_dir', str(tmp_path)):
+        result = await _archive_old_events()
+
+    assert result['status'] == 'success'
+    assert result['archived_rows'] == 2
+    assert result['deleted_rows'] == 2
+    assert result['days'] == [old.date().isoformat()]
+    assert result['more_days'] is False
+    remaining = (await db_session.scalars(select(Event.timestamp))).all()
+    assert len(remaining) == 1
+    archived = read_archived_events(
+        str(tmp_path), old - timedelta(hours=1), old + timedelta(hours=1),
+    )
+    assert [event['event_type'] for event in archived] == [
+        'purchase', 'click',
+    ]
+    assert archived[0]['data'] == {'amount': 10, 'items': [1, 2]}
+    assert read_archived_events(
+        str(tmp_path), old - timedelta(hours=1), old + timedelta(hours=1),
+        event_type='click',
+    )[0]['data'] == {}
+    assert [
+        event['event_type'] for event in read_archived_events(
+            str(tmp_path), old - timedelta(hours=1), old + timedelta(hours=1),
+            limit=1,
+        )
+    ] == ['purchase']
+    assert [
+        event['user_id'] for event in read_archived_events(
+            str(tmp_path), old - timedelta(hours=1), old + timedelta(hours=1),
+            user_id=clicked_user_id,
+        )
+    ] == [str(clicked_user_id)]
+
+
+def test_archive_old_events_queues_next_day():
+    """Archival runs again while older days remain."""
+    with (
+        patch('app.tasks.archive_tasks._archive_old_events', MagicMock()),
+        patch('app.tasks.archive_tasks.worker_runtime') as mock_runtime,
+        patch.object(archive_old_events, 'delay') as delay,
+    ):
+        mock_runtime.run.return_value = dict(status='success', more_days=True)
+        archive_old_events()
+        delay.assert_called_once_with()
+        mock_runtime.run.return_value = dict(status='success', more_days=False)
+        archive_old_events()
+        delay.assert_called_once_with()
+
+
+def test_read_archived_events_stops_at_limit(tmp_path):
+    """Files after the first `limit` events are not read."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    exporter = ParquetExporter(str(tmp_path / 'archived_at=20260101T000000'))
+    for offset in range(3):
+        exporter.write_chunk([SimpleNamespace(
+            id=offset,
+            user_id=uuid.uuid4(),
+            event_type=EventType.CLICK,
+            timestamp=start + timedelta(minutes=offset),
+            data={},
+        )])
+    exporter.finalize([start.date()])
+
+    with patch(
+        'app.services.event_archive.pq.read_table', wraps=pq.read_table,
+    ) as read_table:
+        archived = read_archived_events(
+            str(tmp_path), start, start + timedelta(hours=1), limit=2,
+        )
+    assert [event['id'] for event in archived] == [0, 1]
+    assert read_table.call_count == 2
+
+
+async def test_task_error_handling_publish(mock_redis_dependencies):
     """Test for publishing error."""
+    mock_redis_dependencies.get = AsyncMock(return_value=None)
     with patch(
         'app.services.redis_service.redis_service.publish_dashboard_update',
         AsyncMock(side_effect=Exception('Publish failed')),
@@ -119,3 +634,387 @@ async def test_with_async_session():
 
     result = await mock_successful_task('test')
     assert result['param'] == 'test'
+
+
+async def test_with_task_lock_skips_duplicate_run(redis_patched):
+    """Lock decorator test, a held lock skips the run."""
+    redis_patched.set = AsyncMock(return_value=None)
+    redis_patched.get = AsyncMock(return_value='worker:1:token')
+    task = AsyncMock(return_value={'param': 'value'})
+
+    @celery_task_with_logging('Success', 'Error')
+    @with_task_lock('test')
+    async def mock_task():
+        return await task()
+
+    result = await mock_task()
+    assert result == dict(
+        status='success', skipped=True, lock='test', holder='worker:1:token',
+    )
+    task.assert_not_called()
+
+
+async def test_with_task_lock_waits_and_releases(redis_patched):
+    """Lock decorator test, a queued run waits for the lock."""
+    redis_patched.set = AsyncMock(side_effect=[None, True])
+    redis_patched.eval = AsyncMock(return_value=1)
+
+    @with_task_lock('test', wait=timedelta(seconds=5))
+    async def mock_task():
+        return {'param': 'value'}
+
+    with patch('app.tasks.decorators.LOCK_POLL_INTERVAL', timedelta(0)):
+        result = await mock_task()
+    assert result == {'param': 'value'}
+    assert redis_patched.set.call_args.args[0] == 'lock:task:test'
+    assert redis_patched.set.call_args.kwargs['nx'] is True
+    token = redis_patched.set.call_args.args[1]
+    assert redis_patched.eval.call_args.args[2:] == ('lock:task:test', token)
+
+
+async def test_with_task_lock_cancels_run_on_lost_lease(redis_patched):
+    """Lock decorator test, a run is cancelled once its lease is lost."""
+    redis_patched.set = AsyncMock(return_value=True)
+    redis_patched.eval = AsyncMock(return_value=0)
+    finished = False
+
+    @celery_task_with_logging('Success', 'Error')
+    @with_task_lock('test', lease=timedelta(seconds=0.03))
+    async def mock_task():
+        nonlocal finished
+        await asyncio.sleep(1)
+        finished = True
+        return {'param': 'value'}
+
+    result = await mock_task()
+    assert result == dict(status='error', error='Task lock test lost')
+    assert not finished
+    assert redis_patched.eval.call_count == 2
+
+
+def test_worker_runtime_reuses_loop():
+    """Worker runtime test."""
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    runtime = WorkerRuntime()
+    with (
+        patch('app.tasks.runtime.redis_service') as mock_redis_service,
+        patch('app.tasks.runtime.create_async_engine') as mock_create_engine,
+        patch('app.tasks.runtime.instrument_engine', lambda engine: engine),
+    ):
+        mock_redis_service.close = AsyncMock()
+        mock_create_engine.return_value.dispose = AsyncMock()
+        first_loop = runtime.run(current_loop())
+        second_loop = runtime.run(current_loop())
+        runtime.stop()
+
+    assert first_loop is second_loop
+    assert first_loop.is_closed()
+    mock_create_engine.assert_called_once()
+    mock_create_engine.return_value.dispose.assert_awaited_once()
+    mock_redis_service.close.assert_awaited_once()
+    assert runtime.loop is None
+
+
+def test_worker_runtime_cancels_interrupted_task():
+    """A body interrupted by the soft time limit does not resume."""
+    steps = []
+
+    async def slow_task():
+        try:
+            await asyncio.sleep(1)
+            steps.append('resumed')
+        finally:
+            steps.append('cleaned up')
+
+    def soft_time_limit(signum, frame):
+        raise SoftTimeLimitExceeded()
+
+    runtime = WorkerRuntime()
+    runtime.loop = asyncio.new_event_loop()
+    previous = signal.signal(signal.SIGALRM, soft_time_limit)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 0.05)
+        with pytest.raises(SoftTimeLimitExceeded):
+            runtime.run(slow_task())
+        assert steps == ['cleaned up']
+        runtime.run(asyncio.sleep(0))
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+        runtime.loop.close()
+
+    assert steps == ['cleaned up']
+    assert not asyncio.all_tasks(runtime.loop)
+
+
+def test_backfill_chunks_aligned():
+    """Backfill range is widened to whole chunks."""
+    chunks = backfill_chunks(
+        datetime(2026, 1, 1, 22, 30, tzinfo=timezone.utc),
+        datetime(2026, 1, 3, 1, tzinfo=timezone.utc),
+    )
+    assert [chunk_start.isoformat() for chunk_start, _ in chunks] == [
+        '2026-01-01T00:00:00+00:00',
+        '2026-01-02T00:00:00+00:00',
+        '2026-01-03T00:00:00+00:00',
+    ]
+    assert len(backfill_chunks(
+        datetime(2026, 1, 1, 22, 30), datetime(2026, 1, 2, 1), 'hour',
+    )) == 3
+
+
+def test_backfill_range_outside_retention_queues_nothing():
+    """A range whose keys Redis would drop is not backfilled."""
+    now = datetime.now(timezone.utc)
+    start, end = retained_range(
+        now - timedelta(days=90), now + timedelta(days=1),
+    )
+    assert abs(start - (now - timedelta(days=31))) < timedelta(seconds=5)
+    assert end <= datetime.now(timezone.utc)
+    with (
+        patch('app.backfill.setup_logging'),
+        patch('app.backfill.run_on_celery') as run_on_celery,
+        patch('app.backfill.run_in_processes') as run_in_processes,
+    ):
+        assert backfill_main([
+            (now - timedelta(days=90)).isoformat(),
+            (now - timedelta(days=60)).isoformat(),
+            '--celery',
+        ]) == 0
+    run_on_celery.assert_not_called()
+    run_in_processes.assert_not_called()
+
+
+async def test_backfill_aggregates_day(redis_patched, db_session):
+    """Backfill writes hourly aggregations and the daily summary."""
+    day_start = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0,
+    ) - timedelta(days=1)
+    day = day_start.date().isoformat()
+    db_session.add_all([
+        Event(
+            user_id=uuid.uuid4(),
+            event_type=event_type,
+            timestamp=day_start + timedelta(hours=hour, minutes=10),
+            data={},
+        )
+        for event_type, hour in (
+            (EventType.PAGE_VIEW, 3),
+            (EventType.CLICK, 3),
+            (EventType.PURCHASE, 23),
+        )
+    ])
+    await db_session.commit()
+
+    result = await _backfill_aggregates(
+        day_start.isoformat(), (day_start + timedelta(days=1)).isoformat(),
+    )
+    assert result['status'] == 'success'
+    assert result['hours'] == 24
+    assert result['days'] == 1
+    assert result['saved_hours'] == 24
+    assert result['saved_days'] == 1
+    assert result['total_events'] == 3
+    setex = redis_patched.pipeline.return_value.setex
+    written = {
+        call.args[0]: json.loads(call.args[2])
+        for call in setex.call_args_list
+    }
+    ttls = {call.args[0]: call.args[1] for call in setex.call_args_list}
+    assert len(written) == 25
+    assert written[f'events:hourly:{day}-03']['total_events'] == 2
+    assert written[f'events:hourly:{day}-04']['total_events'] == 0
+    assert written[f'summary:daily:{day}']['total_events'] == 3
+    assert abs(
+        ttls[f'events:hourly:{day}-03']
+        - (day_start + timedelta(hours=52) - datetime.now(timezone.utc))
+    ) < timedelta(seconds=5)
+    assert ttls[f'summary:daily:{day}'] < timedelta(days=30)
+
+
+async def test_backfill_skips_buckets_past_retention(redis_patched):
+    """Buckets whose live keys would have expired are not written."""
+    day_start = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0,
+    ) - timedelta(days=40)
+
+    result = await _backfill_aggregates(
+        day_start.isoformat(), (day_start + timedelta(days=1)).isoformat(),
+    )
+    assert result['status'] == 'success'
+    assert result['hours'] == 24
+    assert result['saved_hours'] == 0
+    assert result['saved_days'] == 0
+    assert not redis_patched.pipeline.return_value.setex.called
+
+
+async def test_rebuild_redis_counters(redis_patched, db_session):
+    """Counters and activity lists are rebuilt from Postgres."""
+    now = datetime.now(timezone.utc)
+    user_id = uuid.uuid4()
+    db_session.add_all([
+        Event(
+            user_id=user_id,
+            event_type=event_type,
+            timestamp=now - timedelta(minutes=minutes_ago),
+            ingested_at=now - timedelta(minutes=minutes_ago),
+            data={},
+        )
+        for event_type, minutes_ago in (
+            (EventType.PAGE_VIEW, 10),
+            (EventType.CLICK, 5),
+            (EventType.CLICK, 60 * 24 * 30),
+        )
+    ])
+    await db_session.commit()
+    redis_patched.scan = AsyncMock(return_value=(0, ['events:total:purchase']))
+
+    result = await _rebuild_redis_counters()
+    assert result['status'] == 'success'
+    assert result['stale_counters'] == 1
+    assert result['users'] == 1
+    pipeline = redis_patched.pipeline.return_value
+    counters = dict(call.args for call in pipeline.set.call_args_list)
+    assert counters == {'events:total:click': 2, 'events:total:page_view': 1}
+    pipeline.unlink.assert_called_once_with('events:total:purchase')
+    hourly = {
+        call.args[0]: call.kwargs['mapping']
+        for call in pipeline.hset.call_args_list
+    }
+    assert sum(sum(counts.values()) for counts in hourly.values()) == 2
+    click_hour = (now - timedelta(minutes=5)).strftime('%Y-%m-%d-%H')
+    assert hourly[f'events:counts:{click_hour}']['click'] == 1
+    assert len([
+        call for call in pipeline.delete.call_args_list
+        if call.args[0].startswith('events:counts:')
+    ]) == 49
+    key, *entries = pipeline.rpush.call_args.args
+    assert key == f'user:activity:{user_id}'
+    assert [json.loads(entry)['event_type'] for entry in entries] == [
+        'click', 'page_view',
+    ]
+
+
+async def test_rebuild_keeps_counters_of_update_stats(
+    redis_patched, db_session,
+):
+    """Counters written for the enum are the ones the rebuild writes."""
+    user_id = uuid.uuid4()
+    db_session.add(Event(
+        user_id=user_id, event_type=EventType.CLICK, data={},
+    ))
+    await db_session.commit()
+    await update_stats(EventType.CLICK, str(user_id))
+    key = redis_patched.incr.call_args.args[0]
+    pipeline = redis_patched.pipeline.return_value
+    assert key == 'events:total:click'
+    assert pipeline.hincrby.call_args.args[1] == 'click'
+    assert json.loads(pipeline.lpush.call_args.args[1])['event_type'] == (
+        'click'
+    )
+
+    redis_patched.scan = AsyncMock(return_value=(0, [key]))
+    result = await _rebuild_redis_counters()
+    assert result['stale_counters'] == 0
+    pipeline.unlink.assert_not_called()
+    assert dict(call.args for call in pipeline.set.call_args_list) == {
+        key: 1,
+    }
+
+
+@pytest.mark.usefixtures('sample_events')
+async def test_counters_drift_check(redis_patched):
+    """Drift check reports counters that differ from Postgres."""
+    redis_patched.scan = AsyncMock(side_effect=lambda cursor, pattern, count: (
+        0,
+        ['events:total:click', 'events:total:page_view']
+        if pattern == 'events:total:*' else [],
+    ))
+    pipeline = redis_patched.pipeline.return_value
+    pipeline.execute.return_value = ['1', '5'] + [{}] * 49
+
+    result = await _check_counters_drift()
+    assert result['status'] == 'success'
+    differences = {
+        (difference['event_type'], difference['hour']): difference
+        for difference in result['differences']
+    }
+    assert ('click', None) not in differences
+    assert differences['page_view', None] == dict(
+        event_type='page_view', hour=None, redis=5, postgres=1,
+    )
+    assert sum(
+        difference['postgres'] for (_, hour), difference in differences.items()
+        if hour is not None
+    ) == 2
+    assert redis_patched.pipeline.return_value.set.call_count == 0
+
+
+def test_record_task_run():
+    """Task statistics record the outcome, duration and queue wait."""
+    task = SimpleNamespace(
+        name='app.tasks.aggregation_tasks.calculate_daily_summary',
+        request=SimpleNamespace(
+            enqueued_at=datetime.now().timestamp() - 2,
+            delivery_info={'routing_key': 'analytics'},
+        ),
+    )
+    with (
+        patch('app.tasks.stats.worker_runtime') as mock_runtime,
+        patch('app.tasks.stats.redis_service') as mock_redis_service,
+    ):
+        start_task_timer('task-id')
+        record_task_run(
+            'task-id', task, retval=dict(status='error'), state='SUCCESS',
+        )
+    mock_runtime.run.assert_called_once()
+    name, counters, sums, fields = (
+        mock_redis_service.record_task_stats.call_args.args
+    )
+    assert name == task.name
+    assert counters['runs'] == counters['failures'] == 1
+    assert counters['duration_bucket:0'] == counters['wait_bucket:4'] == 1
+    assert 2 <= sums['wait_sum'] < 3
+    assert fields['queue'] == 'analytics'
+    assert fields['last_status'] == 'failures'
+
+
+def test_summarize_task_stats():
+    """Summaries estimate percentiles from the recorded buckets."""
+    raw = {}
+    for duration in (0.2, 0.3, 4, 700):
+        counters, sums, fields = task_run_stats(
+            'analytics', 'successes', duration, None, datetime.now(),
+        )
+        for field, amount in counters.items():
+            raw[field] = str(int(raw.get(field, 0)) + amount)
+        for field, amount in sums.items():
+            raw[field] = str(float(raw.get(field, 0)) + amount)
+        raw.update({field: str(value) for field, value in fields.items()})
+    summary = summarize_task_stats({'task': raw})['task']
+    assert summary['runs'] == summary['successes'] == 4
+    assert summary['duration']['p50'] == 0.5
+    assert summary['duration']['p95'] is None
+    assert summary['wait']['count'] == 0
+
+
+async def test_read_task_stats(superuser_client):
+    """Task statistics endpoint reports tasks and queue depths."""
+    stats = {'task': {'queue': 'realtime', 'runs': '3', 'successes': '3'}}
+    with (
+        patch(
+            'app.api.endpoints.tasks.redis_service.get_task_stats',
+            AsyncMock(return_value=stats),
+        ),
+        patch(
+            'app.api.endpoints.tasks.queue_depths',
+            MagicMock(return_value={'realtime': 12}),
+        ),
+    ):
+        response = await superuser_client.get('/task/stats')
+    assert response.status_code == HTTPStatus.OK
+    data = response.json()
+    assert data['queues'] == {'realtime': 12}
+    assert data['tasks']['task']['runs'] == 3
+    assert data['tasks']['task']['duration']['avg'] is None
@@ -1,6 +1,9 @@
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
 
 import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
 
 
 async def test_create_event_success(authenticated_client, sample_event_data):
@@ -14,6 +17,77 @@ async def test_create_event_success(authenticated_client, sample_event_data):
     assert data['data'] == sample_event_data['data']
 
 
+async def test_create_event_with_timestamp(
+    superuser_client, sample_event_data,
+):
+    """Late event keeps the timestamp sent by a superuser."""
+    timestamp = datetime.now(timezone.utc) - timedelta(days=1)
+    response = await superuser_client.post(
+        '/event/',
+        json=dict(sample_event_data, timestamp=timestamp.isoformat()),
+    )
+    assert response.status_code == HTTPStatus.CREATED
+    assert datetime.fromisoformat(
+        response.json()['timestamp'],
+    ).replace(tzinfo=timezone.utc) == timestamp
+
+
+async def test_create_event_timestamp_ignored_for_user(
+    authenticated_client, sample_event_data,
+):
+    """Timestamps sent by regular users are ignored."""
+    timestamp = datetime.now(timezone.utc) - timedelta(days=1)
+    response = await authenticated_client.post(
+        '/event/',
+        json=dict(sample_event_data, timestamp=timestamp.isoformat()),
+    )
+    assert response.status_code == HTTPStatus.CREATED
+    assert datetime.fromisoformat(response.json()['timestamp']).replace(
+        tzinfo=timezone.utc,
+    ) > timestamp + timedelta(hours=1)
+
+
+@pytest.mark.parametrize('offset', [timedelta(hours=1), -timedelta(days=400)])
+async def test_create_event_timestamp_bounded(
+    superuser_client, sample_event_data, offset,
+):
+    """Timestamps in the future or past the retention are rejected."""
+    timestamp = datetime.now(timezone.utc) + offset
+    response = await superuser_client.post(
+        '/event/',
+        json=dict(sample_event_data, timestamp=timestamp.isoformat()),
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_metrics_after_event_creation(
+    authenticated_client, sample_event_data,
+):
+    """Ingested events and request latency are exposed as metrics."""
+    await authenticated_client.post('/event/', json=sample_event_data)
+    response = await authenticated_client.get('/metrics')
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    metrics = response.text
+    assert 'events_ingested_total{event_type="page_view"}' in metrics
+    assert (
+        'http_request_duration_seconds_count'
+        '{method="POST",route="/event/",status="201"}'
+    ) in metrics
+    assert 'redis_command_duration_seconds_count{method=' in metrics
+
+
+async def test_metrics_without_redis(authenticated_client):
+    """In-process metrics are exposed while Redis is unavailable."""
+    with patch(
+        'app.api.endpoints.metrics.redis_service.get_task_stats',
+        AsyncMock(side_effect=RedisConnectionError('Connection refused')),
+    ):
+        response = await authenticated_client.get('/metrics')
+    assert response.status_code == HTTPStatus.OK
+    assert 'http_request_duration_seconds_bucket' in response.text
+
+
 async def test_create_event_without_auth(async_client, sample_event_data):
     """Authenticated check."""
     response = await async_client.post('/event/', json=sample_event_data)
@@ -0,0 +1,65 @@
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+from app.core.logging import (
+    JsonFormatter, LoopSafeQueueHandler, SamplingFilter,
+)
+
+
+def test_json_formatter_renders_extra():
+    """Extra fields and exceptions are rendered into the JSON line."""
+    try:
+        raise ValueError('broken')
+    except ValueError as error:
+        record = logging.getLogger('app.test').makeRecord(
+            'app.test', logging.ERROR, __file__, 1, 'Failed %s', ('task',),
+            exc_info=(type(error), error, error.__traceback__),
+            extra=dict(user_id='u1', error=error),
+        )
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'Failed task'
+    assert entry['level'] == 'ERROR'
+    assert entry['user_id'] == 'u1'
+    assert entry['error'] == 'broken'
+    assert 'ValueError: broken' in entry['exc_info']
+
+
+def test_queue_handler_merges_message():
+    """Queued records carry their message, not the live arguments."""
+    handler = LoopSafeQueueHandler(queue.SimpleQueue())
+    stats = dict(count=1)
+    try:
+        raise ValueError('broken')
+    except ValueError as error:
+        record = logging.getLogger('app.test').makeRecord(
+            'app.test', logging.ERROR, __file__, 1, 'Stats %s', (stats,),
+            exc_info=(type(error), error, error.__traceback__),
+        )
+    handler.handle(record)
+    stats['count'] = 2
+    queued = handler.queue.get_nowait()
+    assert queued is not record
+    assert queued.args is None and queued.exc_info is None
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry['message'] == "Stats {'count': 1}"
+    assert 'ValueError: broken' in entry['exc_info']
+    assert record.args is stats
+
+
+def test_sampling_filter():
+    """Sampled loggers drop info records, never warnings."""
+    sampling = SamplingFilter({'app.services': 0.0})
+
+    def record(name, level):
+        return logging.makeLogRecord(dict(name=name, levelno=level))
+
+    with patch('app.core.logging.random.random', return_value=0.5):
+        assert not sampling.filter(
+            record('app.services.websocket_manager', logging.INFO),
+        )
+        assert sampling.filter(
+            record('app.services.websocket_manager', logging.WARNING),
+        )
+        assert sampling.filter(record('app.tasks', logging.INFO))
@@ -1,7 +1,7 @@
 import json
 import uuid
-from datetime import datetime
-from unittest.mock import patch
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
 
 from app.services.redis_service import RedisService, redis_service
 
@@ -17,9 +17,9 @@ def test_key_generation():
     ) == 'events:total:page_view'
     assert redis_service._get_event_key('click') == 'events:total:click'
 
-    assert redis_service._get_hourly_event_key(
-        'page_view', TEST_HOUR,
-    ) == f'events:hourly:page_view:{TEST_HOUR}'
+    assert redis_service._get_hourly_counts_key(
+        TEST_HOUR,
+    ) == f'events:counts:{TEST_HOUR}'
 
     assert redis_service._get_user_activity_key(
         user_id,
@@ -38,15 +38,21 @@ async def test_increment_event_counter(redis_for_increment):
 
 
 async def test_increment_hourly_event(redis_for_increment):
-    """Test increment_hourly_event method."""
+    """Test increment_hourly_event method sets the TTL at write time."""
+    pipeline = redis_for_increment.pipeline.return_value
+    pipeline.execute.return_value = [5, True]
     with patch('app.services.redis_service.dt') as mock_dt:
-        mock_now = datetime(2026, 1, 1, 12, 0, 0)
+        mock_now = datetime(2026, 1, 1, 12, 30, 0, tzinfo=timezone.utc)
         mock_dt.now.return_value = mock_now
         result = await redis_service.increment_hourly_event('click')
 
     assert result == 5
-    redis_for_increment.incr.assert_called_once_with(
-        f'events:hourly:click:{TEST_HOUR}',
+    pipeline.hincrby.assert_called_once_with(
+        f'events:counts:{TEST_HOUR}', 'click', 1,
+    )
+    pipeline.expireat.assert_called_once_with(
+        f'events:counts:{TEST_HOUR}',
+        datetime(2026, 1, 3, 13, tzinfo=timezone.utc),
     )
 
 
@@ -61,6 +67,10 @@ async def test_add_user_activity(redis_for_user_activity):
 
     pipeline.lpush.assert_called_once()
     pipeline.ltrim.assert_called_once_with(expected_key, 0, 99)
+    pipeline.expire.assert_called_once_with(expected_key, timedelta(days=7))
+    pipeline.zadd.assert_called_once()
+    assert pipeline.zadd.call_args[0][0] == 'user:last_activity'
+    assert str(user_id) in pipeline.zadd.call_args[0][1]
     pipeline.execute.assert_called_once()
 
     lpush_args = pipeline.lpush.call_args
@@ -70,6 +80,45 @@ async def test_add_user_activity(redis_for_user_activity):
     assert 'timestamp' in pushed_data
 
 
+async def test_normalize_event_counters(mock_redis_dependencies):
+    """Counters keyed by the enum name are merged into the value."""
+    mock_redis_dependencies.scan = AsyncMock(side_effect=[
+        (0, ['events:total:EventType.CLICK']),
+        (0, [f'events:counts:{TEST_HOUR}']),
+    ])
+    mock_redis_dependencies.getdel = AsyncMock(return_value='3')
+    mock_redis_dependencies.hgetall = AsyncMock(return_value={
+        'click': '2', 'EventType.CLICK': '1', 'EventType.PAGE_VIEW': '4',
+    })
+
+    assert await redis_service.normalize_event_counters() == 3
+
+    mock_redis_dependencies.incrby.assert_called_once_with(
+        'events:total:click', 3,
+    )
+    pipeline = mock_redis_dependencies.pipeline.return_value
+    key = f'events:counts:{TEST_HOUR}'
+    assert [call.args for call in pipeline.hincrby.call_args_list] == [
+        (key, 'click', 1), (key, 'page_view', 4),
+    ]
+    pipeline.hdel.assert_called_once_with(
+        key, 'EventType.CLICK', 'EventType.PAGE_VIEW',
+    )
+
+
+async def test_task_stats_listed_in_set(mock_redis_dependencies):
+    """Task statistics are read from the set of recorded tasks."""
+    await redis_service.record_task_stats('task', dict(runs=1), {}, {})
+    pipeline = mock_redis_dependencies.pipeline.return_value
+    pipeline.sadd.assert_called_once_with('stats:tasks', 'task')
+
+    mock_redis_dependencies.smembers = AsyncMock(return_value={'task'})
+    pipeline.execute.return_value = [{'runs': '1'}]
+    assert await redis_service.get_task_stats() == {'task': {'runs': '1'}}
+    pipeline.hgetall.assert_called_once_with('stats:task:task')
+    mock_redis_dependencies.scan.assert_not_called()
+
+
 async def test_get_realtime_stats_empty(_redis_empty):
     """Test get_realtime_stats with empty redis."""
     result = await redis_service.get_realtime_stats()